@@ -0,0 +1,203 @@
+import os
+import re
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from intra_channel_trading.scripts.signal_engine import njit
+
+
+# Где искать trade-логи (относительно папки проекта) и какие файлы считать trade-логами
+DEFAULT_ROOTS = ('outputs/tune_outputs', 'outputs/backtest_outputs')
+TRADE_PATTERNS = ('*_trades.csv', '*_trades.npz', '*_trades.parquet')
+
+# Корзины: 0..23 — час входа, 24..30 — день недели входа (Mon..Sun)
+N_HOURS = 24
+DAY_LABELS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+N_BUCKETS = N_HOURS + len(DAY_LABELS)
+
+# Разбор имени файла вида {ticker}_{tf}_{start}-{end}_signals_{params}_source={broker}..._trades.csv
+RUN_NAME = re.compile(r"^(?P<ticker>[^_]+)_(?P<timeframe>[^_]+)_.*?_signals_(?P<params>.+?)_source=(?P<source>.+)$")
+
+STAT_COLUMNS = ['Trades', 'Wins', 'TotalPnL', 'AvgPnL', 'WinRate', 'ProfitFactor', 'MaxDrawdown', 'ShareOfPnL']
+
+
+@njit(cache=True)
+def _bucket_kernel(hours, days, pnl, count, wins, total, gross_profit, gross_loss, max_drawdown, equity):
+    # Один проход по сделкам в хронологическом порядке: каждая сделка обновляет свою корзину часа и дня.
+    # equity[i, 0/1] — накопленный PnL корзины часа/дня после сделки i (те же суммы, что и cumsum по фильтру)
+    peak = np.zeros(count.shape[0])
+    for i in range(pnl.shape[0]):
+        value = pnl[i]
+        for j in range(2):
+            b = hours[i] if j == 0 else N_HOURS + days[i]
+            count[b] += 1
+            total[b] += value
+            if value > 0:
+                wins[b] += 1
+                gross_profit[b] += value
+            elif value < 0:
+                gross_loss[b] -= value
+            if total[b] > peak[b]:
+                peak[b] = total[b]
+            if peak[b] - total[b] > max_drawdown[b]:
+                max_drawdown[b] = peak[b] - total[b]
+            equity[i, j] = total[b]
+
+
+def bucket_equity(trades):
+    # Накопленный PnL каждой сделки внутри её корзины: массив (n, 2) — по часу и по дню недели входа,
+    # плюс статистика корзин (n_buckets строк)
+    entry = trades["EntryTime"]
+    hours = np.ascontiguousarray(entry.dt.hour.to_numpy(dtype=np.int64))
+    days = np.ascontiguousarray(entry.dt.dayofweek.to_numpy(dtype=np.int64))
+    pnl = np.ascontiguousarray(trades["PnL"].to_numpy(dtype=np.float64))
+
+    count = np.zeros(N_BUCKETS, dtype=np.int64)
+    wins = np.zeros(N_BUCKETS, dtype=np.int64)
+    total, gross_profit, gross_loss, max_drawdown = (np.zeros(N_BUCKETS) for _ in range(4))
+    equity = np.empty((len(pnl), 2))
+    _bucket_kernel(hours, days, pnl, count, wins, total, gross_profit, gross_loss, max_drawdown, equity)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stats = pd.DataFrame({
+            'Trades': count,
+            'Wins': wins,
+            'TotalPnL': total,
+            'AvgPnL': total / count,
+            'WinRate': wins / count,
+            'ProfitFactor': np.where(gross_loss > 0, gross_profit / gross_loss, np.nan),
+            'MaxDrawdown': max_drawdown,
+            'ShareOfPnL': total / pnl.sum() if pnl.sum() != 0 else np.nan,
+        })
+    stats.insert(0, 'Bucket', ['hour'] * N_HOURS + ['weekday'] * len(DAY_LABELS))
+    stats.insert(1, 'Key', [str(h) for h in range(N_HOURS)] + list(DAY_LABELS))
+    return stats[stats['Trades'] > 0].reset_index(drop=True), equity
+
+
+def run_info(path):
+    # Метаданные прогона из пути: папка запуска, инструмент, ТФ, параметры сигнала
+    path = Path(path)
+    stem = path.name[:-len(path.suffix)]
+    stem = stem[:-len('_trades')] if stem.endswith('_trades') else stem
+    match = RUN_NAME.match(stem)
+    info = {'Run': path.parent.name, 'File': stem}
+    info.update(match.groupdict() if match else {'ticker': None, 'timeframe': None, 'params': None, 'source': None})
+    return info
+
+
+def analyze_trade_log(path, with_equity=False):
+    # Задача воркера: загрузка одного trade-лога и все корзины за один проход.
+    # Возвращает только компактные таблицы, сам лог остаётся в процессе-воркере
+    from intra_channel_trading.analytical_laboratory.hourly_day_trading_analyzer import load_trades
+
+    trades = load_trades(str(path))
+    stats, equity = bucket_equity(trades)
+    info = run_info(path)
+    for column, value in reversed(list(info.items())):
+        stats.insert(0, column, value)
+
+    curves = None
+    if with_equity:
+        curves = pd.DataFrame({
+            'File': info['File'],
+            'EntryTime': trades['EntryTime'].to_numpy(),
+            'Hour': trades['EntryTime'].dt.hour.to_numpy(),
+            'Weekday': trades['EntryTime'].dt.dayofweek.map(dict(enumerate(DAY_LABELS))).to_numpy(),
+            'PnL': trades['PnL'].to_numpy(),
+            'HourEquity': equity[:, 0],
+            'WeekdayEquity': equity[:, 1],
+        })
+    return stats, curves
+
+
+def find_trade_logs(roots):
+    paths = set()
+    for root in roots:
+        root = Path(root)
+        if root.is_dir():
+            for pattern in TRADE_PATTERNS:
+                paths.update(root.rglob(pattern))
+    return sorted(paths)
+
+
+def analyze_batch(paths, n_workers=1, with_equity=False):
+    # Все trade-логи параллельно; один битый файл не останавливает пакет — он попадает в список ошибок
+    paths = list(paths)
+    tables, curves, errors = [], [], []
+    if not paths:
+        return pd.DataFrame(columns=['Run', 'File', 'Bucket', 'Key'] + STAT_COLUMNS), None, errors
+
+    def collect(result):
+        tables.append(result[0])
+        if result[1] is not None:
+            curves.append(result[1])
+
+    if n_workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=min(n_workers, len(paths))) as pool:
+            futures = {pool.submit(analyze_trade_log, path, with_equity): path for path in paths}
+            for future, path in futures.items():
+                try:
+                    collect(future.result())
+                except Exception as e:
+                    errors.append((str(path), repr(e)))
+    else:
+        for path in paths:
+            try:
+                collect(analyze_trade_log(path, with_equity))
+            except Exception as e:
+                errors.append((str(path), repr(e)))
+
+    table = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+    return table, (pd.concat(curves, ignore_index=True) if curves else None), errors
+
+
+def session_edges(table, min_trades=30):
+    # Сводка поверх сводной таблицы: для каждой корзины — в скольких прогонах она прибыльна и средний вклад
+    table = table[table['Trades'] >= min_trades]
+    if table.empty:
+        return pd.DataFrame()
+    return (table.assign(Profitable=table['TotalPnL'] > 0)
+                 .groupby(['Bucket', 'Key'], sort=False)
+                 .agg(Runs=('File', 'count'), ProfitableRuns=('Profitable', 'mean'),
+                      MeanPnL=('TotalPnL', 'mean'), MedianAvgPnL=('AvgPnL', 'median'),
+                      MeanWinRate=('WinRate', 'mean'))
+                 .reset_index())
+
+
+def main(argv=None):
+    project_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    parser = argparse.ArgumentParser(description="Пакетная почасовая/по дням статистика PnL по всем trade-логам")
+    parser.add_argument('paths', nargs='*', help="Папки или файлы (по умолчанию outputs/tune_outputs и outputs/backtest_outputs)")
+    parser.add_argument('--output', default=os.path.join(project_dir, 'outputs', 'analytical_results'))
+    parser.add_argument('--workers', type=int, default=0, help="Число процессов (0 — все ядра)")
+    parser.add_argument('--equity', action='store_true', help="Сохранить также накопленный PnL по корзинам для каждой сделки")
+    parser.add_argument('--min-trades', type=int, default=30, help="Минимум сделок в корзине для сводки session_edges")
+    args = parser.parse_args(argv)
+
+    roots = args.paths or [os.path.join(project_dir, root) for root in DEFAULT_ROOTS]
+    paths = sorted({Path(p) for p in roots if Path(p).is_file()} | set(find_trade_logs(roots)))
+    n_workers = args.workers or os.cpu_count()
+    table, curves, errors = analyze_batch(paths, n_workers=n_workers, with_equity=args.equity)
+
+    destination = Path(args.output)
+    destination.mkdir(parents=True, exist_ok=True)
+    table.to_csv(destination / 'bucket_stats.csv', index=False)
+    edges = session_edges(table, args.min_trades)
+    edges.to_csv(destination / 'session_edges.csv', index=False)
+    if curves is not None:
+        from intra_channel_trading.scripts.artifacts import write_frame
+        write_frame(curves, str(destination / 'bucket_equity'), 'npz', float32=False)
+
+    print(f"Trade-логов: {len(paths)}, ошибок: {len(errors)}, строк: {len(table)} → {destination}")
+    for path, error in errors:
+        print(f"  {path}: {error}")
+    if not edges.empty:
+        print(edges.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,12 @@ from pathlib import Path
 
 
 def load_trades(path: str) -> pd.DataFrame:
-    df = pd.read_csv(path, parse_dates=["EntryTime"])
+    if str(path).endswith((".npz", ".parquet")):
+        # Компактные артефакты (ArtifactWriter) читаются с исходными типами колонок
+        from intra_channel_trading.scripts.artifacts import read_frame
+        df = read_frame(str(path))
+    else:
+        df = pd.read_csv(path, parse_dates=["EntryTime"])
     if "PnL" not in df.columns:
         raise ValueError("Файл trade-логов должен содержать колонку PnL")
     df["EntryHour"] = df["EntryTime"].dt.hour
@@ -33,12 +38,10 @@ def bar_plot(hourly: pd.DataFrame) -> go.Figure:
 
 def equity_curves_by_hour(df: pd.DataFrame, save_path: str = None) -> go.Figure:
     fig = go.Figure()
-    for h in range(24):
-        chunk = df[df["EntryHour"] == h].copy()
-        if chunk.empty:
-            continue
-        chunk["Equity"] = chunk["PnL"].cumsum()
-        fig.add_scatter(x=chunk.index, y=chunk["Equity"],
+    # Накопленный PnL всех часов одним groupby вместо 24 фильтраций таблицы
+    equity = df.groupby("EntryHour", sort=True)["PnL"].cumsum()
+    for h, chunk in equity.groupby(df["EntryHour"], sort=True):
+        fig.add_scatter(x=chunk.index, y=chunk.to_numpy(),
                         mode="lines", name=f"Hour {h}", line=dict(width=1))
     df["Equity"] = df["PnL"].cumsum()
     fig.add_scatter(x=df.index, y=df["Equity"],
@@ -59,12 +62,9 @@ def equity_curves_by_day(df: pd.DataFrame, save_path: str = None) -> go.Figure:
     day_labels = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
     df["EntryDay"] = df["EntryTime"].dt.dayofweek
 
-    for d in range(7):
-        chunk = df[df["EntryDay"] == d].copy()
-        if chunk.empty:
-            continue
-        chunk["Equity"] = chunk["PnL"].cumsum()
-        fig.add_scatter(x=chunk.index, y=chunk["Equity"],
+    equity = df.groupby("EntryDay", sort=True)["PnL"].cumsum()
+    for d, chunk in equity.groupby(df["EntryDay"], sort=True):
+        fig.add_scatter(x=chunk.index, y=chunk.to_numpy(),
                         mode="lines", name=day_labels[d], line=dict(width=1))
 
     df["Equity"] = df["PnL"].cumsum()
@@ -1,6 +1,8 @@
 import enum
 from backtesting import Strategy
 
+from .session_masks import session_masks
+
 
 class SignalType(enum.IntEnum):
     long_signal = 1
@@ -31,6 +33,8 @@ class StrategyFixLot(Strategy):
     def __init__(self, broker, data, params):
         super().__init__(broker, data, params)
         self.signal = None
+        self._hours_allowed = None
+        self._day_allowed = None
 
         # Безопасное извлечение allowed_days из trading_hours
         if self.trading_hours is None:
@@ -39,18 +43,15 @@ class StrategyFixLot(Strategy):
 
     def init(self):
         self.signal = self.I(lambda x: x, self.data.df['Signal'])
+        # Маски сессии и дней недели считаются один раз на весь индекс (и кэшируются между прогонами)
+        self._hours_allowed, self._day_allowed = session_masks(
+            self.data.index, {'allowed': self.trading_hours['allowed'], 'allowed_days': self.allowed_days})
 
     def is_trading_allowed(self):
-        current_time = self.data.index[-1]
-        current_hour = current_time.hour
-        for start, end in self.trading_hours['allowed']:
-            if start <= current_hour < end:
-                return True
-        return False
+        return bool(self._hours_allowed[len(self.data) - 1])
 
     def is_day_allowed(self):
-        current_day = self.data.index[-1].weekday()
-        return current_day in self.allowed_days
+        return bool(self._day_allowed[len(self.data) - 1])
 
     def next(self):
         if len(self.signal) < 2:
@@ -0,0 +1,382 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from .session_masks import session_allowed
+
+
+LOT_SIZE = 100_000
+STATS_KEYS = ('Return [%]', 'Sharpe Ratio', 'Win Rate [%]', 'Profit Factor',
+              'Expectancy [%]', 'Max. Drawdown [%]')
+# Торговые параметры, от которых зависит результат fast_backtest (всё остальное в params игнорируется)
+TRADING_KEYS = ('eod_exit', 'trading_hours')
+# Числовые метрики _compute_stats в порядке вывода
+STATS_COLUMNS = ('Equity Final [$]', 'Equity Peak [$]', 'Return [%]', 'Return (Ann.) [%]', 'Volatility (Ann.) [%]',
+                 'Sharpe Ratio', 'Max. Drawdown [%]', '# Trades', 'Win Rate [%]', 'Profit Factor', 'Expectancy [%]')
+# Сколько участников портфеля обрабатывается за раз: ограничивает временные матрицы (участники × бары)
+MEMBER_CHUNK = 8
+
+
+def position_from_signals(signal, eod_exit=False, allowed=None):
+    # Позиция (1 / -1 / 0), удерживаемая на каждом баре.
+    # Решение принимается в next() на баре i только при смене сигнала и исполняется по Open бара i + 1.
+    # signal — вектор баров или матрица (участники × бары): всё считается вдоль последней оси
+    signal = np.asarray(signal, dtype=np.int64)
+    n = signal.shape[-1]
+    changed = np.zeros(signal.shape, dtype=bool)
+    changed[..., 1:] = signal[..., 1:] != signal[..., :-1]
+
+    target = signal.copy()
+    if eod_exit:
+        target[..., ~allowed] = 0  # вне сессии можно только выйти
+    target[..., 0] = 0
+
+    last_decision = np.maximum.accumulate(np.where(changed, np.arange(n), 0), axis=-1)
+    decision = np.take_along_axis(target, last_decision, axis=-1)
+
+    held = np.zeros(signal.shape, dtype=np.int64)
+    held[..., 1:] = decision[..., :-1]
+    return held
+
+
+def _bar_pnl(open_, close, held, lot_size, commission):
+    # Приращение эквити на каждом баре; held — вектор или матрица, lot_size — число или столбец лотов участников
+    prev_held = np.zeros_like(held)
+    prev_held[..., 1:] = held[..., :-1]
+    switched = held != prev_held
+    n_fills = (switched & (prev_held != 0)).astype(np.int64) + (switched & (held != 0))
+    prev_close = np.r_[close[0], close[:-1]]
+    delta = lot_size * (prev_held * (open_ - prev_close) + held * (close - open_))
+    delta -= commission * lot_size * open_ * n_fills
+    return delta, switched
+
+
+def _trade_arrays(open_, held, switched, lot_size, commission):
+    # Сделки: каждая смена удерживаемой позиции закрывает текущую и/или открывает новую по Open бара.
+    # Для матрицы позиций сделки идут по участникам (member), внутри участника — по времени
+    held2d = np.atleast_2d(held)
+    members, bounds = np.nonzero(np.atleast_2d(switched))
+    same_member = np.r_[members[1:] == members[:-1], False]
+    opens = np.flatnonzero((held2d[members, bounds] != 0) & same_member)
+    entry_bar = bounds[opens]
+    exit_bar = bounds[opens + 1]
+    member = members[opens]
+    lots = lot_size if np.ndim(lot_size) == 0 else np.asarray(lot_size, dtype=np.float64).ravel()[member]
+    direction = held2d[member, entry_bar]
+    entry_price = open_[entry_bar]
+    exit_price = open_[exit_bar]
+    commissions = commission * lots * (entry_price + exit_price)
+    return member, {
+        'Size': direction * lots,
+        'EntryBar': entry_bar,
+        'ExitBar': exit_bar,
+        'EntryPrice': entry_price,
+        'ExitPrice': exit_price,
+        'PnL': direction * lots * (exit_price - entry_price) - commissions,
+        'Commission': commissions,
+        'ReturnPct': direction * (exit_price / entry_price - 1) - commissions / (lots * entry_price),
+    }
+
+
+def _geometric_mean(returns):
+    returns = np.nan_to_num(returns, nan=0.0) + 1
+    if np.any(returns <= 0):
+        return 0
+    return np.exp(np.log(returns).sum() / (len(returns) or np.nan)) - 1
+
+
+def _day_returns(index, equity):
+    days = index.normalize().asi8
+    last_of_day = np.r_[days[1:] != days[:-1], True]
+    daily = equity[last_of_day]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = daily[1:] / daily[:-1] - 1
+    return returns[~np.isnan(returns)]
+
+
+def _compute_stats(index, equity, trades):
+    # Те же формулы, что и в backtesting._stats.compute_stats, но только для метрик критерия оптимизации
+    if not len(index):
+        # Пустой срез (например, весь отрезок ушёл на прогрев индикаторов): метрики не определены
+        s = dict.fromkeys(('Start', 'End'), pd.NaT)
+        s.update(dict.fromkeys(STATS_COLUMNS, np.nan))
+        s['# Trades'] = 0
+        return s
+    s = {}
+    s['Start'] = index[0]
+    s['End'] = index[-1]
+    s['Equity Final [$]'] = equity[-1]
+    s['Equity Peak [$]'] = equity.max()
+    s['Return [%]'] = (equity[-1] - equity[0]) / equity[0] * 100
+
+    period = pd.Series(index[-100:]).diff().dropna().median()
+    freq_days = period.days
+    have_weekends = np.isin(index.dayofweek.to_numpy(), (5, 6)).mean() > 2 / 7 * .6
+    annual_trading_days = {7: 52, 31: 12, 365: 1}.get(freq_days, 365 if have_weekends else 252)
+    if freq_days in (7, 31, 365):
+        freq = {7: 'W', 31: 'ME', 365: 'YE'}[freq_days]
+        day_returns = pd.Series(equity, index=index).resample(freq).last().dropna().pct_change().dropna().values
+    else:
+        day_returns = _day_returns(index, equity)
+    gmean_day_return = _geometric_mean(day_returns)
+
+    annualized_return = (1 + gmean_day_return) ** annual_trading_days - 1
+    s['Return (Ann.) [%]'] = annualized_return * 100
+    with np.errstate(invalid='ignore'):
+        day_var = day_returns.var(ddof=1) if len(day_returns) > 1 else np.nan
+        s['Volatility (Ann.) [%]'] = np.sqrt(
+            (day_var + (1 + gmean_day_return) ** 2) ** annual_trading_days
+            - (1 + gmean_day_return) ** (2 * annual_trading_days)) * 100
+    s['Sharpe Ratio'] = s['Return (Ann.) [%]'] / (s['Volatility (Ann.) [%]'] or np.nan)
+
+    dd = 1 - equity / np.maximum.accumulate(equity)
+    s['Max. Drawdown [%]'] = -np.nan_to_num(dd.max()) * 100
+
+    pl = trades['PnL'].to_numpy()
+    returns = trades['ReturnPct'].to_numpy()
+    s['# Trades'] = n_trades = len(trades)
+    s['Win Rate [%]'] = np.nan if not n_trades else (pl > 0).mean() * 100
+    s['Profit Factor'] = returns[returns > 0].sum() / (abs(returns[returns < 0].sum()) or np.nan)
+    s['Expectancy [%]'] = returns.mean() * 100 if n_trades else np.nan
+    return s
+
+
+def fast_backtest(signals, params=None, cash=100_000, margin=1 / 100, commission=0.00, lot_size=LOT_SIZE):
+    # Векторный аналог calculate_profit: фиксированный лот, exclusive_orders=True, trade_on_close=False
+    return fast_backtest_arrays(signals.index, signals['Open'].to_numpy(), signals['Close'].to_numpy(),
+                                signals['Signal'].to_numpy(), params=params, cash=cash, margin=margin,
+                                commission=commission, lot_size=lot_size)
+
+
+def fast_backtest_arrays(index, open_, close, signal, params=None, cash=100_000, margin=1 / 100, commission=0.00,
+                         lot_size=LOT_SIZE):
+    # То же на голых массивах (структура массивов вместо DataFrame) — без копии таблицы сигналов
+    params = params or {}
+    if not len(index):
+        return backtest_stats(BacktestState(cash, commission, lot_size), index)
+    open_ = np.asarray(open_, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+
+    eod_exit = bool(params.get('eod_exit'))
+    allowed = session_allowed(index, params.get('trading_hours')) if eod_exit else None
+    held = position_from_signals(signal, eod_exit=eod_exit, allowed=allowed)
+
+    delta, switched = _bar_pnl(open_, close, held, lot_size, commission)
+    equity = cash + np.cumsum(delta)
+
+    _, columns = _trade_arrays(open_, held, switched, lot_size, commission)
+    trades = pd.DataFrame(columns)
+    trades['EntryTime'] = index[trades['EntryBar'].to_numpy()]
+    trades['ExitTime'] = index[trades['ExitBar'].to_numpy()]
+    trades['Duration'] = trades['ExitTime'] - trades['EntryTime']
+
+    entries = np.flatnonzero(switched & (held != 0))
+    required = lot_size * open_[entries] * (1 + commission) * margin
+    if np.any(equity <= 0) or np.any(equity[entries - 1] < required):
+        warnings.warn("fast_backtest: equity fell below the required margin; "
+                      "results diverge from backtesting.Backtest, which would cancel orders", stacklevel=2)
+
+    s = _compute_stats(index, equity, trades)
+    s['_equity_curve'] = pd.DataFrame({'Equity': equity, 'DrawdownPct': 1 - equity / np.maximum.accumulate(equity)},
+                                      index=index)
+    s['_trades'] = trades
+    return pd.Series(s, dtype=object)
+
+
+def portfolio_backtest(index, open_, close, signals, weights=None, params=None, cash=100_000, margin=1 / 100,
+                       commission=0.00, lot_size=LOT_SIZE):
+    # Портфель из K стратегий на одном инструменте: signals — матрица (K × бары), капитал делится по weights
+    # (по умолчанию поровну), участник k торгует лотом lot_size * w_k. Все участники считаются одними
+    # матричными операциями блоками по MEMBER_CHUNK; при K=1 и w=1 результат совпадает с fast_backtest_arrays
+    params = params or {}
+    signals = np.atleast_2d(signals)
+    k_members, n = signals.shape
+    weights = np.full(k_members, 1 / k_members) if weights is None else np.asarray(weights, dtype=np.float64)
+    lots = lot_size * weights
+    open_ = np.asarray(open_, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+
+    eod_exit = bool(params.get('eod_exit'))
+    allowed = session_allowed(index, params.get('trading_hours')) if eod_exit else None
+
+    total = np.zeros(n)
+    member_pnl, member_dd, member_trades, tables = [], [], [], []
+    for start in range(0, k_members, MEMBER_CHUNK):
+        chunk = slice(start, min(start + MEMBER_CHUNK, k_members))
+        held = position_from_signals(signals[chunk], eod_exit=eod_exit, allowed=allowed)
+        delta, switched = _bar_pnl(open_, close, held, lots[chunk, None], commission)
+        total += delta.sum(axis=0)
+
+        equity = np.cumsum(delta, axis=1, out=delta)  # PnL участника нарастающим итогом, на месте delta
+        member_pnl.append(equity[:, -1].copy())
+        member_dd.append((np.maximum.accumulate(np.maximum(equity, 0), axis=1) - equity).max(axis=1))
+        member, columns = _trade_arrays(open_, held, switched, lots[chunk], commission)
+        member_trades.append(np.bincount(member, minlength=held.shape[0]))
+        tables.append(pd.DataFrame(dict(columns, Member=member + start)))
+
+    equity = cash + np.cumsum(total)
+    trades = pd.concat(tables, ignore_index=True).sort_values(['ExitBar', 'Member'], kind='stable',
+                                                              ignore_index=True)
+    trades['EntryTime'] = index[trades['EntryBar'].to_numpy()]
+    trades['ExitTime'] = index[trades['ExitBar'].to_numpy()]
+    trades['Duration'] = trades['ExitTime'] - trades['EntryTime']
+    if np.any(equity <= 0):
+        warnings.warn("portfolio_backtest: equity fell to zero", stacklevel=2)
+
+    s = _compute_stats(index, equity, trades)
+    s['_equity_curve'] = pd.DataFrame({'Equity': equity, 'DrawdownPct': 1 - equity / np.maximum.accumulate(equity)},
+                                      index=index)
+    s['_trades'] = trades
+    s['_members'] = pd.DataFrame({'Weight': weights, 'PnL': np.concatenate(member_pnl),
+                                  '# Trades': np.concatenate(member_trades),
+                                  'Max. Drawdown [$]': np.concatenate(member_dd)})
+    return pd.Series(s, dtype=object)
+
+
+class BacktestState:
+    # Состояние fast_backtest на последнем баре для продолжения на дописанных барах (extend_backtest):
+    # последний сигнал и решение, удерживаемая позиция, открытая сделка и накопленный PnL (без cash),
+    # плюс вся эквити и закрытые сделки — статистика считается по полной истории
+    def __init__(self, cash=100_000, commission=0.00, lot_size=LOT_SIZE):
+        self.cash = cash
+        self.commission = commission
+        self.lot_size = lot_size
+        self.signal = None
+        self.decision = 0
+        self.held = 0
+        self.open = 0.0
+        self.close = 0.0
+        self.entry_bar = -1           # бар входа открытой сделки (-1 — позиции нет)
+        self.entry_price = 0.0
+        self.pnl = np.empty(0)        # накопленный PnL по барам: equity = cash + pnl
+        self.trades = []              # блоки закрытых сделок (словари колонок)
+
+    @property
+    def n_bars(self):
+        return len(self.pnl)
+
+
+def extend_backtest(state, index, open_, close, signal, params=None):
+    # Продолжение fast_backtest на новых барах: работа пропорциональна длине хвоста, результат для истории
+    # целиком совпадает с fast_backtest_arrays бит в бит. index — полный индекс (история + хвост) или только
+    # индекс хвоста (покусочный прогон не держит всю историю), остальное — хвост
+    params = params or {}
+    open_ = np.asarray(open_, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    signal = np.asarray(signal, dtype=np.int64)
+    n0, m = state.n_bars, len(signal)
+    if m == 0:
+        return state
+    tail_index = index if len(index) == m else index[n0:n0 + m]
+
+    # Решения: смена сигнала на баре j; до первой смены в хвосте действует решение, принятое в истории
+    target = signal.copy()
+    if params.get('eod_exit'):
+        target[~session_allowed(tail_index, params.get('trading_hours'))] = 0
+    changed = np.empty(m, dtype=bool)
+    if state.signal is None:
+        changed[0] = False
+        target[0] = 0
+        decision_prev = 0
+    else:
+        changed[0] = signal[0] != state.signal
+        decision_prev = state.decision
+    changed[1:] = signal[1:] != signal[:-1]
+    target_ext = np.r_[decision_prev, target]
+    last = np.maximum.accumulate(np.where(np.r_[True, changed], np.arange(m + 1), 0))
+    decision = target_ext[last]
+    held = np.r_[state.held, decision[:-1]]  # held[0] — позиция на последнем баре истории
+
+    # Бар 0 расширенных массивов — последний бар истории (или фиктивный перед первым баром)
+    first = state.signal is None
+    open_ext = np.r_[open_[0] if first else state.open, open_]
+    close_ext = np.r_[close[0] if first else state.close, close]
+    delta, switched = _bar_pnl(open_ext, close_ext, held, state.lot_size, state.commission)
+    pnl = np.cumsum(np.r_[state.pnl[-1] if n0 else 0.0, delta[1:]])[1:]
+
+    # Открытая сделка истории входит в хвост как граница на баре 0 со своей ценой входа
+    carried = state.entry_bar >= 0
+    switched[0] = carried
+    open_ext[0] = state.entry_price if carried else open_ext[0]
+    _, columns = _trade_arrays(open_ext, held, switched, state.lot_size, state.commission)
+    bars = np.flatnonzero(switched)
+    if len(columns['EntryBar']):
+        columns['EntryBar'] = np.where(columns['EntryBar'] == 0, state.entry_bar, columns['EntryBar'] + n0 - 1)
+        columns['ExitBar'] = columns['ExitBar'] + n0 - 1
+        state.trades.append(columns)
+    if len(bars) and held[bars[-1]] != 0:
+        state.entry_bar = state.entry_bar if bars[-1] == 0 else int(bars[-1] + n0 - 1)
+        state.entry_price = float(open_ext[bars[-1]])
+    elif len(bars):
+        state.entry_bar, state.entry_price = -1, 0.0
+
+    state.signal = int(signal[-1])
+    state.decision = int(decision[-1])
+    state.held = int(held[-1])
+    state.open = float(open_[-1])
+    state.close = float(close[-1])
+    state.pnl = np.concatenate([state.pnl, pnl])
+    return state
+
+
+def backtest_stats(state, index):
+    # Статистика по состоянию extend_backtest — в том же виде, что и fast_backtest
+    equity = state.cash + state.pnl
+    index = index[:state.n_bars]
+    if state.trades:
+        columns = {name: np.concatenate([block[name] for block in state.trades]) for name in state.trades[0]}
+    else:
+        _, columns = _trade_arrays(np.zeros(1), np.zeros(1, dtype=np.int64), np.zeros(1, dtype=bool),
+                                   state.lot_size, state.commission)
+    trades = pd.DataFrame(columns)
+    trades['EntryTime'] = index[trades['EntryBar'].to_numpy()]
+    trades['ExitTime'] = index[trades['ExitBar'].to_numpy()]
+    trades['Duration'] = trades['ExitTime'] - trades['EntryTime']
+
+    s = _compute_stats(index, equity, trades)
+    s['_equity_curve'] = pd.DataFrame({'Equity': equity, 'DrawdownPct': 1 - equity / np.maximum.accumulate(equity)},
+                                      index=index)
+    s['_trades'] = trades
+    return pd.Series(s, dtype=object)
+
+
+def compare_with_backtesting(signals, params, keys=STATS_KEYS + ('Equity Final [$]', '# Trades')):
+    # Сверка с backtesting.Backtest.run на одних и тех же сигналах
+    from .utils import calculate_profit
+
+    reference = calculate_profit(signals, verbose=False, params=params)
+    fast = fast_backtest(signals, params)
+    return pd.DataFrame({'backtesting': [reference[k] for k in keys],
+                         'fast': [fast[k] for k in keys]}, index=list(keys))
+
+
+def main():
+    # Проверка паритета на поставляемых данных EURUSD 20M:
+    #   python -m intra_channel_trading.auxiliary.fast_backtest
+    import os
+    import zipfile
+
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from intra_channel_trading.scripts.strategy import donchian_rsi_exit_only
+
+    zip_path = os.path.join(root, 'marketdata', 'ziparchive', 'EURUSD_20M_2010-01-04_2025-05-01_MetaQuotes-Demo.csv.zip')
+    with zipfile.ZipFile(zip_path) as zf:
+        name = next(n for n in zf.namelist() if n.endswith('.csv') and not n.startswith('__MACOSX'))
+        with zf.open(name) as f:
+            df = pd.read_csv(f, parse_dates=['Datetime'], index_col='Datetime')
+    data = df[(df.index >= '2024-01-01') & (df.index <= '2025-05-01')]
+
+    signal_params = {'donchian_window': 11, 'rsi_period': 18, 'rsi_exit': 42, 'cooldown_bars': 8,
+                     'atr_enabled': True, 'atr_period': 20, 'atr_threshold': 0.0001}
+    for eod_exit in (False, True):
+        params = {'eod_exit': eod_exit,
+                  'trading_hours': {'allowed': [[0, 11], [16, 24]], 'allowed_days': [0, 1, 4]}}
+        table = compare_with_backtesting(donchian_rsi_exit_only(data, signal_params), params)
+        print(f"eod_exit={eod_exit}\n{table}\n")
+        assert np.allclose(table['backtesting'].astype(float), table['fast'].astype(float),
+                           rtol=1e-6, equal_nan=True), "fast_backtest diverges from backtesting.Backtest"
+
+
+if __name__ == "__main__":
+    main()
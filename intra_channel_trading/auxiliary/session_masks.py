@@ -0,0 +1,77 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+
+DEFAULT_TRADING_HOURS = {'allowed': [[0, 24]], 'allowed_days': [0, 1, 2, 3, 4, 5, 6]}
+
+# Часы и дни недели индекса считаются один раз; маски для разных настроек сессии — табличным поиском
+_calendars = OrderedDict()
+_masks = OrderedDict()
+_index_keys = {}
+MAX_CALENDARS = 16
+MAX_MASKS = 1024
+
+
+def _index_key(index):
+    cached = _index_keys.get(id(index))
+    if cached is None or cached[0] is not index:
+        digest = hashlib.blake2b(np.ascontiguousarray(index.asi8).tobytes(), digest_size=16).hexdigest()
+        cached = (index, digest)
+        if len(_index_keys) >= MAX_CALENDARS:
+            _index_keys.clear()
+        _index_keys[id(index)] = cached
+    return cached[1]
+
+
+def _calendar(index):
+    key = _index_key(index)
+    calendar = _calendars.get(key)
+    if calendar is None:
+        calendar = (index.hour.to_numpy().astype(np.int8), index.dayofweek.to_numpy().astype(np.int8))
+        _calendars[key] = calendar
+        while len(_calendars) > MAX_CALENDARS:
+            _calendars.popitem(last=False)
+    else:
+        _calendars.move_to_end(key)
+    return key, calendar
+
+
+def _normalize(trading_hours):
+    trading_hours = trading_hours or DEFAULT_TRADING_HOURS
+    allowed = tuple((int(start), int(end)) for start, end in trading_hours.get('allowed', [[0, 24]]))
+    allowed_days = trading_hours.get('allowed_days')
+    allowed_days = tuple(sorted(int(d) for d in allowed_days)) if allowed_days is not None else None
+    return allowed, allowed_days
+
+
+def session_masks(index, trading_hours=None):
+    # (часы разрешены, день разрешён) для каждого бара индекса — то же, что
+    # StrategyFixLot.is_trading_allowed() / is_day_allowed(), но посчитанное один раз на прогон
+    index_key, (hours, weekdays) = _calendar(index)
+    allowed, allowed_days = _normalize(trading_hours)
+    key = (index_key, allowed, allowed_days)
+    masks = _masks.get(key)
+    if masks is not None:
+        _masks.move_to_end(key)
+        return masks
+
+    hour_table = np.zeros(24, dtype=bool)
+    for start, end in allowed:
+        hour_table[max(start, 0):min(end, 24)] = True
+    day_table = np.zeros(7, dtype=bool)
+    day_table[list(allowed_days) if allowed_days is not None else slice(None)] = True
+
+    masks = (hour_table[hours], day_table[weekdays])
+    for mask in masks:
+        mask.setflags(write=False)
+    _masks[key] = masks
+    while len(_masks) > MAX_MASKS:
+        _masks.popitem(last=False)
+    return masks
+
+
+def session_allowed(index, trading_hours=None):
+    hours_allowed, day_allowed = session_masks(index, trading_hours)
+    return hours_allowed & day_allowed
@@ -4,12 +4,7 @@ import warnings
 
 import pandas as pd
 
-from backtesting import Backtest
-from backtesting import _plotting as plt_backtesting
-from .backtest_strategy import StrategyFixLot
-
 warnings.filterwarnings("ignore")
-plt_backtesting._MAX_CANDLES = 1_000_000
 pd.set_option("display.precision", 5)
 pd.set_option("expand_frame_repr", False)
 
@@ -17,6 +12,11 @@ pd.set_option("expand_frame_repr", False)
 
 
 def calculate_profit(signals, verbose=False, filename=None, params=None):
+    # backtesting.py (вместе с bokeh) импортируется при первом вызове, а не при импорте модуля:
+    # скрипты и CLI, которым нужен только fast_backtest, стартуют без него
+    from backtesting import Backtest
+    from .backtest_strategy import StrategyFixLot
+
     bt = Backtest(signals,
                   strategy=StrategyFixLot,
                   cash=100_000,
@@ -28,6 +28,8 @@ def calculate_profit(signals, verbose=False, filename=None, params=None):
     stats = bt.run(**params)  # Передаём из YAML или другого источника
 
     if verbose:
+        from backtesting import _plotting as plt_backtesting
+        plt_backtesting._MAX_CANDLES = 1_000_000
         bt.plot(relative_equity=False,
                 plot_equity=True,
                 plot_drawdown=True,
@@ -0,0 +1,196 @@
+import os
+import sys
+import shutil
+import argparse
+import datetime
+
+# Лёгкий старт: здесь только стандартная библиотека. pandas/numba/optuna/backtesting.py импортируются
+# внутри подкоманд, и только те, что им нужны (backtest не тянет optuna, headless-режим — bokeh и plotly)
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CONFIG = os.path.join(PROJECT_DIR, 'configs', 'config_donchian_rsi.yaml')
+
+
+def run_backtest(args):
+    from intra_channel_trading.auxiliary.fast_backtest import fast_backtest
+    from intra_channel_trading.scripts.artifacts import ArtifactWriter, stats_summary, write_equity_chart
+    from intra_channel_trading.scripts.config_loader import load_config, build_params, parse_marketdata_name
+    from intra_channel_trading.scripts.data_loader import load_data
+    from intra_channel_trading.scripts.resample import ResampleCache
+    from intra_channel_trading.scripts.scoring import criteria
+    from intra_channel_trading.scripts.strategy import donchian_rsi_exit_only
+    from intra_channel_trading.scripts.telemetry import enable_telemetry, disable_telemetry, stage, write_report
+
+    config = load_config(args.config)
+    data_cfg = config.get('data', {})
+    out_cfg = config.get('output', {})
+    params = build_params(config)
+    ticker, timeframe, broker = parse_marketdata_name(data_cfg['marketdata'])
+    if data_cfg.get('resample_minutes'):
+        timeframe = f"{data_cfg['resample_minutes']}M"
+    if args.telemetry or config.get('telemetry', {}).get('enabled', False):
+        enable_telemetry()
+
+    source = os.path.join(args.root, data_cfg['dataset_path'], data_cfg['marketdata'])
+    start_date, end_date = args.start or data_cfg['start_date'], args.end or data_cfg['end_date']
+    # Инкрементальный режим: по чекпоинту считаются только бары, дописанные в источник после прошлого прогона.
+    # Бэктест в нём всегда векторный; с resample_minutes не работает (последний бар ТФ ещё может измениться)
+    inc_cfg = config.get('incremental', {})
+    chunk_cfg = config.get('chunked', {})
+    incremental = (args.incremental or inc_cfg.get('enabled', False)) and not data_cfg.get('resample_minutes')
+    stats = None
+    if incremental:
+        from intra_channel_trading.scripts.incremental import run_incremental
+        signals, stats, info = run_incremental(source, params, start_date, end_date,
+                                               os.path.join(args.root, inc_cfg.get('checkpoint_dir', 'outputs/checkpoints')))
+        print(f"Чекпоинт: {'продолжен' if info['resumed'] else 'построен заново'}, новых баров: {info['new_bars']}, "
+              f"всего баров с сигналами: {info['bars']}")
+    elif (args.chunked or chunk_cfg.get('enabled', False)) and not data_cfg.get('resample_minutes'):
+        # Покусочный режим: источник читается кусками по chunk_bars баров, бэктест — векторный
+        from intra_channel_trading.scripts.chunked import run_chunked, CHUNK_BARS
+        store_path = data_cfg.get('store_path')
+        signals, stats = run_chunked(source, params, start_date, end_date,
+                                     chunk_bars=chunk_cfg.get('chunk_bars') or CHUNK_BARS,
+                                     store_root=os.path.join(args.root, store_path) if store_path else None)
+    else:
+        store_path = data_cfg.get('store_path')
+        data = load_data(source, start_date=start_date, end_date=end_date,
+                         store_root=os.path.join(args.root, store_path) if store_path else None)
+        if data_cfg.get('resample_minutes'):
+            resample_cache_dir = data_cfg.get('resample_cache_dir')
+            resample_cache = ResampleCache(
+                cache_dir=os.path.join(args.root, resample_cache_dir) if resample_cache_dir else None)
+            data = resample_cache.get(data, data_cfg['resample_minutes'])
+        signals = donchian_rsi_exit_only(data, params)
+
+    filename = (f"{ticker}_{timeframe}_{start_date}-{end_date}"
+                f"_signals_dnch.w{params['donchian_window']}.rsi{params['rsi_period']}."
+                f"rsiexit{params['rsi_exit']}.cld{params['cooldown_bars']}."
+                f"eod{params['eod_exit']}.atr{params['atr_enabled']}_source={broker}")
+
+    destination = os.path.join(args.root, out_cfg.get('destination_path', 'outputs'),
+                               datetime.datetime.now().strftime("%Y%m%d%H%M%S"))
+    os.makedirs(destination, exist_ok=True)
+
+    # Сигналы сжимаются и пишутся в фоне, пока идёт бэктест
+    writer = ArtifactWriter.from_config(destination, out_cfg)
+    writer.write(filename, signals)
+    chart = out_cfg.get('chart', 'bokeh') if args.plot else 'none'
+    if args.engine == 'fast' or stats is not None:
+        # Векторный бэктест: без backtesting.py и bokeh вовсе
+        if stats is None:
+            stats = fast_backtest(signals, params=params)
+        chart = 'lttb' if chart == 'bokeh' else chart
+    else:
+        from intra_channel_trading.auxiliary.utils import calculate_profit
+        with stage('calculate_profit'):
+            stats = calculate_profit(signals, verbose=chart == 'bokeh', filename=os.path.join(destination, filename),
+                                     params=params)
+
+    summary = stats_summary(stats)
+    with stage('write_artifacts', artifact='results'):
+        summary.to_csv(os.path.join(destination, f"{filename}_stats.csv"))
+        writer.write(f"{filename}_trades", stats._trades)
+        if chart == 'lttb':
+            write_equity_chart(os.path.join(destination, f"{filename}.html"), signals, stats,
+                               out_cfg.get('chart_points', 5000))
+        shutil.copy2(args.config, os.path.join(destination, os.path.basename(args.config)))
+        writer.close()
+
+    if chart != 'bokeh':
+        print(summary.to_string())
+    print(f"Criteria: {criteria(stats)}")
+    print(f"Результаты: {destination}")
+
+    telemetry = disable_telemetry()
+    if telemetry is not None:
+        write_report(telemetry, destination)
+
+
+def run_optimize(args):
+    from intra_channel_trading.scripts import optimizer
+    optimizer.main(args.config, root=args.root, headless=not args.plot)
+
+
+def run_ensemble(args):
+    from intra_channel_trading.scripts import ensemble
+    ensemble.main(args.config, root=args.root)
+
+
+def run_analyze(args):
+    if args.batch or not args.trades or any(os.path.isdir(path) for path in args.trades):
+        # Пакетный режим: все trade-логи из указанных папок (по умолчанию tune_outputs и backtest_outputs)
+        from intra_channel_trading.analytical_laboratory import batch_trade_analyzer
+        argv = list(args.trades or [os.path.join(args.root, root) for root in batch_trade_analyzer.DEFAULT_ROOTS])
+        argv += ['--workers', str(args.workers), '--output',
+                 args.output or os.path.join(args.root, 'outputs', 'analytical_results')]
+        batch_trade_analyzer.main(argv)
+        return
+
+    from pathlib import Path
+    from intra_channel_trading.analytical_laboratory.hourly_day_trading_analyzer import (
+        load_trades, save_hourly_stats, equity_curves_by_day, equity_curves_by_hour)
+
+    destination = Path(args.output or os.path.join(args.root, 'outputs', 'analytical_results'))
+    destination.mkdir(parents=True, exist_ok=True)
+    for trades_path in map(Path, args.trades):
+        trades = load_trades(str(trades_path))
+        stem = trades_path.name[:-len(trades_path.suffix)].replace('_trades', '')
+        save_hourly_stats(trades, str(destination / f"{stem}_hourly_stats.csv"))
+        if args.plot:
+            equity_curves_by_day(trades, save_path=destination / f"{stem}_equity_by_day.html")
+            equity_curves_by_hour(trades, save_path=destination / f"{stem}_equity_by_hour.html")
+
+
+def build_parser():
+    # Общие опции принимаются после имени подкоманды: `cli.py backtest --config ... --plot`
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--config', default=DEFAULT_CONFIG,
+                        help="YAML-конфиг (по умолчанию configs/config_donchian_rsi.yaml)")
+    common.add_argument('--root', default=PROJECT_DIR, help="Папка, относительно которой заданы пути в конфиге")
+    common.add_argument('--plot', action='store_true',
+                        help="Строить графики (bokeh/plotly); по умолчанию headless — только файлы")
+
+    parser = argparse.ArgumentParser(prog='intra_channel_trading',
+                                     description="Бэктест, оптимизация и анализ стратегии Donchian + RSI")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    backtest = commands.add_parser('backtest', parents=[common], help="Прогон стратегии с параметрами из конфига")
+    backtest.add_argument('--start', help="Начало периода (по умолчанию data.start_date)")
+    backtest.add_argument('--end', help="Конец периода (по умолчанию data.end_date)")
+    backtest.add_argument('--engine', choices=('backtesting', 'fast'), default='backtesting',
+                          help="backtesting — backtesting.py (эталон), fast — векторный fast_backtest")
+    backtest.add_argument('--telemetry', action='store_true', help="Записать телеметрию этапов")
+    backtest.add_argument('--incremental', action='store_true',
+                          help="Продолжить с чекпоинта: считать только новые бары источника (бэктест — fast)")
+    backtest.add_argument('--chunked', action='store_true',
+                          help="Читать и считать источник кусками (ограниченная память, бэктест — fast)")
+    backtest.set_defaults(func=run_backtest)
+
+    optimize = commands.add_parser('optimize', parents=[common],
+                                   help="Оптимизация Optuna по секции optimization конфига")
+    optimize.set_defaults(func=run_optimize)
+
+    ensemble = commands.add_parser('ensemble', parents=[common],
+                                   help="Ансамбль параметров из секции ensemble: голосование или портфель")
+    ensemble.set_defaults(func=run_ensemble)
+
+    analyze = commands.add_parser('analyze', parents=[common], help="Почасовая статистика PnL по *_trades.csv")
+    analyze.add_argument('trades', nargs='*', help="Файлы *_trades.csv / *_trades.npz / *_trades.parquet "
+                                                    "(без аргументов — пакетный режим по outputs)")
+    analyze.add_argument('--output', help="Папка результатов (по умолчанию outputs/analytical_results)")
+    analyze.add_argument('--batch', action='store_true',
+                         help="Сводная таблица по часам и дням недели для всех trade-логов в указанных папках")
+    analyze.add_argument('--workers', type=int, default=0, help="Процессов в пакетном режиме (0 — все ядра)")
+    analyze.set_defaults(func=run_analyze)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.config = os.path.abspath(args.config)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,8 +4,12 @@ import shutil
 
 from auxiliary.utils import calculate_profit
 from scripts.data_loader import load_data
-from scripts.config_loader import load_config
+from scripts.config_loader import load_config, build_params, parse_marketdata_name
+from scripts.resample import ResampleCache
+from scripts.scoring import criteria
 from scripts.strategy import donchian_rsi_exit_only
+from scripts.artifacts import ArtifactWriter, stats_summary, write_equity_chart
+from scripts.telemetry import enable_telemetry, disable_telemetry, stage, write_report
 
 
 def main():
@@ -16,40 +20,28 @@ def main():
     # Извлечение конфигурации для данных, стратегии и других параметров
     out_cfg = config.get('output', {})
     data_cfg = config.get('data', {})  # Данные теперь находятся под ключом 'data'
-    strategy_cfg = config.get('strategy', {})
     dataset_path = data_cfg.get('dataset_path', '')  # Путь к папке с данными
     marketdata = data_cfg.get('marketdata', '')  # Имя файла данных
 
-    ticker = marketdata.split('/')[-1].split('_')[0]
-    timeframe = marketdata.split('/')[-1].split('_')[1]
-    broker = marketdata.split('/')[-1].split('_')[4][:-4]
+    ticker, timeframe, broker = parse_marketdata_name(marketdata)
+    if data_cfg.get('resample_minutes'):
+        timeframe = f"{data_cfg['resample_minutes']}M"
     print(ticker, timeframe, broker)
 
+    # Телеметрия этапов копится в памяти и пишется в папку прогона в конце
+    if config.get('telemetry', {}).get('enabled', False):
+        enable_telemetry()
+
     # Загрузка данных
     data = load_data(f'{dataset_path}/{marketdata}',
                      start_date=data_cfg["start_date"],
-                     end_date=data_cfg["end_date"])
+                     end_date=data_cfg["end_date"],
+                     store_root=data_cfg.get('store_path'))
+    # Нестандартный таймфрейм строится из базового ряда; кэш по отпечатку ряда переживает перезапуски
+    if data_cfg.get('resample_minutes'):
+        data = ResampleCache(cache_dir=data_cfg.get('resample_cache_dir')).get(data, data_cfg['resample_minutes'])
     # ---------- Пакет параметров для стратегии ----------
-    params = {
-        # -- основные индикаторы
-        "donchian_window": strategy_cfg["donchian_window"],  # Donchian
-        "rsi_period": strategy_cfg["rsi_period"],
-        "rsi_exit": strategy_cfg["rsi_exit"],
-        "cooldown_bars": strategy_cfg["cooldown_bars"],
-
-        # -- управление торговой сессией
-        "eod_exit": strategy_cfg["eod_exit"],
-        "trading_hours": {
-            "allowed": strategy_cfg["trading_hours"]["allowed"],
-            "allowed_days": strategy_cfg["trading_hours"].get("allowed_days")
-        },
-
-        # -- ATR-фильтр волатильности
-        "atr_enabled": strategy_cfg["atr_enabled"],
-        "atr_period": strategy_cfg["atr_period"],
-        "atr_threshold": strategy_cfg["atr_threshold"],
-        "atr_pct_threshold": strategy_cfg.get("atr_pct_threshold"),
-    }
+    params = build_params(config)
 
     filename = (f"{ticker}_{timeframe}_{data_cfg.get('start_date')}-{data_cfg.get('end_date')}_signals_"
                 f"dnch.w{params['donchian_window']}.rsi{params['rsi_period']}."
@@ -66,17 +58,31 @@ def main():
     destination = f"{out_cfg.get('destination_path', 'outputs')}/{folder_name}"
     os.makedirs(destination, exist_ok=True)
 
+    # Артефакты пишутся в фоне (npz/parquet/csv), пока считается статистика
+    writer = ArtifactWriter.from_config(destination, out_cfg)
     # filename = f"{marketdata.split('.')[0]}"
-    signals.to_csv(f"{destination}/{filename}.csv")
+    writer.write(filename, signals)
 
     # Рассчитываем статистику
-    stats = calculate_profit(signals, verbose=True, filename=f"{destination}/{filename}", params=params)
-    stats[:-3].to_csv(f"{destination}/{filename}_stats.csv")
-    stats._trades.to_csv(f"{destination}/{filename}_trades.csv")
-    shutil.copy2(source_config_path, f"{destination}/{os.path.basename(source_config_path)}")
+    # chart: bokeh — полный bt.plot(), lttb — прорежённый график Close/Equity, none — без графика
+    chart = out_cfg.get('chart', 'bokeh')
+    with stage('calculate_profit'):
+        stats = calculate_profit(signals, verbose=chart == 'bokeh', filename=f"{destination}/{filename}", params=params)
+    if chart != 'bokeh':
+        print(f'\n{stats_summary(stats)}')
+    with stage('write_artifacts', artifact='results'):
+        stats_summary(stats).to_csv(f"{destination}/{filename}_stats.csv")
+        writer.write(f"{filename}_trades", stats._trades)
+        if chart == 'lttb':
+            write_equity_chart(f"{destination}/{filename}.html", signals, stats, out_cfg.get('chart_points', 5000))
+        shutil.copy2(source_config_path, f"{destination}/{os.path.basename(source_config_path)}")
+        writer.close()
     # Печать критерия
-    criteria = stats['Equity Final [$]'] - 100_000 - stats['# Trades'] * 7
-    print(f"Criteria: {criteria}")
+    print(f"Criteria: {criteria(stats)}")
+
+    telemetry = disable_telemetry()
+    if telemetry is not None:
+        write_report(telemetry, destination)
 
 
 
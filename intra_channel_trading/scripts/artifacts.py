@@ -0,0 +1,190 @@
+import os
+import json
+import queue
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+# npz — сжатый поколоночный архив NumPy (без внешних зависимостей), parquet — при установленном pyarrow,
+# csv — прежний текстовый формат
+FORMATS = ('npz', 'parquet', 'csv')
+EXTENSIONS = {'npz': '.npz', 'parquet': '.parquet', 'csv': '.csv'}
+
+# Колонки состояний (-1/0/1) хранятся как int8
+INT8_COLUMNS = ('Signal', 'Entry')
+# Денежные колонки остаются float64: по ним потом суммируют PnL и строят эквити
+FLOAT64_COLUMNS = ('PnL', 'Commission', 'Equity')
+
+
+def compact_frame(frame, float32=True):
+    # Компактные типы: цены и индикаторы float64 -> float32 (для FX с 5 знаками хватает), сигналы -> int8
+    columns = {}
+    for name in frame.columns:
+        values = frame[name]
+        if name in INT8_COLUMNS and pd.api.types.is_integer_dtype(values):
+            values = values.astype(np.int8)
+        elif float32 and values.dtype == np.float64 and name not in FLOAT64_COLUMNS:
+            values = values.astype(np.float32)
+        columns[name] = values
+    return pd.DataFrame(columns, index=frame.index)
+
+
+def _encode(values):
+    # Колонка -> (массив для npz, вид), чтобы при чтении восстановить исходный тип
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.to_numpy(dtype='datetime64[ns]').view(np.int64), 'datetime'
+    if pd.api.types.is_timedelta64_dtype(values):
+        return values.to_numpy(dtype='timedelta64[ns]').view(np.int64), 'timedelta'
+    if values.dtype == object or pd.api.types.is_string_dtype(values):
+        if values.isna().all():  # SL/TP/Tag у backtesting.py без стопов и тегов
+            return np.full(len(values), np.nan), 'native'
+        return values.astype(str).to_numpy(dtype=str), 'str'
+    return values.to_numpy(), 'native'
+
+
+def _decode(values, kind):
+    if kind == 'datetime':
+        return pd.to_datetime(values.view('datetime64[ns]'))
+    if kind == 'timedelta':
+        return pd.to_timedelta(values.view('timedelta64[ns]'))
+    return values
+
+
+def write_frame(frame, path, fmt='npz', float32=True):
+    # path — без расширения; возвращает путь записанного файла
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат артефактов: {fmt!r}, допустимые: {FORMATS}")
+    path = f"{path}{EXTENSIONS[fmt]}"
+    if fmt == 'csv':
+        frame.to_csv(path)
+        return path
+
+    frame = compact_frame(frame, float32=float32)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if fmt == 'parquet':
+        frame.to_parquet(tmp_path, compression='zstd')
+    else:
+        arrays, kinds = {}, {}
+        index = frame.index.to_series()
+        arrays['__index__'], kinds['__index__'] = _encode(index)
+        for i, name in enumerate(frame.columns):
+            arrays[f"c{i}"], kinds[name] = _encode(frame[name])
+        meta = {'columns': [str(name) for name in frame.columns], 'kinds': kinds, 'index_name': frame.index.name}
+        arrays['__meta__'] = np.array(json.dumps(meta))
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_frame(path):
+    if path.endswith('.csv'):
+        return pd.read_csv(path, index_col=0)
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    with np.load(path, allow_pickle=False) as archive:
+        meta = json.loads(str(archive['__meta__']))
+        index = pd.Index(_decode(archive['__index__'], meta['kinds']['__index__']), name=meta['index_name'])
+        columns = {name: _decode(archive[f"c{i}"], meta['kinds'][name]) for i, name in enumerate(meta['columns'])}
+    return pd.DataFrame(columns, index=index)
+
+
+def stats_summary(stats):
+    # Статистика прогона без служебных полей (_equity_curve, _trades, _strategy)
+    return stats[[key for key in stats.index if not str(key).startswith('_')]]
+
+
+class ArtifactWriter:
+    # Запись артефактов в фоновом потоке: расчёт продолжается, пока сжимаются и пишутся файлы.
+    # Переданные в write() таблицы не должны изменяться после вызова. Ошибки записи поднимаются в close()
+    @classmethod
+    def from_config(cls, destination, out_cfg):
+        return cls(destination, fmt=out_cfg.get('artifact_format', 'csv'), float32=out_cfg.get('float32', True))
+
+    def __init__(self, destination, fmt='npz', float32=True, background=True):
+        self.destination = destination
+        self.fmt = fmt
+        self.float32 = float32
+        self.written = []
+        self._errors = []
+        self._queue = queue.Queue() if background else None
+        self._thread = None
+        if background:
+            self._thread = threading.Thread(target=self._run, name='artifact-writer', daemon=True)
+            self._thread.start()
+
+    def _write(self, name, frame):
+        try:
+            self.written.append(write_frame(frame, os.path.join(self.destination, name), self.fmt, self.float32))
+        except Exception as e:
+            self._errors.append((name, e))
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            self._write(*job)
+
+    def write(self, name, frame):
+        if self._queue is None:
+            self._write(name, frame)
+        else:
+            self._queue.put((name, frame))
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        if self._errors:
+            name, error = self._errors[0]
+            raise RuntimeError(f"Не удалось записать артефакт {name!r}") from error
+        return self.written
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def lttb(x, y, n_out):
+    # Largest-Triangle-Three-Buckets: индексы n_out точек, сохраняющих форму кривой
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        # Вершина C — среднее следующего бакета; выбираем точку бакета с наибольшей площадью треугольника A-B-C
+        cx, cy = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs((x[a] - cx) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (cy - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def write_equity_chart(path, signals, stats, n_points=5000):
+    # Лёгкая замена bt.plot() на миллион свечей: Close и Equity, прорежённые LTTB до n_points точек
+    from plotly.subplots import make_subplots
+
+    equity = stats['_equity_curve']['Equity']
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.6, 0.4], vertical_spacing=0.03)
+    for row, series, name in ((1, signals['Close'], 'Close'), (2, equity, 'Equity')):
+        x = series.index.asi8
+        keep = lttb(x, series.to_numpy(), n_points)
+        fig.add_scatter(x=series.index[keep], y=series.to_numpy()[keep], mode='lines', name=name,
+                        line=dict(width=1), row=row, col=1)
+    fig.update_layout(title=f"{os.path.basename(path)} (LTTB, {n_points} точек)", showlegend=True)
+    # plotly.js подгружается с CDN, чтобы файл графика весил сотни КБ, а не мегабайты
+    fig.write_html(path, include_plotlyjs='cdn')
+    return path
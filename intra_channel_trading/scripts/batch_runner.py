@@ -0,0 +1,156 @@
+import os
+import shutil
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import optuna
+import yaml
+
+from intra_channel_trading.auxiliary.fast_backtest import fast_backtest
+from intra_channel_trading.scripts.config_loader import load_config, build_params
+from intra_channel_trading.scripts.data_loader import load_data
+from intra_channel_trading.scripts.indicator_cache import IndicatorCache
+from intra_channel_trading.scripts.optimizer import suggest_signal_params
+from intra_channel_trading.scripts.resample import ResampleCache
+from intra_channel_trading.scripts.scoring import criteria
+from intra_channel_trading.scripts.shared_data import publish_market_data, attach_market_data
+from intra_channel_trading.scripts.strategy import donchian_rsi_exit_only
+
+
+AGGREGATES = {
+    'mean': np.mean,
+    'min': np.min,      # худший инструмент
+    'median': np.median,
+}
+
+
+# Состояние процесса-воркера: все наборы данных из общей памяти и общий кэш индикаторов
+_WORKER = {}
+
+
+def _init_worker(shared_dirs, params):
+    _WORKER['datasets'] = {name: attach_market_data(path) for name, path in shared_dirs.items()}
+    _WORKER['params'] = params
+    _WORKER['cache'] = IndicatorCache()
+
+
+def _run_one(name, signal_params):
+    data = _WORKER['datasets'][name]
+    signals = donchian_rsi_exit_only(data, signal_params, cache=_WORKER['cache'])
+    stats = fast_backtest(signals, params=_WORKER['params'])
+    return {
+        'dataset': name,
+        'criteria': criteria(stats),
+        'Return [%]': stats['Return [%]'],
+        'Sharpe Ratio': stats['Sharpe Ratio'],
+        'Max. Drawdown [%]': stats['Max. Drawdown [%]'],
+        'Win Rate [%]': stats['Win Rate [%]'],
+        '# Trades': stats['# Trades'],
+    }
+
+
+class BatchRunner:
+    # Наборы данных загружаются один раз, публикуются в общую память и обрабатываются пулом процессов
+    def __init__(self, datasets, params, work_dir, n_workers=1):
+        self.names = list(datasets)
+        self.params = params
+        self.work_dir = work_dir
+        self.n_workers = n_workers or os.cpu_count()
+        self.shared_dirs = {name: publish_market_data(data, os.path.join(work_dir, 'shared_data', str(i)))
+                            for i, (name, data) in enumerate(datasets.items())}
+        self.pool = ProcessPoolExecutor(max_workers=self.n_workers, initializer=_init_worker,
+                                        initargs=(self.shared_dirs, params))
+
+    def backtest(self, signal_params):
+        # Один набор параметров на всех инструментах
+        futures = [self.pool.submit(_run_one, name, signal_params) for name in self.names]
+        return pd.DataFrame([future.result() for future in futures])
+
+    def optimize(self, n_trials, aggregate='mean', seed=42, storage=None, study_name=None):
+        # Один study, целевая функция — агрегированный criteria по всем инструментам.
+        # Триалы запрашиваются пачками, пары (триал, инструмент) распределяются по всем воркерам
+        reduce = AGGREGATES[aggregate]
+        study = optuna.create_study(direction='maximize', sampler=optuna.samplers.TPESampler(seed=seed),
+                                    storage=storage, study_name=study_name, load_if_exists=True)
+        batch_size = max(1, self.n_workers // len(self.names))
+        done = 0
+        while done < n_trials:
+            trials = [study.ask() for _ in range(min(batch_size, n_trials - done))]
+            jobs = [[self.pool.submit(_run_one, name, suggest_signal_params(trial)) for name in self.names]
+                    for trial in trials]
+            for trial, futures in zip(trials, jobs):
+                try:
+                    rows = [future.result() for future in futures]
+                except Exception as e:
+                    print(f"Trial {trial.number} failed: {e!r}")
+                    study.tell(trial, state=optuna.trial.TrialState.FAIL)
+                    continue
+                for row in rows:
+                    trial.set_user_attr(f"criteria_{row['dataset']}", float(row['criteria']))
+                study.tell(trial, float(reduce([row['criteria'] for row in rows])))
+            done += len(trials)
+        return study
+
+    def close(self):
+        self.pool.shutdown()
+        shutil.rmtree(os.path.join(self.work_dir, 'shared_data'), ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    source_config_path = "../configs/config_donchian_rsi.yaml"
+    config = load_config(source_config_path)
+    data_cfg = config.get('data', {})
+    batch_cfg = config.get('batch', {})
+    params = build_params(config)
+
+    now = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+    destination_path = f"../outputs/batch_outputs/batch_{batch_cfg.get('mode', 'backtest')}_{now}"
+    os.makedirs(destination_path, exist_ok=True)
+
+    store_path = data_cfg.get('store_path')
+    resample_cache = ResampleCache(cache_dir=batch_cfg.get('resample_cache_dir'))
+    datasets = {}
+    for marketdata in batch_cfg.get('datasets') or [data_cfg['marketdata']]:
+        name = os.path.basename(marketdata).split('.')[0]
+        base = load_data(f"../{data_cfg['dataset_path']}/{marketdata}",
+                         start_date=data_cfg["start_date"],
+                         end_date=data_cfg["end_date"],
+                         store_root=f'../{store_path}' if store_path else None)
+        # Развёртка по таймфреймам: базовый файл читается один раз, производные ТФ берутся из кэша
+        for minutes in batch_cfg.get('resample_minutes') or [None]:
+            datasets[f"{name}@{minutes}M" if minutes else name] = (
+                resample_cache.get(base, minutes) if minutes else base)
+
+    n_workers = batch_cfg.get('n_workers', 1)
+    if n_workers in (0, -1, None):
+        n_workers = os.cpu_count()
+    aggregate = batch_cfg.get('aggregate', 'mean')
+    with BatchRunner(datasets, params, destination_path, n_workers=n_workers) as runner:
+        if batch_cfg.get('mode', 'backtest') == 'optimize':
+            study = runner.optimize(batch_cfg.get('n_trials', 20), aggregate=aggregate,
+                                    seed=config.get('optimization', {}).get('seed', 42))
+            best = dict(study.best_params, atr_enabled=True)
+            study.trials_dataframe().to_csv(f"{destination_path}/batch_trials.csv", index=False)
+            with open(f"{destination_path}/best_params.yaml", "w") as f:
+                yaml.dump(study.best_params, f, allow_unicode=True, sort_keys=False)
+            print(f"Best Parameters: {study.best_params}")
+        else:
+            best = params
+        table = runner.backtest(best)
+
+    table.to_csv(f"{destination_path}/batch_results.csv", index=False)
+    shutil.copy2(source_config_path, f"{destination_path}/{os.path.basename(source_config_path)}")
+    print(table.to_string(index=False))
+    print(f"\nConsolidated criteria ({aggregate}): {AGGREGATES[aggregate](table['criteria']):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+from intra_channel_trading.auxiliary.fast_backtest import LOT_SIZE
+from intra_channel_trading.auxiliary.session_masks import session_allowed
+from intra_channel_trading.scripts.indicator_cache import BATCH_INDICATORS
+from intra_channel_trading.scripts.market_arrays import MarketArrays
+from intra_channel_trading.scripts.scoring import composite_score
+from intra_channel_trading.scripts.signal_engine import njit
+
+
+# Параметры сигнала, которые меняются от набора к набору (остальное — общие торговые параметры)
+PARAM_KEYS = ('donchian_window', 'rsi_period', 'rsi_exit', 'cooldown_bars', 'atr_period', 'atr_threshold')
+INT_KEYS = ('donchian_window', 'rsi_period', 'rsi_exit', 'cooldown_bars', 'atr_period')
+# Колонки набора для score(): atr_enabled задаётся явно, а не берётся из торговых params
+COMBO_KEYS = PARAM_KEYS + ('atr_enabled',)
+# Колонки результата ядра: метрики composite_score + сделки и итоговая эквити
+METRIC_KEYS = ('Return [%]', 'Sharpe Ratio', 'Win Rate [%]', 'Profit Factor', 'Expectancy [%]',
+               'Max. Drawdown [%]', '# Trades', 'Equity Final [$]')
+# Колонки результата score(): метрики ядра + Score, посчитанный тем же composite_score (scripts/scoring.py)
+STAT_KEYS = METRIC_KEYS + ('Score',)
+# Наборов параметров на один вызов ядра (единица работы потока)
+BLOCK = 64
+
+
+@njit(cache=True, nogil=True)
+def _score_kernel(open_, close, allowed, day_last, upper, lower, rsi, atr, first, w_col, r_col, a_col,
+                  rsi_exit, cooldown_bars, atr_threshold, annual_days, eod_exit, cash, lot_size, commission,
+                  day_returns, out):
+    # Сигналы -> позиция -> эквити, сделки и дневные доходности -> метрики METRIC_KEYS за один проход
+    # по барам на набор параметров, без промежуточных массивов длины истории. Те же формулы, что и в
+    # exit_only_signals + position_from_signals + _bar_pnl + _trade_arrays + _compute_stats.
+    # a_col < 0 — ATR-фильтр выключен; первые бары [0, first) — прогрев индикаторов набора
+    n = close.shape[0]
+    for k in range(first.shape[0]):
+        start, w, r, a = first[k], w_col[k], r_col[k], a_col[k]
+        cooldown = cooldown_bars[k]
+        short = False
+        last_entry = -cooldown
+        signal = 1
+        decision = 0
+        held = 0
+        running = 0.0
+        peak = cash
+        max_dd = 0.0
+        equity = cash + running  # на первом баре позиции нет: эквити = cash
+        entry_price = 0.0
+        direction = 0
+        n_trades = 0
+        wins = 0
+        gain_sum = 0.0
+        loss_sum = 0.0
+        return_sum = 0.0
+        n_days = 0
+        prev_daily = np.nan
+        upper_w, lower_w, rsi_r = upper[w], lower[w], rsi[r]
+        atr_a = atr[max(a, 0)]
+        for i in range(start, n):
+            j = i - start
+            prev_signal = signal
+            # Машина состояний сигнала (exit_only_signals)
+            if j == 0:
+                signal = 1
+            elif a >= 0 and atr_a[i] < atr_threshold[k]:
+                signal = 0
+            elif (not short) and (j - last_entry >= cooldown) and close[i] > upper_w[i - 1]:
+                signal = -1
+                short = True
+                last_entry = j
+            elif short and (close[i] < lower_w[i - 1] or rsi_r[i] < rsi_exit[k]):
+                short = False
+                signal = 1
+
+            # Позиция: решение на смене сигнала, исполнение по Open следующего бара (position_from_signals)
+            prev_held = held
+            held = decision
+            if j > 0 and signal != prev_signal:
+                decision = 0 if (eod_exit and not allowed[i]) else signal
+
+            # Эквити и сделки (_bar_pnl, _trade_arrays)
+            prev_close = close[i - 1] if j > 0 else close[i]
+            n_fills = 0
+            if held != prev_held:
+                if prev_held != 0:
+                    n_fills += 1
+                    exit_price = open_[i]
+                    commissions = commission * lot_size * (entry_price + exit_price)
+                    pnl = direction * lot_size * (exit_price - entry_price) - commissions
+                    ret = direction * (exit_price / entry_price - 1) - commissions / (lot_size * entry_price)
+                    n_trades += 1
+                    if pnl > 0:
+                        wins += 1
+                    if ret > 0:
+                        gain_sum += ret
+                    elif ret < 0:
+                        loss_sum += ret
+                    return_sum += ret
+                if held != 0:
+                    n_fills += 1
+                    entry_price = open_[i]
+                    direction = held
+            # Вне позиции приращение — ±0.0: эквити, пик и просадка не меняются
+            if held != 0 or prev_held != 0:
+                delta = lot_size * (prev_held * (open_[i] - prev_close) + held * (close[i] - open_[i]))
+                delta -= commission * lot_size * open_[i] * n_fills
+                running += delta
+                equity = cash + running
+                if equity > peak:
+                    peak = equity
+                elif equity < peak:
+                    dd = 1 - equity / peak  # деление — только в просадке
+                    if dd > max_dd:
+                        max_dd = dd
+
+            # Дневные доходности по эквити на последнем баре дня (_day_returns)
+            if day_last[i]:
+                if prev_daily == prev_daily:
+                    value = equity / prev_daily - 1
+                    if value == value:
+                        day_returns[n_days] = value
+                        n_days += 1
+                prev_daily = equity
+
+        # Метрики (_compute_stats)
+        return_pct = (equity - cash) / cash * 100
+        gmean = np.nan
+        if n_days:
+            log_sum = 0.0
+            gmean = 0.0
+            for d in range(n_days):
+                if day_returns[d] + 1 <= 0:
+                    log_sum = np.nan
+                    break
+                log_sum += np.log(day_returns[d] + 1)
+            if log_sum == log_sum:
+                gmean = np.exp(log_sum / n_days) - 1
+        annualized = ((1 + gmean) ** annual_days[k] - 1) * 100
+        day_var = np.nan
+        if n_days > 1:
+            mean = 0.0
+            for d in range(n_days):
+                mean += day_returns[d]
+            mean /= n_days
+            day_var = 0.0
+            for d in range(n_days):
+                day_var += (day_returns[d] - mean) ** 2
+            day_var /= n_days - 1
+        volatility = np.sqrt((day_var + (1 + gmean) ** 2) ** annual_days[k]
+                             - (1 + gmean) ** (2 * annual_days[k])) * 100
+        sharpe = annualized / volatility if volatility != 0 else np.nan
+        win_rate = wins / n_trades * 100 if n_trades else np.nan
+        profit_factor = gain_sum / abs(loss_sum) if loss_sum != 0 else np.nan
+        expectancy = return_sum / n_trades * 100 if n_trades else np.nan
+        drawdown = -max_dd * 100
+
+        out[k, 0] = return_pct
+        out[k, 1] = sharpe
+        out[k, 2] = win_rate
+        out[k, 3] = profit_factor
+        out[k, 4] = expectancy
+        out[k, 5] = drawdown
+        out[k, 6] = n_trades
+        out[k, 7] = equity
+
+
+def _first_valid(values):
+    # Первый бар без NaN; -1, если NaN встречаются и после прогрева (такой ряд ядру не подходит)
+    nan = np.isnan(values)
+    first = int(np.argmax(~nan)) if not nan.all() else len(values)
+    return first if not nan[first:].any() else -1
+
+
+def _annual_trading_days(index):
+    # Как в _compute_stats: 252 торговых дня для рядов без выходных, 365 — с выходными
+    have_weekends = np.isin(index.dayofweek.to_numpy(), (5, 6)).mean() > 2 / 7 * .6
+    return 365 if have_weekends else 252
+
+
+class BatchScorer:
+    # composite_score для тысяч наборов параметров сигнала на одном наборе данных.
+    # Индикаторы — общие матрицы (периоды × бары), рассчитанные один раз пакетными функциями (или взятые
+    # из IndicatorCache); ядро проходит по барам один раз на набор и отпускает GIL, блоки наборов идут
+    # в потоках. Score совпадает с score_signal_params до ~1e-14 относительной ошибки, Sharpe Ratio — до ~1e-11
+    # (суммы по сделкам и дням — последовательные, а не попарные, как в NumPy); наборы, которые ядро не покрывает,
+    # считаются точным путём MarketArrays. Сверка с точным путём — tests/test_batch_scorer_parity.py
+    def __init__(self, data, params, cache=None, n_workers=1, cash=100_000, commission=0.00, lot_size=LOT_SIZE):
+        self.data = data
+        self.params = params
+        self.cache = cache
+        self.n_workers = max(1, int(n_workers or 1))
+        self.cash, self.commission, self.lot_size = float(cash), float(commission), float(lot_size)
+        self.index = data.index
+        self.open = np.ascontiguousarray(data['Open'].to_numpy(dtype=np.float64))
+        self.close = np.ascontiguousarray(data['Close'].to_numpy(dtype=np.float64))
+        self.base_first = _first_valid(np.where(data.notna().all(axis=1).to_numpy(), 0.0, np.nan))
+        eod_exit = bool(params.get('eod_exit'))
+        self.eod_exit = eod_exit
+        self.allowed = (session_allowed(self.index, params.get('trading_hours')) if eod_exit
+                        else np.ones(len(self.index), dtype=bool))
+        days = self.index.normalize().asi8
+        self.day_last = np.r_[days[1:] != days[:-1], True]
+        self.n_days = int(self.day_last.sum())
+        # Период бара для годовой нормировки: недельные и более редкие ряды ядро не поддерживает
+        period = pd.Series(self.index[-100:]).diff().dropna().median()
+        self.supported = self.base_first >= 0 and period.days not in (7, 31, 365)
+        self._matrices = {}
+        self._annual = {}
+
+    def _matrix(self, name, periods):
+        # (колонки индикатора) матриц периоды × бары и номер строки для каждого периода; повторно не считаются
+        periods = sorted({int(p) for p in periods})
+        cached = self._matrices.get(name)
+        if cached is None or not set(periods) <= set(cached[0]):
+            if cached is not None:
+                periods = sorted(set(periods) | set(cached[0]))
+            if self.cache is not None:
+                self.cache.prefill(self.data, name, periods)
+                columns = [self.cache.get(self.data, name, p) for p in periods]
+                matrices = tuple(np.stack([c[i] for c in columns]).astype(np.float64, copy=False)
+                                 for i in range(columns[0].shape[0]))
+            else:
+                matrices = tuple(np.ascontiguousarray(m.T) for m in BATCH_INDICATORS[name](self.data, periods))
+            firsts = [max(_first_valid(row) for row in rows) if min(_first_valid(row) for row in rows) >= 0 else -1
+                      for rows in zip(*matrices)]
+            cached = self._matrices[name] = (periods, matrices, dict(zip(periods, firsts)))
+        return cached
+
+    def _annual_days(self, first):
+        days = self._annual.get(first)
+        if days is None:
+            days = self._annual[first] = _annual_trading_days(self.index[first:])
+        return days
+
+    def score(self, combos):
+        # combos — DataFrame (или список словарей) с колонками PARAM_KEYS и, необязательно, atr_enabled
+        # (по умолчанию — как в params); возвращает DataFrame STAT_KEYS в том же порядке.
+        # Score считается тем же composite_score, что и в оптимизаторе, по метрикам ядра
+        combos = pd.DataFrame(combos).reset_index(drop=True)
+        m = len(combos)
+        out = np.full((m, len(METRIC_KEYS)), np.nan)
+        if m == 0:
+            return pd.DataFrame(out, columns=list(METRIC_KEYS)).assign(Score=np.nan)
+        if 'atr_enabled' in combos:
+            atr_on = combos['atr_enabled'].fillna(False).astype(bool).to_numpy()
+        else:
+            atr_on = np.full(m, bool(self.params.get('atr_enabled', True)))
+
+        donchian = self._matrix('donchian', combos['donchian_window'])
+        rsi = self._matrix('rsi', combos['rsi_period'])
+        atr = self._matrix('atr', combos.loc[atr_on, 'atr_period']) if atr_on.any() else None
+        w_col = np.searchsorted(donchian[0], combos['donchian_window'].to_numpy(dtype=np.int64))
+        r_col = np.searchsorted(rsi[0], combos['rsi_period'].to_numpy(dtype=np.int64))
+        a_col = np.full(m, -1, dtype=np.int64)
+        if atr is not None:
+            a_col[atr_on] = np.searchsorted(atr[0], combos.loc[atr_on, 'atr_period'].to_numpy(dtype=np.int64))
+
+        firsts = np.empty(m, dtype=np.int64)
+        for k, (w, r, a, on) in enumerate(zip(combos['donchian_window'], combos['rsi_period'],
+                                              combos['atr_period'], atr_on)):
+            parts = [self.base_first, donchian[2][int(w)], rsi[2][int(r)]] + ([atr[2][int(a)]] if on else [])
+            firsts[k] = max(parts) if min(parts) >= 0 else -1
+        fast = (firsts >= 0) & (firsts < len(self.index)) if self.supported else np.zeros(m, dtype=bool)
+        annual = np.array([self._annual_days(int(f)) if ok else 0 for f, ok in zip(firsts, fast)], dtype=np.float64)
+        rsi_exit = combos['rsi_exit'].to_numpy(dtype=np.float64)
+        cooldown = combos['cooldown_bars'].to_numpy(dtype=np.int64)
+        threshold = combos['atr_threshold'].fillna(0.0).to_numpy(dtype=np.float64)
+        atr_matrix = atr[1][0] if atr is not None else np.empty((1, 1))
+
+        def run(block):
+            rows = block[fast[block]]
+            if len(rows):
+                result = np.empty((len(rows), len(METRIC_KEYS)))
+                _score_kernel(self.open, self.close, self.allowed, self.day_last, donchian[1][0], donchian[1][1],
+                              rsi[1][0], atr_matrix, firsts[rows], w_col[rows], r_col[rows], a_col[rows],
+                              rsi_exit[rows], cooldown[rows], threshold[rows], annual[rows], self.eod_exit,
+                              self.cash, self.lot_size, self.commission, np.empty(self.n_days + 1), result)
+                out[rows] = result
+
+        blocks = [np.arange(lo, min(lo + BLOCK, m)) for lo in range(0, m, BLOCK)]
+        if self.n_workers > 1 and len(blocks) > 1:
+            with ThreadPoolExecutor(max_workers=self.n_workers) as pool:
+                list(pool.map(run, blocks))
+        else:
+            for block in blocks:
+                run(block)
+
+        # Редкие случаи (NaN внутри ряда, недельный ТФ) — точным путём, по одному набору
+        slow = np.flatnonzero(~fast)
+        if len(slow):
+            out[slow] = self._score_exact(combos.iloc[slow])
+        table = pd.DataFrame(out, columns=list(METRIC_KEYS))
+        table['Score'] = composite_score(table)
+        return table
+
+    def _score_exact(self, combos):
+        from intra_channel_trading.scripts.indicator_cache import IndicatorCache
+
+        market = MarketArrays(self.data, self.cache or IndicatorCache())
+        rows = []
+        for signal_params in combos.to_dict('records'):
+            signal_params.setdefault('atr_enabled', bool(self.params.get('atr_enabled', True)))
+            signal_params = {key: (int(value) if key in INT_KEYS else value) for key, value in signal_params.items()}
+            stats = market.backtest(*market.signals(signal_params), params=self.params)
+            rows.append([stats[key] for key in METRIC_KEYS])
+        return np.array(rows, dtype=np.float64)
@@ -0,0 +1,212 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import datetime
+import tempfile
+import tracemalloc
+import subprocess
+
+import numpy as np
+import pandas as pd
+
+from intra_channel_trading.auxiliary.fast_backtest import fast_backtest
+from intra_channel_trading.scripts.chunked import run_chunked
+from intra_channel_trading.scripts.data_loader import load_data
+from intra_channel_trading.scripts.indicator_cache import IndicatorCache
+from intra_channel_trading.scripts.market_arrays import MarketArrays
+from intra_channel_trading.scripts.indicators import calculate_donchian, calculate_rsi, calculate_atr
+from intra_channel_trading.scripts.optimizer import score_signal_params
+from intra_channel_trading.scripts.strategy import donchian_rsi_exit_only
+
+
+# Размеры выборок: от месяца до всей истории (None — весь источник)
+SIZES = {
+    '1M': '30D',
+    '1Y': '365D',
+    '5Y': '1826D',
+    'full': None,
+}
+
+# Фиксированные параметры, чтобы прогоны на разных коммитах были сравнимы
+BENCH_PARAMS = {
+    "donchian_window": 11,
+    "rsi_period": 18,
+    "rsi_exit": 42,
+    "cooldown_bars": 8,
+    "eod_exit": False,
+    "trading_hours": {"allowed": [[0, 11], [16, 24]], "allowed_days": [0, 1, 4]},
+    "atr_enabled": True,
+    "atr_period": 20,
+    "atr_threshold": 0.0001,
+    "atr_pct_threshold": None,
+}
+
+# Медленные сценарии (backtesting.py) на больших выборках прогоняются один раз
+SLOW_CASES = ('calculate_profit',)
+
+
+def synthetic_ohlc(n_bars, freq='20min', start='2005-01-03', seed=0, price=1.2, volatility=0.0008):
+    # Случайное блуждание с OHLC внутри бара; выходные (сб, вс) пропускаются, как у форекс-котировок
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start, periods=int(n_bars * 1.45) + 1, freq=freq, name='Datetime')
+    index = index[index.dayofweek < 5][:n_bars]
+    steps = rng.normal(0.0, volatility, len(index))
+    close = price * np.exp(np.cumsum(steps))
+    open_ = np.r_[price, close[:-1]]
+    spread = np.abs(rng.normal(0.0, volatility, len(index))) * close
+    high = np.maximum(open_, close) + spread
+    low = np.minimum(open_, close) - spread
+    volume = rng.integers(50, 1000, len(index)).astype(float)
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume}, index=index)
+
+
+def synthetic_history(start='2005-01-01', end='2026-01-01', freq='20min', seed=0):
+    # Синтетический аналог полного архива 2005–2026 на том же таймфрейме
+    n_bars = int((pd.Timestamp(end) - pd.Timestamp(start)) / pd.Timedelta(freq) * 5 / 7)
+    return synthetic_ohlc(n_bars, freq=freq, start=start, seed=seed)
+
+
+def slice_tail(data, period):
+    if period is None:
+        return data
+    return data[data.index > data.index[-1] - pd.Timedelta(period)]
+
+
+def _measure(func, repeat):
+    # Время (min/median по repeat запускам) и пик памяти Python/NumPy (tracemalloc, отдельный запуск)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'min_s': min(times), 'median_s': float(np.median(times)), 'repeat': repeat,
+            'peak_mb': peak / 2 ** 20}
+
+
+def make_cases(data, work_dir):
+    # Сценарии для одной выборки: имя -> функция без аргументов
+    csv_path = os.path.join(work_dir, f"bench_{len(data)}.csv")
+    data.to_csv(csv_path)
+    start, end = str(data.index[0]), str(data.index[-1])
+    params_no_atr = dict(BENCH_PARAMS, atr_enabled=False)
+    signals = donchian_rsi_exit_only(data, BENCH_PARAMS)
+    market = MarketArrays(data, IndicatorCache())
+
+    def calculate_profit_case():
+        from intra_channel_trading.auxiliary.utils import calculate_profit
+        calculate_profit(signals, params=BENCH_PARAMS)
+
+    return {
+        'load_data': lambda: load_data(csv_path, start, end),
+        'load_data[store]': lambda: load_data(csv_path, start, end, store_root=os.path.join(work_dir, 'store')),
+        'calculate_donchian': lambda: calculate_donchian(data.copy(), BENCH_PARAMS['donchian_window']),
+        'calculate_rsi': lambda: calculate_rsi(data.copy(), BENCH_PARAMS['rsi_period']),
+        'calculate_atr': lambda: calculate_atr(data.copy(), BENCH_PARAMS['atr_period']),
+        'donchian_rsi_exit_only[atr=off]': lambda: donchian_rsi_exit_only(data, params_no_atr),
+        'donchian_rsi_exit_only[atr=on]': lambda: donchian_rsi_exit_only(data, BENCH_PARAMS),
+        'fast_backtest': lambda: fast_backtest(signals, params=BENCH_PARAMS),
+        'calculate_profit': calculate_profit_case,
+        # Прогон целиком от файла: загрузка -> сигналы -> fast_backtest, весь ряд в памяти или кусками
+        'pipeline': lambda: fast_backtest(donchian_rsi_exit_only(load_data(csv_path, start, end), BENCH_PARAMS),
+                                          params=BENCH_PARAMS),
+        'pipeline[chunked]': lambda: run_chunked(csv_path, BENCH_PARAMS, start, end, collect=False),
+        # Один триал оптимизатора целиком: индикаторы (холодный кэш) -> сигналы -> бэктест -> score
+        'optimizer_trial': lambda: score_signal_params(data, BENCH_PARAMS, BENCH_PARAMS, cache=IndicatorCache()),
+        # Триал в цикле оптимизатора: индикаторы уже в кэше, сигналы и бэктест на структуре массивов
+        'optimizer_trial[soa]': lambda: score_signal_params(data, BENCH_PARAMS, BENCH_PARAMS, market=market),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(source, sizes=None, cases=None, repeat=3, verbose=True):
+    sizes = sizes or list(SIZES)
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in sizes:
+            data = slice_tail(source, SIZES[size])
+            for name, func in make_cases(data, work_dir).items():
+                if cases and name not in cases:
+                    continue
+                func()  # прогрев: JIT Numba, построение хранилища, импорт модулей
+                n = 1 if name in SLOW_CASES and size != '1M' else repeat
+                row = {'case': name, 'size': size, 'bars': len(data)}
+                row.update(_measure(func, n))
+                results.append(row)
+                if verbose:
+                    print(f"{name:<34} {size:>5} {len(data):>9} bars  "
+                          f"min {row['min_s'] * 1000:10.2f} ms  peak {row['peak_mb']:8.1f} MB")
+    return results
+
+
+def compare(base_path, new_path):
+    # Сравнение двух JSON-отчётов (например, до и после коммита): отношение времени и памяти new/base
+    with open(base_path, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+    key = ['case', 'size']
+    table = pd.DataFrame(base['results']).merge(pd.DataFrame(new['results']), on=key, suffixes=('_base', '_new'))
+    table['time_ratio'] = table['min_s_new'] / table['min_s_base']
+    table['mem_ratio'] = table['peak_mb_new'] / table['peak_mb_base']
+    print(f"base: {base['meta'].get('commit')}  new: {new['meta'].get('commit')}")
+    print(table[key + ['min_s_base', 'min_s_new', 'time_ratio', 'peak_mb_base', 'peak_mb_new', 'mem_ratio']]
+          .to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк этапов конвейера: время и пик памяти на разных объёмах данных")
+    parser.add_argument('--data', help="CSV/zip с котировками (по умолчанию — синтетический ряд 2005–2026, 20M)")
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=list(SIZES))
+    parser.add_argument('--cases', nargs='+', help="Только указанные сценарии")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="JSON-отчёт (по умолчанию bench_<commit>_<время>.json)")
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help="Сравнить два JSON-отчёта")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if args.data:
+        source = load_data(args.data, '2005-01-01', '2026-12-31')
+    else:
+        source = synthetic_history()
+
+    commit = git_commit()
+    meta = {
+        'commit': commit,
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'source': args.data or 'synthetic',
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+    results = run_benchmarks(source, sizes=args.sizes, cases=args.cases, repeat=args.repeat)
+
+    output = args.output or f"bench_{commit or 'nogit'}_{datetime.datetime.now():%Y%m%d%H%M%S}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=2)
+    print(f"\nОтчёт: {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
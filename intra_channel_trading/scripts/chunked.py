@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+
+from intra_channel_trading.auxiliary.fast_backtest import BacktestState, extend_backtest, backtest_stats
+from intra_channel_trading.scripts.data_loader import iter_data
+from intra_channel_trading.scripts.indicators import _rolling_extreme_batch, _rolling_mean_resume_kernel
+from intra_channel_trading.scripts.signal_engine import (_exit_only_resume_kernel, _exit_only_resume_kernel_nb,
+                                                         resolve_engine)
+from intra_channel_trading.scripts.telemetry import profiled
+
+
+# Баров в куске по умолчанию: ~50 тыс. баров — единицы мегабайт на кусок вместе с индикаторами
+CHUNK_BARS = 50_000
+
+
+class _RollingMean:
+    # rolling(period).mean() по кускам: последние period значений ряда + состояние суммы Кэхэна
+    def __init__(self, period):
+        self.period = int(period)
+        self.istate = np.zeros(5, dtype=np.int64)
+        self.fstate = np.zeros(4)
+        self.tail = np.empty(0)
+
+    def update(self, values):
+        values = np.concatenate([self.tail, values])
+        out = np.empty(len(values) - len(self.tail))
+        _rolling_mean_resume_kernel(values, len(self.tail), self.period, self.istate, self.fstate, out)
+        self.tail = values[-self.period:].copy()
+        return out
+
+
+class _RollingExtreme:
+    # rolling(window).max()/min() по кускам: перекрытие в window - 1 последних значений
+    def __init__(self, window, func):
+        self.window = int(window)
+        self.func = func
+        self.tail = np.empty(0)
+
+    def update(self, values):
+        values = np.concatenate([self.tail, values])
+        if len(values) >= self.window:
+            out = _rolling_extreme_batch(values, [self.window], self.func)[len(self.tail):, 0]
+        else:
+            out = np.full(len(values) - len(self.tail), np.nan)  # история ещё короче окна
+        self.tail = values[max(0, len(values) - self.window + 1):].copy() if self.window > 1 else np.empty(0)
+        return out
+
+
+class ChunkedDonchianRsi:
+    # donchian_rsi_exit_only по кускам баров. Через границу куска переносятся перекрытие рядов длиной
+    # в самый длинный период (Donchian/RSI/ATR), состояние скользящих средних, значения индикаторов
+    # последнего бара (для сдвига на бар) и машина сигналов — результат совпадает с пакетным бит в бит
+    def __init__(self, params, engine='auto'):
+        engine = resolve_engine(engine)
+        if engine == 'pandas':
+            raise ValueError("ChunkedDonchianRsi работает только с движками 'numba' и 'numpy'")
+        self._kernel = _exit_only_resume_kernel_nb if engine == 'numba' else _exit_only_resume_kernel
+        self.atr_enabled = bool(params.get('atr_enabled'))
+        self.atr_threshold = float(params.get('atr_threshold') or 0.0)
+        self.rsi_exit = float(params.get('rsi_exit'))
+        self.cooldown_bars = int(params.get('cooldown_bars'))
+
+        self._upper = _RollingExtreme(params.get('donchian_window'), np.maximum)
+        self._lower = _RollingExtreme(params.get('donchian_window'), np.minimum)
+        self._gain = _RollingMean(params.get('rsi_period'))
+        self._loss = _RollingMean(params.get('rsi_period'))
+        self._atr = _RollingMean(params.get('atr_period')) if self.atr_enabled else None
+        self._close = np.nan
+        self._raw = {'RSI': np.nan, 'Upper': np.nan, 'Lower': np.nan, 'ATR': np.nan}
+
+        # Последний оставленный (после dropna) бар: Close, RSI, Upper, Lower, ATR, Signal; last_entry — от него
+        self._last = None
+        self._short = False
+        self._last_entry = 0
+
+    def _indicators(self, chunk):
+        high = chunk['High'].to_numpy(dtype=np.float64)
+        low = chunk['Low'].to_numpy(dtype=np.float64)
+        close = chunk['Close'].to_numpy(dtype=np.float64)
+        prev_close = np.r_[self._close, close[:-1]]
+        delta = close - prev_close
+        gain = self._gain.update(np.where(delta > 0, delta, 0.0))
+        loss = self._loss.update(-np.where(delta < 0, delta, 0.0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            raw = {'RSI': 100 - (100 / (1 + gain / loss))}
+        raw['Upper'] = self._upper.update(high)
+        raw['Lower'] = self._lower.update(low)
+        if self.atr_enabled:
+            tr = np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+            raw['ATR'] = self._atr.update(tr)
+        self._close = close[-1]
+
+        # Аналог .shift(1): первый бар куска получает значение последнего бара предыдущего
+        columns = {}
+        for name, values in raw.items():
+            columns[name] = np.r_[self._raw[name], values[:-1]]
+            self._raw[name] = values[-1]
+        return columns
+
+    def update(self, chunk):
+        # Очередной кусок баров (в порядке времени) -> строки с индикаторами и Signal/Entry,
+        # как у donchian_rsi_exit_only (бары прогрева и с NaN отброшены)
+        dataset = chunk.copy()
+        if not len(dataset):
+            return dataset
+        for name, values in self._indicators(dataset).items():
+            dataset[name] = values
+        dataset = dataset[dataset.notna().all(axis=1).to_numpy()]
+        if not len(dataset):
+            return dataset
+
+        names = ('Close', 'RSI', 'Upper', 'Lower') + (('ATR',) if self.atr_enabled else ())
+        arrays = [dataset[name].to_numpy(dtype=np.float64) for name in names]
+        if self._last is None:
+            signal = np.empty(len(dataset), dtype=np.int64)
+            signal[0] = 1
+            short, last_entry = False, -self.cooldown_bars
+        else:
+            arrays = [np.r_[self._last[name], values] for name, values in zip(names, arrays)]
+            signal = np.empty(len(dataset) + 1, dtype=np.int64)
+            signal[0] = self._last['Signal']
+            short, last_entry = self._short, self._last_entry
+        entry = np.empty_like(signal)
+        close, rsi, upper, lower = arrays[:4]
+        atr = arrays[4] if self.atr_enabled else close
+        short, last_entry = self._kernel(close, rsi, upper, lower, atr, self.atr_enabled, self.atr_threshold,
+                                         self.rsi_exit, self.cooldown_bars, short, last_entry, signal, entry)
+
+        skip = len(signal) - len(dataset)
+        self._short, self._last_entry = bool(short), int(last_entry) - (len(signal) - 1)
+        self._last = {name: values[-1] for name, values in zip(names, arrays)}
+        self._last['Signal'] = int(signal[-1])
+        dataset['Signal'] = signal[skip:]
+        if self.atr_enabled:
+            dataset['Entry'] = entry[skip:]
+        return dataset
+
+
+@profiled()
+def run_chunked(file_path, params, start_date, end_date, chunk_bars=CHUNK_BARS, store_root=None, engine='auto',
+                sink=None, collect=True):
+    # Загрузка -> индикаторы -> сигналы -> fast_backtest кусками по chunk_bars баров источника (CSV, zip или
+    # поколоночное хранилище). В памяти — один кусок, перекрытия окон и эквити/сделки бэктеста.
+    # sink(frame) получает сигналы каждого куска; collect=False — не собирать их в общий DataFrame.
+    # Возвращает (signals | None, stats) — те же, что donchian_rsi_exit_only + fast_backtest на load_data
+    strategy = ChunkedDonchianRsi(params, engine)
+    state = BacktestState()
+    index_parts, frames = [], []
+    for chunk in iter_data(file_path, start_date, end_date, chunk_bars=chunk_bars, store_root=store_root):
+        frame = strategy.update(chunk)
+        if not len(frame):
+            continue
+        extend_backtest(state, frame.index, frame['Open'].to_numpy(), frame['Close'].to_numpy(),
+                        frame['Signal'].to_numpy(), params)
+        index_parts.append(frame.index)
+        if sink is not None:
+            sink(frame)
+        if collect:
+            frames.append(frame)
+
+    if not index_parts:
+        return None, None
+    stats = backtest_stats(state, index_parts[0].append(index_parts[1:]))
+    return (pd.concat(frames) if collect else None), stats
@@ -4,3 +4,34 @@ import yaml
 def load_config(path='config_donchian_rsi.yaml'):
     with open(path, 'r', encoding='utf-8') as f:  # Указываем кодировку 'utf-8'
         return yaml.safe_load(f)
+
+
+def build_params(config):
+    # Пакет параметров стратегии и торговой сессии из секции strategy — один для всех точек входа
+    strategy_cfg = config.get('strategy', {})
+    return {
+        # -- основные индикаторы
+        "donchian_window": strategy_cfg["donchian_window"],
+        "rsi_period": strategy_cfg["rsi_period"],
+        "rsi_exit": strategy_cfg["rsi_exit"],
+        "cooldown_bars": strategy_cfg["cooldown_bars"],
+
+        # -- управление торговой сессией
+        "eod_exit": strategy_cfg["eod_exit"],
+        "trading_hours": {
+            "allowed": strategy_cfg["trading_hours"]["allowed"],
+            "allowed_days": strategy_cfg["trading_hours"].get("allowed_days")
+        },
+
+        # -- ATR-фильтр волатильности
+        "atr_enabled": strategy_cfg["atr_enabled"],
+        "atr_period": strategy_cfg["atr_period"],
+        "atr_threshold": strategy_cfg["atr_threshold"],
+        "atr_pct_threshold": strategy_cfg.get("atr_pct_threshold"),
+    }
+
+
+def parse_marketdata_name(marketdata):
+    # EURGBP_5M_2010-01-04_2025-05-29_MetaQuotes-Demo.csv -> ('EURGBP', '5M', 'MetaQuotes-Demo')
+    parts = marketdata.split('/')[-1].split('_')
+    return parts[0], parts[1], parts[4][:-4]
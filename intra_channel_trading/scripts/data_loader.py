@@ -1,29 +1,80 @@
 
 import pandas as pd
 
+from .market_store import (read_source, read_source_tail, iter_source, normalize_ohlc, store_dir_for, is_fresh,
+                           ingest, load_range, iter_range)
+from .telemetry import profiled
+
 # def load_data(data_path, start_date, end_date):
 #     data = pd.read_csv(data_path, parse_dates=True, index_col="timestamp")
 #     data = data[(data.index >= start_date) & (data.index <= end_date)]
 #     return data
 
+@profiled()
 def load_data(file_path,
               start_date, end_date,
-              verbose=False):
-    df = pd.read_csv(file_path)
-    df['Open'] = df['Open'].astype(float)
-    df['High'] = df['High'].astype(float)
-    df['Low'] = df['Low'].astype(float)
-    df['Close'] = df['Close'].astype(float)
-    # df['Datetime'] = df['Date'].str.replace('.', '-') + ' ' + df['Time'] + ':00'
-    # df = df.drop(columns=['Date', 'Time'])
-    df['Datetime'] = pd.to_datetime(df['Datetime'])
-    df = df.sort_values(by=['Datetime'])
-    df.drop_duplicates(subset=['Datetime'], keep='first', inplace=True)
-    df.set_index('Datetime', inplace=True)
-    # Filter data by date
-    dataset = df.copy()
-    dataset = dataset[(dataset.index >= start_date) & (dataset.index <= end_date)]
+              verbose=False,
+              store_root=None,
+              columns=None):
+    if store_root:
+        # Поколоночное хранилище: читаются только годы и колонки, попадающие в запрос.
+        # При первом обращении (или если исходный файл изменился) хранилище строится заново
+        store_dir = store_dir_for(file_path, store_root)
+        if not is_fresh(store_dir, file_path):
+            ingest(file_path, store_root)
+        dataset = load_range(store_dir, start_date, end_date, columns=columns)
+    else:
+        df = normalize_ohlc(read_source(file_path))
+        # Filter data by date
+        dataset = df.copy()
+        dataset = dataset[(dataset.index >= start_date) & (dataset.index <= end_date)]
+        if columns:
+            dataset = dataset[list(columns)]
     if verbose:
         dataset.plot(y='Close', use_index=True, title=f'Dataset from {start_date} to {end_date}')
         plt.show()
-    return dataset
\ No newline at end of file
+    return dataset
+
+
+@profiled()
+def load_tail(file_path, start_date, end_date, offset=0, after=None):
+    # Только дописанные бары: CSV читается с байта offset (см. read_source_tail), zip — целиком.
+    # after — последняя уже обработанная метка времени; возвращает (dataset, новый offset)
+    df, offset = read_source_tail(file_path, offset)
+    dataset = normalize_ohlc(df)
+    mask = (dataset.index >= start_date) & (dataset.index <= end_date)
+    if after is not None:
+        mask &= dataset.index > after
+    return dataset[mask], offset
+
+
+def iter_data(file_path, start_date, end_date, chunk_bars=50_000, store_root=None, columns=None):
+    # load_data кусками по chunk_bars строк источника: в сумме — те же бары, что и load_data, но в памяти
+    # только один кусок. Источник должен быть упорядочен по времени (как все выгрузки MetaQuotes);
+    # дубликат метки на стыке кусков отбрасывается, как drop_duplicates(keep='first') в normalize_ohlc
+    if store_root:
+        store_dir = store_dir_for(file_path, store_root)
+        if not is_fresh(store_dir, file_path):
+            ingest(file_path, store_root)
+        yield from iter_range(store_dir, start_date, end_date, chunk_bars, columns=columns)
+        return
+
+    start, end, last = pd.Timestamp(start_date), pd.Timestamp(end_date), None
+    for df in iter_source(file_path, chunk_bars):
+        dataset = normalize_ohlc(df)
+        if last is not None and len(dataset):
+            if dataset.index[0] < last:
+                raise ValueError(f"{file_path}: бары не упорядочены по времени ({dataset.index[0]} после {last}), "
+                                 f"покусочная загрузка невозможна — используйте load_data")
+            dataset = dataset[dataset.index > last]
+        if len(dataset):
+            last = dataset.index[-1]
+            if last < start:
+                continue
+        dataset = dataset[(dataset.index >= start) & (dataset.index <= end)]
+        if columns:
+            dataset = dataset[list(columns)]
+        if len(dataset):
+            yield dataset
+        if last is not None and last > end:
+            break
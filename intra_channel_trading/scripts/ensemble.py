@@ -0,0 +1,176 @@
+import os
+import shutil
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from intra_channel_trading.auxiliary.fast_backtest import fast_backtest_arrays, portfolio_backtest
+from intra_channel_trading.scripts.config_loader import load_config, build_params, parse_marketdata_name
+from intra_channel_trading.scripts.data_loader import load_data
+from intra_channel_trading.scripts.indicator_cache import IndicatorCache
+from intra_channel_trading.scripts.market_arrays import MarketArrays
+from intra_channel_trading.scripts import scoring
+from intra_channel_trading.scripts.signal_engine import exit_only_signals
+from intra_channel_trading.scripts.telemetry import profiled
+
+
+# majority — знак суммы голосов, weighted — знак взвешенной суммы, portfolio — капитал делится между участниками
+MODES = ('majority', 'weighted', 'portfolio')
+SIGNAL_KEYS = ('donchian_window', 'rsi_period', 'rsi_exit', 'cooldown_bars',
+               'atr_enabled', 'atr_period', 'atr_threshold')
+
+
+def member_params(params, members):
+    # Параметры участников: каждый — параметры strategy, поверх которых наложены его собственные
+    return [dict(params, **(member or {})) for member in members]
+
+
+@profiled()
+def signal_matrix(data, members, cache=None, engine='auto', n_workers=1):
+    # Сигналы K участников одной пачкой: матрица int8 (K × бары) на общих барах, где у всех участников
+    # прогреты индикаторы. Индикаторы берутся из общего кэша (одинаковые периоды считаются один раз),
+    # машина состояний каждого участника идёт по своим барам с его собственного прогрева — строка матрицы
+    # совпадает с donchian_rsi_exit_only на этих барах. Ядро Numba отпускает GIL, участники считаются в потоках
+    cache = cache or IndicatorCache()
+    market = MarketArrays(data, cache)
+    n = len(market.index)
+
+    jobs, common = [], np.ones(n, dtype=bool)
+    for params in members:
+        atr_enabled = bool(params.get('atr_enabled'))
+        rsi = cache.get(data, 'rsi', params.get('rsi_period'), market.fingerprint)[0]
+        upper, lower = cache.get(data, 'donchian', params.get('donchian_window'), market.fingerprint)
+        atr = cache.get(data, 'atr', params.get('atr_period'), market.fingerprint)[0] if atr_enabled else None
+        rows = market._rows([rsi, upper, lower] + ([atr] if atr_enabled else []))
+        common &= market._valid
+        jobs.append((params, rows, rsi, upper, lower, atr))
+
+    signals = np.zeros((len(members), n), dtype=np.int8)
+
+    def run(k):
+        params, rows, rsi, upper, lower, atr = jobs[k]
+        atr_enabled = atr is not None
+        signal, _ = exit_only_signals(
+            market.close[rows], rsi[rows], upper[rows], lower[rows], atr[rows] if atr_enabled else None,
+            atr_enabled=atr_enabled,
+            atr_threshold=params.get('atr_threshold') or 0.0,
+            rsi_exit=params.get('rsi_exit'),
+            cooldown_bars=params.get('cooldown_bars'),
+            engine=engine,
+        )
+        signals[k, rows] = signal
+
+    if n_workers > 1 and len(members) > 1:
+        with ThreadPoolExecutor(max_workers=n_workers) as pool:
+            list(pool.map(run, range(len(members))))
+    else:
+        for k in range(len(members)):
+            run(k)
+
+    first = int(np.argmax(common)) if common.any() else n
+    rows = slice(first, n) if common[first:].all() else np.flatnonzero(common)
+    return market, rows, signals[:, rows]
+
+
+def vote(signals, weights=None, threshold=0.0):
+    # Один сигнал из K: взвешенная доля голосов в [-1, 1]; лонг выше threshold, шорт ниже -threshold, иначе вне рынка
+    signals = np.atleast_2d(signals)
+    weights = np.ones(signals.shape[0]) if weights is None else np.asarray(weights, dtype=np.float64)
+    score = weights @ signals / np.abs(weights).sum()
+    return np.where(score > threshold, 1, np.where(score < -threshold, -1, 0)).astype(np.int64)
+
+
+def run_ensemble(data, params, members, mode='majority', weights=None, threshold=0.0, cache=None, engine='auto',
+                 n_workers=1):
+    # Ансамбль целиком: матрица сигналов -> голосование (один бэктест) или портфель (все участники одним проходом)
+    if mode not in MODES:
+        raise ValueError(f"Неизвестный режим ансамбля: {mode!r}, допустимые: {MODES}")
+    if not members:
+        raise ValueError("Ансамбль без участников")
+    if mode == 'weighted' and weights is None:
+        raise ValueError("Для mode='weighted' нужны weights")
+    if weights is not None and len(weights) != len(members):
+        raise ValueError(f"weights: ожидалось {len(members)} значений, получено {len(weights)}")
+
+    members = member_params(params, members)
+    market, rows, signals = signal_matrix(data, members, cache=cache, engine=engine, n_workers=n_workers)
+    index = market.index[rows]
+    open_, close = market.open[rows], market.close[rows]
+    if mode == 'portfolio':
+        stats = portfolio_backtest(index, open_, close, signals, weights=weights, params=params)
+        combined = None
+    else:
+        combined = vote(signals, weights if mode == 'weighted' else None, threshold)
+        stats = fast_backtest_arrays(index, open_, close, combined, params=params)
+
+    table = pd.DataFrame([{key: member.get(key) for key in SIGNAL_KEYS} for member in members])
+    table['Long [%]'] = (signals == 1).mean(axis=1) * 100
+    table['Short [%]'] = (signals == -1).mean(axis=1) * 100
+    if combined is not None:
+        table['Agreement [%]'] = (signals == combined).mean(axis=1) * 100
+    if '_members' in stats:
+        table = table.join(stats['_members'])
+    signals_frame = pd.DataFrame({'Open': open_, 'Close': close}, index=index)
+    if combined is not None:
+        signals_frame['Signal'] = combined
+    return stats, table, signals_frame
+
+
+def criteria(stats):
+    # Штраф за сделку — полным лотом; в портфеле участник торгует долей лота, и штраф — пропорционально весу
+    members = stats.get('_members')
+    n_trades = stats['# Trades'] if members is None else (members['# Trades'] * members['Weight']).sum()
+    return scoring.criteria(stats, n_trades)
+
+
+def main(source_config_path="../configs/config_donchian_rsi.yaml", root='..'):
+    config = load_config(source_config_path)
+    data_cfg = config.get('data', {})
+    ens_cfg = config.get('ensemble', {})
+    params = build_params(config)
+
+    ticker, timeframe, broker = parse_marketdata_name(data_cfg['marketdata'])
+    now = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+    mode = ens_cfg.get('mode', 'majority')
+    destination_path = os.path.join(root, 'outputs', 'ensemble', f"ens_{ticker}_{timeframe}_{broker}_{mode}_{now}")
+    os.makedirs(destination_path, exist_ok=True)
+
+    store_path = data_cfg.get('store_path')
+    data = load_data(os.path.join(root, data_cfg['dataset_path'], data_cfg['marketdata']),
+                     start_date=data_cfg["start_date"],
+                     end_date=data_cfg["end_date"],
+                     store_root=os.path.join(root, store_path) if store_path else None)
+
+    n_workers = ens_cfg.get('n_workers', 1)
+    if n_workers in (0, -1, None):
+        n_workers = os.cpu_count()
+    stats, table, signals = run_ensemble(
+        data, params, ens_cfg.get('members') or [{}],
+        mode=mode,
+        weights=ens_cfg.get('weights'),
+        threshold=ens_cfg.get('threshold', 0.0),
+        n_workers=n_workers,
+    )
+
+    table.to_csv(os.path.join(destination_path, 'ensemble_members.csv'), index_label='Member')
+    stats[[key for key in stats.index if not str(key).startswith('_')]].to_csv(
+        os.path.join(destination_path, 'ensemble_stats.csv'))
+    stats['_trades'].to_csv(os.path.join(destination_path, 'ensemble_trades.csv'))
+    stats['_equity_curve'].to_csv(os.path.join(destination_path, 'ensemble_equity.csv'))
+    if 'Signal' in signals:
+        signals.to_csv(os.path.join(destination_path, 'ensemble_signals.csv'))
+    shutil.copy2(source_config_path, os.path.join(destination_path, os.path.basename(source_config_path)))
+    with open(os.path.join(destination_path, 'ensemble_members.yaml'), 'w') as f:
+        yaml.dump(ens_cfg.get('members') or [{}], f, default_flow_style=None, sort_keys=False)
+
+    print(table.to_string(float_format=lambda v: f"{v:.2f}"))
+    print(f"\nРежим: {mode}, участников: {len(table)}, сделок: {stats['# Trades']}, "
+          f"Equity Final: {stats['Equity Final [$]']:.2f}, Criteria: {criteria(stats):.2f}")
+    print(f"Результаты: {destination_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from intra_channel_trading.scripts.batch_scorer import BatchScorer, PARAM_KEYS, INT_KEYS, COMBO_KEYS
+from intra_channel_trading.scripts.sensitivity import neighbourhood
+
+
+# Шаги грубой сетки: на SEARCH_SPACE — 21 600 наборов
+COARSE_STEPS = {'donchian_window': 5, 'rsi_period': 5, 'rsi_exit': 10, 'cooldown_bars': 15, 'atr_period': 10,
+                'atr_threshold': 0.0004}
+# Предел уточнения: целые — 1, порог ATR — 0.00005. Полный перебор — сетка с этими шагами и rounds=0
+FINE_STEPS = {'donchian_window': 1, 'rsi_period': 1, 'rsi_exit': 1, 'cooldown_bars': 1, 'atr_period': 1,
+              'atr_threshold': 0.00005}
+# Защита от случайного полного перебора: на SEARCH_SPACE с шагом 1 это ~1.5 млрд наборов
+MAX_COMBOS = 2_000_000
+# Наборов на один вызов BatchScorer.score: ограничивает память под таблицу параметров и метрик
+SCORE_CHUNK = 100_000
+
+
+def axis(low, high, step, integer=False):
+    # Значения параметра от low до high с шагом step; high входит всегда, даже если не кратен шагу
+    values = np.arange(low, high + step * 1e-9, step, dtype=np.float64)
+    if values[-1] < high - step * 1e-9:
+        values = np.append(values, high)
+    return values.astype(np.int64) if integer else np.round(values, 10)
+
+
+def grid(bounds, steps=None, fixed=None):
+    # Декартово произведение осей по PARAM_KEYS; fixed — параметры, закреплённые одним значением.
+    # atr_enabled — True, как у триалов Optuna (suggest_signal_params), а не из торговых params
+    steps = dict(COARSE_STEPS, **(steps or {}))
+    fixed = fixed or {}
+    axes = [np.array([fixed[key]]) if key in fixed else axis(*bounds[key], steps[key], key in INT_KEYS)
+            for key in PARAM_KEYS]
+    mesh = np.meshgrid(*[np.arange(len(values)) for values in axes], indexing='ij')
+    table = pd.DataFrame({key: values[index.ravel()] for key, values, index in zip(PARAM_KEYS, axes, mesh)})
+    table['atr_enabled'] = True
+    return table
+
+
+def grid_size(bounds, steps=None, fixed=None):
+    steps = dict(COARSE_STEPS, **(steps or {}))
+    fixed = fixed or {}
+    return int(np.prod([1 if key in fixed else len(axis(*bounds[key], steps[key], key in INT_KEYS))
+                        for key in PARAM_KEYS]))
+
+
+def _score(scorer, combos):
+    parts = [scorer.score(combos.iloc[lo:lo + SCORE_CHUNK].reset_index(drop=True))
+             for lo in range(0, len(combos), SCORE_CHUNK)]
+    return pd.concat([combos.reset_index(drop=True), pd.concat(parts, ignore_index=True)], axis=1)
+
+
+def _refine(steps, min_steps):
+    # Шаг вдвое меньше, но не мельче min_steps
+    return {key: max(min_steps[key], step // 2 if key in INT_KEYS else round(step / 2, 10))
+            for key, step in steps.items()}
+
+
+def search(data, params, bounds, steps=None, rounds=3, top_n=5, radius=1, min_steps=None, fixed=None, cache=None,
+           n_workers=1, scorer=None, max_combos=MAX_COMBOS):
+    # Грубая сетка по bounds с шагами steps, затем rounds раундов уточнения: шаг вдвое меньше (до min_steps),
+    # окрестность ±radius шагов вокруг top_n лучших точек. Все наборы — одним BatchScorer на общих матрицах
+    # индикаторов; уже оценённые наборы не пересчитываются.
+    # Возвращает поверхность: все оценённые наборы с метриками и Round (0 — грубая сетка), по убыванию Score
+    steps = dict(COARSE_STEPS, **(steps or {}))
+    min_steps = dict(FINE_STEPS, **(min_steps or {}))
+    fixed = fixed or {}
+    size = grid_size(bounds, steps, fixed)
+    if size > max_combos:
+        raise ValueError(f"Сетка из {size} наборов больше max_combos={max_combos}: увеличьте шаги или закрепите "
+                         f"часть параметров (fixed)")
+    scorer = scorer or BatchScorer(data, params, cache=cache, n_workers=n_workers)
+    surface = _score(scorer, grid(bounds, steps, fixed)).assign(Round=0)
+
+    keys = [key for key in PARAM_KEYS if key not in fixed]
+    for round_ in range(1, rounds + 1):
+        steps = _refine(steps, min_steps)
+        best = surface.nlargest(top_n, 'Score')[list(COMBO_KEYS)].to_dict('records')
+        candidates = pd.concat([neighbourhood(point, radius, keys, steps, bounds)[list(COMBO_KEYS)]
+                                for point in best], ignore_index=True).drop_duplicates()
+        seen = candidates.merge(surface[list(COMBO_KEYS)], how='left', indicator=True)['_merge'] == 'both'
+        fresh = candidates[~seen.to_numpy()]
+        if not len(fresh):
+            break
+        surface = pd.concat([surface, _score(scorer, fresh).assign(Round=round_)], ignore_index=True)
+    return surface.sort_values('Score', ascending=False, kind='stable', na_position='last').reset_index(drop=True)
+
+
+def projections(surface, keys=PARAM_KEYS):
+    # Проекции поверхности на пары параметров в длинном формате: для каждой клетки (x, y) — лучший (Max)
+    # и средний score по всем остальным параметрам и число оценённых наборов в клетке
+    frames = []
+    for x, y in itertools.combinations(keys, 2):
+        grid_ = surface.groupby([x, y])['Score'].agg(Max='max', Mean='mean', Count='count').reset_index()
+        grid_ = grid_.rename(columns={x: 'X', y: 'Y'})
+        grid_.insert(0, 'Param Y', y)
+        grid_.insert(0, 'Param X', x)
+        frames.append(grid_)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def to_trial_params(surface, k):
+    # k лучших наборов в виде параметров триала Optuna (встроенные типы для enqueue_trial)
+    return [{key: int(row[key]) if key in INT_KEYS else float(row[key]) for key in PARAM_KEYS}
+            for row in surface.dropna(subset=['Score']).head(k).to_dict('records')]
@@ -0,0 +1,125 @@
+import os
+import json
+import pickle
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from intra_channel_trading.auxiliary.fast_backtest import BacktestState, extend_backtest, backtest_stats
+from intra_channel_trading.scripts.data_loader import load_tail
+from intra_channel_trading.scripts.market_store import source_digest
+from intra_channel_trading.scripts.result_cache import _normalize
+from intra_channel_trading.scripts.stream import DonchianRsiStream
+from intra_channel_trading.scripts.telemetry import stage
+
+
+# Увеличивается при изменении формата чекпоинта или семантики стрима/бэктеста — старые чекпоинты пересобираются
+CHECKPOINT_VERSION = 1
+
+
+def checkpoint_key(file_path, params, start_date, end_date):
+    # Чекпоинт привязан к источнику, диапазону дат и всем параметрам стратегии
+    payload = json.dumps({'source': os.path.abspath(file_path), 'range': [str(start_date), str(end_date)],
+                          'params': _normalize(params), 'version': CHECKPOINT_VERSION}, sort_keys=True)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def checkpoint_path(checkpoint_dir, file_path, params, start_date, end_date):
+    name = os.path.basename(file_path)
+    return os.path.join(checkpoint_dir, f"{name}_{checkpoint_key(file_path, params, start_date, end_date)}.pkl")
+
+
+class Checkpoint:
+    # Всё, что нужно для продолжения: позиция в источнике, окна индикаторов и машина сигналов (DonchianRsiStream),
+    # таблица сигналов и состояние бэктеста (позиция, открытая сделка, эквити)
+    def __init__(self, key, params):
+        self.version = CHECKPOINT_VERSION
+        self.key = key
+        self.offset = 0               # байт, с которого начинаются ещё не прочитанные строки CSV (None — zip)
+        self.digest = None            # хэш хвоста прочитанной части: файл должен только дописываться
+        self.last_timestamp = None    # последний прочитанный бар источника (включая отброшенные прогревом)
+        self.stream = DonchianRsiStream(params)
+        self.frame = None
+        self.backtest = BacktestState()
+
+    def is_valid_for(self, file_path, key):
+        if self.version != CHECKPOINT_VERSION or self.key != key:
+            return False
+        if self.offset is None:
+            return True
+        if os.path.getsize(file_path) < self.offset:
+            return False
+        return source_digest(file_path, self.offset) == self.digest
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path):
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+
+
+def _stream_tail(stream, tail, atr_enabled):
+    # Новые бары через DonchianRsiStream: те же колонки и те же значения, что и у donchian_rsi_exit_only
+    kept, values = [], []
+    rows = zip(tail['Open'].to_numpy(), tail['High'].to_numpy(), tail['Low'].to_numpy(), tail['Close'].to_numpy())
+    for i, (open_, high, low, close) in enumerate(rows):
+        signal = stream.update(float(high), float(low), float(close), float(open_))
+        if signal is not None:
+            kept.append(i)
+            values.append((stream.rsi, stream.upper, stream.lower, stream.atr, signal, stream.entry))
+    frame = tail.iloc[kept].copy()
+    values = np.array(values, dtype=np.float64).reshape(-1, 6)
+    frame['RSI'], frame['Upper'], frame['Lower'] = values[:, 0], values[:, 1], values[:, 2]
+    if atr_enabled:
+        frame['ATR'] = values[:, 3]
+    frame['Signal'] = values[:, 4].astype(np.int64)
+    if atr_enabled:
+        frame['Entry'] = values[:, 5].astype(np.int64)
+    # Пакетная версия отбрасывает бары с NaN в любой колонке (dropna), стрим — только по OHLC и индикаторам
+    return frame[frame.notna().all(axis=1).to_numpy()]
+
+
+def run_incremental(file_path, params, start_date, end_date, checkpoint_dir):
+    # Прогон с чекпоинтом: первый раз — вся история, дальше — только бары, дописанные в источник после
+    # прошлого прогона. Возвращает (signals, stats, info); signals и stats совпадают с полным прогоном
+    # donchian_rsi_exit_only + fast_backtest
+    key = checkpoint_key(file_path, params, start_date, end_date)
+    path = checkpoint_path(checkpoint_dir, file_path, params, start_date, end_date)
+    checkpoint = Checkpoint.load(path) if os.path.exists(path) else None
+    resumed = checkpoint is not None and checkpoint.is_valid_for(file_path, key)
+    if not resumed:
+        checkpoint = Checkpoint(key, params)
+
+    with stage('incremental_load'):
+        tail, offset = load_tail(file_path, start_date, end_date, offset=checkpoint.offset or 0,
+                                 after=checkpoint.last_timestamp)
+    with stage('incremental_signals', bars=len(tail)):
+        new = _stream_tail(checkpoint.stream, tail, bool(params.get('atr_enabled')))
+        if checkpoint.frame is None:
+            checkpoint.frame = new
+        elif len(new):
+            checkpoint.frame = pd.concat([checkpoint.frame, new])
+    signals = checkpoint.frame
+    with stage('incremental_backtest', bars=len(new)):
+        extend_backtest(checkpoint.backtest, signals.index, new['Open'].to_numpy(), new['Close'].to_numpy(),
+                        new['Signal'].to_numpy(), params)
+        stats = backtest_stats(checkpoint.backtest, signals.index) if len(signals) else None
+
+    checkpoint.offset = offset
+    checkpoint.digest = source_digest(file_path, offset)
+    if len(tail):
+        checkpoint.last_timestamp = tail.index[-1]
+    checkpoint.save(path)
+    info = {'resumed': resumed, 'new_bars': len(tail), 'new_signals': len(new), 'bars': len(signals),
+            'checkpoint': path}
+    return signals, stats, info
@@ -0,0 +1,153 @@
+import os
+import hashlib
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+from .indicators import (calculate_donchian, calculate_rsi, calculate_atr,
+                         calculate_donchian_batch, calculate_rsi_batch, calculate_atr_batch)
+
+
+# Индикатор -> (функция расчёта, колонки, которые она добавляет)
+INDICATORS = {
+    'rsi': (calculate_rsi, ('RSI',)),
+    'donchian': (calculate_donchian, ('Upper', 'Lower')),
+    'atr': (calculate_atr, ('ATR',)),
+}
+
+BATCH_INDICATORS = {
+    'rsi': lambda data, periods: (calculate_rsi_batch(data, periods),),
+    'donchian': calculate_donchian_batch,
+    'atr': lambda data, periods: (calculate_atr_batch(data, periods),),
+}
+
+
+def dataset_fingerprint(data):
+    # Отпечаток набора данных: индекс + OHLC. Считается один раз на набор, а не на каждый триал
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.ascontiguousarray(data.index.asi8).tobytes())
+    for column in ('Open', 'High', 'Low', 'Close'):
+        h.update(np.ascontiguousarray(data[column].to_numpy(dtype=np.float64)).tobytes())
+    return h.hexdigest()
+
+
+# Отпечатки живых наборов данных по id объекта. Сам DataFrame держится слабой ссылкой: запись удаляется
+# вместе с ним, поэтому память не растёт с числом прогонов и данные не удерживаются кэшем
+_FINGERPRINTS = {}
+
+
+def _forget(ref, key):
+    cached = _FINGERPRINTS.get(key)
+    if cached is not None and cached[0] is ref:
+        del _FINGERPRINTS[key]
+
+
+def cached_fingerprint(data):
+    # dataset_fingerprint, посчитанный один раз на объект DataFrame (общий для всех кэшей)
+    key = id(data)
+    cached = _FINGERPRINTS.get(key)
+    if cached is not None and cached[0]() is data:
+        return cached[1]
+    fingerprint = dataset_fingerprint(data)
+    try:
+        ref = weakref.ref(data, lambda ref, key=key: _forget(ref, key))
+    except TypeError:  # объект без слабых ссылок — отпечаток не запоминается
+        return fingerprint
+    _FINGERPRINTS[key] = (ref, fingerprint)
+    return fingerprint
+
+
+class IndicatorCache:
+    # dtype=np.float32 вдвое уменьшает память кэша (индикаторы считаются в float64 и хранятся в float32);
+    # результаты при этом могут отличаться от float64 на пороговых совпадениях
+    def __init__(self, max_bytes=512 * 2 ** 20, spill_dir=None, dtype=np.float64):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.dtype = np.dtype(dtype)
+        self.hits = 0
+        self.misses = 0
+        self.spill_hits = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def fingerprint(self, data):
+        # Отпечаток запоминается на объект, чтобы не хешировать один и тот же DataFrame в каждом триале
+        return cached_fingerprint(data)
+
+    def _spill_path(self, key):
+        fingerprint, name, period = key
+        suffix = '' if self.dtype == np.float64 else f"_{self.dtype.name}"
+        return os.path.join(self.spill_dir, f"{fingerprint}_{name}_{period}{suffix}.npy")
+
+    def _store(self, key, values):
+        self._entries[key] = values
+        self._nbytes += values.nbytes
+        while self._nbytes > self.max_bytes and len(self._entries) > 1:
+            old_key, old_values = self._entries.popitem(last=False)
+            self._nbytes -= old_values.nbytes
+            self.evictions += 1
+            if self.spill_dir and not os.path.exists(self._spill_path(old_key)):
+                # Атомарная запись: каталог может быть общим для нескольких процессов-воркеров
+                tmp_path = f"{self._spill_path(old_key)}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    np.save(f, old_values)
+                os.replace(tmp_path, self._spill_path(old_key))
+
+    def get(self, data, name, period, fingerprint=None):
+        # Возвращает массив (колонки индикатора × бары), при промахе считает его исходной функцией
+        key = (fingerprint or self.fingerprint(data), name, int(period))
+        values = self._entries.get(key)
+        if values is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return values
+
+        if self.spill_dir and os.path.exists(self._spill_path(key)):
+            values = np.load(self._spill_path(key)).astype(self.dtype, copy=False)
+            self.spill_hits += 1
+        else:
+            func, columns = INDICATORS[name]
+            dataset = func(data[['Open', 'High', 'Low', 'Close']], int(period))
+            values = np.vstack([dataset[column].to_numpy(dtype=np.float64) for column in columns])
+            values = values.astype(self.dtype, copy=False)
+            self.misses += 1
+        values.setflags(write=False)
+        self._store(key, values)
+        return values
+
+    def prefill(self, data, name, periods, fingerprint=None):
+        # Заполняет кэш сразу для всего диапазона периодов одним пакетным расчётом
+        fingerprint = fingerprint or self.fingerprint(data)
+        periods = [int(p) for p in periods if (fingerprint, name, int(p)) not in self._entries]
+        if not periods:
+            return
+        matrices = BATCH_INDICATORS[name](data, periods)
+        for j, period in enumerate(periods):
+            values = np.vstack([matrix[:, j] for matrix in matrices]).astype(self.dtype, copy=False)
+            values.setflags(write=False)
+            self._store((fingerprint, name, period), values)
+
+    def columns(self, data, name, period, fingerprint=None):
+        _, columns = INDICATORS[name]
+        values = self.get(data, name, period, fingerprint)
+        return dict(zip(columns, values))
+
+    def clear(self):
+        self._entries.clear()
+        self._nbytes = 0
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'spill_hits': self.spill_hits,
+                'evictions': self.evictions, 'entries': len(self._entries), 'nbytes': self._nbytes}
+
+    def __repr__(self):
+        return (f"<IndicatorCache: {len(self._entries)} entries, {self._nbytes / 2 ** 20:.1f} MB, "
+                f"hits={self.hits} misses={self.misses} spill_hits={self.spill_hits}>")
@@ -1,5 +1,10 @@
+import numpy as np
 import pandas as pd
 
+from .signal_engine import njit, NUMBA_AVAILABLE
+from .telemetry import profiled
+
+@profiled()
 def calculate_donchian(data, donchian_window):
     dataset = data.copy()
     dataset['Upper'] = dataset['High'].rolling(donchian_window).max()
@@ -7,6 +12,7 @@ def calculate_donchian(data, donchian_window):
     dataset[['Upper', 'Lower']] = dataset[['Upper', 'Lower']].shift(1)
     return dataset
 
+@profiled()
 def calculate_rsi(data, rsi_period):
     dataset = data.copy()
     delta = dataset['Close'].diff()
@@ -18,6 +24,7 @@ def calculate_rsi(data, rsi_period):
     dataset['RSI'] = dataset['RSI'].shift(1)
     return dataset
 
+@profiled()
 def calculate_atr(data, atr_period):
     dataset = data.copy()
     tr = pd.concat([
@@ -28,3 +35,167 @@ def calculate_atr(data, atr_period):
     dataset['ATR'] = tr.rolling(atr_period).mean()
     dataset['ATR'] = dataset['ATR'].shift(1)
     return dataset
+
+
+# ---------- Пакетные версии: все периоды за один проход, результат — массив (бары × периоды) ----------
+
+def _shift_down(values):
+    # Аналог .shift(1) для двумерного массива
+    shifted = np.full_like(values, np.nan)
+    shifted[1:] = values[:-1]
+    return shifted
+
+
+def _rolling_extreme_batch(values, windows, func):
+    # Окно w+1 получается из окна w одним сравнением: M_w[i] = func(M_{w-1}[i], x[i-w+1])
+    n = len(values)
+    out = np.full((n, len(windows)), np.nan)
+    columns = {}
+    for j, w in enumerate(windows):
+        columns.setdefault(int(w), []).append(j)
+    current = values.astype(np.float64, copy=True)
+    for w in range(1, max(columns) + 1):
+        if w > 1:
+            current[w - 1:] = func(current[w - 1:], values[:n - w + 1])
+        for j in columns.get(w, ()):
+            out[w - 1:, j] = current[w - 1:]
+    return out
+
+
+@njit(cache=True, nogil=True)
+def _rolling_mean_kernel(values, periods):
+    # Повторяет алгоритм pandas rolling().mean() (скользящая сумма Кэхэна) бит в бит,
+    # чтобы пороги RSI/ATR срабатывали так же, как в calculate_rsi/calculate_atr
+    n = values.shape[0]
+    out = np.full((n, periods.shape[0]), np.nan)
+    for j in range(periods.shape[0]):
+        p = periods[j]
+        nobs, neg_ct, n_same = 0, 0, 0
+        sum_x, comp_add, comp_remove = 0.0, 0.0, 0.0
+        prev = values[0] if n else np.nan
+        for i in range(n):
+            if i >= p:
+                val = values[i - p]
+                if val == val:
+                    nobs -= 1
+                    y = -val - comp_remove
+                    t = sum_x + y
+                    comp_remove = t - sum_x - y
+                    sum_x = t
+                    if np.signbit(val):
+                        neg_ct -= 1
+            val = values[i]
+            if val == val:
+                nobs += 1
+                y = val - comp_add
+                t = sum_x + y
+                comp_add = t - sum_x - y
+                sum_x = t
+                if np.signbit(val):
+                    neg_ct += 1
+                if val == prev:
+                    n_same += 1
+                else:
+                    n_same = 1
+                prev = val
+            if nobs >= p and nobs > 0:
+                result = sum_x / nobs
+                if n_same >= nobs:
+                    result = prev
+                elif neg_ct == 0 and result < 0:
+                    result = 0.0
+                elif neg_ct == nobs and result > 0:
+                    result = 0.0
+                out[i, j] = result
+    return out
+
+
+@njit(cache=True, nogil=True)
+def _rolling_mean_resume_kernel(values, start, period, istate, fstate, out):
+    # Тот же алгоритм, что и _rolling_mean_kernel, но ряд подаётся кусками: состояние суммы Кэхэна переносится
+    # между вызовами, поэтому результат совпадает с расчётом по всему ряду бит в бит.
+    # values — последние значения предыдущих кусков (не меньше period) + новый кусок с позиции start;
+    # istate = [nobs, neg_ct, n_same, начат, всего значений], fstate = [sum_x, comp_add, comp_remove, prev]
+    nobs, neg_ct, n_same, seen = istate[0], istate[1], istate[2], istate[4]
+    sum_x, comp_add, comp_remove, prev = fstate[0], fstate[1], fstate[2], fstate[3]
+    if istate[3] == 0 and values.shape[0] > start:
+        prev = values[start]
+        istate[3] = 1
+    for i in range(start, values.shape[0]):
+        if seen + i - start >= period:
+            val = values[i - period]
+            if val == val:
+                nobs -= 1
+                y = -val - comp_remove
+                t = sum_x + y
+                comp_remove = t - sum_x - y
+                sum_x = t
+                if np.signbit(val):
+                    neg_ct -= 1
+        val = values[i]
+        if val == val:
+            nobs += 1
+            y = val - comp_add
+            t = sum_x + y
+            comp_add = t - sum_x - y
+            sum_x = t
+            if np.signbit(val):
+                neg_ct += 1
+            if val == prev:
+                n_same += 1
+            else:
+                n_same = 1
+            prev = val
+        result = np.nan
+        if nobs >= period and nobs > 0:
+            result = sum_x / nobs
+            if n_same >= nobs:
+                result = prev
+            elif neg_ct == 0 and result < 0:
+                result = 0.0
+            elif neg_ct == nobs and result > 0:
+                result = 0.0
+        out[i - start] = result
+    istate[0], istate[1], istate[2], istate[4] = nobs, neg_ct, n_same, seen + values.shape[0] - start
+    fstate[0], fstate[1], fstate[2], fstate[3] = sum_x, comp_add, comp_remove, prev
+    return out
+
+
+def _rolling_mean_batch(values, periods):
+    periods = np.asarray(periods, dtype=np.int64)
+    if NUMBA_AVAILABLE:
+        return _rolling_mean_kernel(np.ascontiguousarray(values, dtype=np.float64), periods)
+    # Без numba — по колонке на период, но без копий всего DataFrame
+    series = pd.Series(values)
+    return np.column_stack([series.rolling(int(p)).mean().to_numpy() for p in periods])
+
+
+@profiled()
+def calculate_donchian_batch(data, windows):
+    upper = _rolling_extreme_batch(data['High'].to_numpy(dtype=np.float64), windows, np.maximum)
+    lower = _rolling_extreme_batch(data['Low'].to_numpy(dtype=np.float64), windows, np.minimum)
+    return _shift_down(upper), _shift_down(lower)
+
+
+@profiled()
+def calculate_rsi_batch(data, periods):
+    close = data['Close'].to_numpy(dtype=np.float64)
+    delta = np.empty_like(close)
+    delta[0] = np.nan
+    delta[1:] = np.diff(close)
+    gain = _rolling_mean_batch(np.where(delta > 0, delta, 0.0), periods)
+    loss = _rolling_mean_batch(-np.where(delta < 0, delta, 0.0), periods)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - (100 / (1 + gain / loss))
+    return _shift_down(rsi)
+
+
+@profiled()
+def calculate_atr_batch(data, periods):
+    high = data['High'].to_numpy(dtype=np.float64)
+    low = data['Low'].to_numpy(dtype=np.float64)
+    prev_close = np.empty_like(high)
+    prev_close[0] = np.nan
+    prev_close[1:] = data['Close'].to_numpy(dtype=np.float64)[:-1]
+    tr = np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+    return _shift_down(_rolling_mean_batch(tr, periods))
@@ -0,0 +1,176 @@
+import numpy as np
+
+from intra_channel_trading.auxiliary.fast_backtest import (BacktestState, extend_backtest, backtest_stats,
+                                                           fast_backtest_arrays)
+from intra_channel_trading.scripts.signal_engine import (exit_only_signals, resolve_engine, _exit_only_resume_kernel,
+                                                         _exit_only_resume_kernel_nb)
+
+
+class MarketArrays:
+    # Набор данных как структура массивов для горячего цикла оптимизатора.
+    # OHLC — непрерывные массивы без копий DataFrame, индикаторы — read-only массивы из IndicatorCache,
+    # маска валидных баров, выборки и выходы ядра сигналов — в буферах, общих для всех триалов.
+    # Результат совпадает с donchian_rsi_exit_only + fast_backtest бит в бит (при float64-кэше)
+    def __init__(self, data, cache):
+        self.data = data
+        self.cache = cache
+        self.fingerprint = cache.fingerprint(data)
+        self.index = data.index
+        self.open = np.ascontiguousarray(data['Open'].to_numpy(dtype=np.float64))
+        self.close = np.ascontiguousarray(data['Close'].to_numpy(dtype=np.float64))
+        # dropna() пакетной версии учитывает все колонки исходного набора, а не только OHLC
+        self.base_valid = data.notna().all(axis=1).to_numpy()
+
+        n = len(data)
+        self._valid = np.empty(n, dtype=bool)
+        self._nan = np.empty(n, dtype=bool)
+        self._signal = np.empty(n, dtype=np.int64)
+        self._entry = np.empty(n, dtype=np.int64)
+        self._gather = {}
+
+    def _rows(self, columns):
+        # Бары без NaN: срез, если пропуски только в начале (прогрев индикаторов) — тогда дальше всё на видах,
+        # иначе массив индексов
+        valid = self._valid
+        np.copyto(valid, self.base_valid)
+        for values in columns:
+            np.isnan(values, out=self._nan)
+            np.logical_not(self._nan, out=self._nan)
+            np.logical_and(valid, self._nan, out=valid)
+        n = len(valid)
+        first = int(np.argmax(valid)) if valid.any() else n
+        if valid[first:].all():
+            return slice(first, n)
+        return np.flatnonzero(valid)
+
+    def _take(self, name, values, rows):
+        if isinstance(rows, slice):
+            return values[rows]
+        buffer = self._gather.get(name)
+        if buffer is None or buffer.dtype != values.dtype:
+            buffer = self._gather[name] = np.empty(len(self.index), dtype=values.dtype)
+        return np.take(values, rows, out=buffer[:len(rows)])
+
+    def indicators(self, params):
+        # (rsi, upper, lower, atr | None) из общего кэша индикаторов — read-only массивы длины истории
+        get = self.cache.get
+        rsi = get(self.data, 'rsi', params.get('rsi_period'), self.fingerprint)[0]
+        upper, lower = get(self.data, 'donchian', params.get('donchian_window'), self.fingerprint)
+        atr = get(self.data, 'atr', params.get('atr_period'), self.fingerprint)[0] if params.get('atr_enabled') else None
+        return rsi, upper, lower, atr
+
+    def signals(self, params, engine='auto'):
+        # (rows, signal): rows — оставшиеся после dropna бары, signal — вид на общий буфер,
+        # действителен до следующего вызова signals()
+        atr_enabled = bool(params.get('atr_enabled'))
+        rsi, upper, lower, atr = self.indicators(params)
+
+        rows = self._rows([rsi, upper, lower] + ([atr] if atr_enabled else []))
+        signal, _ = exit_only_signals(
+            self._take('close', self.close, rows),
+            self._take('rsi', rsi, rows),
+            self._take('upper', upper, rows),
+            self._take('lower', lower, rows),
+            self._take('atr', atr, rows) if atr_enabled else None,
+            atr_enabled=atr_enabled,
+            atr_threshold=params.get('atr_threshold') or 0.0,
+            rsi_exit=params.get('rsi_exit'),
+            cooldown_bars=params.get('cooldown_bars'),
+            engine=engine,
+            out=(self._signal, self._entry),
+        )
+        return rows, signal
+
+    def backtest(self, rows, signal, params=None, end=None):
+        # fast_backtest по результату signals(); end — исключающая граница отрезка (этап прогрессивной оценки)
+        index = self.index[rows]
+        open_ = self._take('open', self.open, rows)
+        close = self._take('close', self.close, rows)
+        if end is not None:
+            k = index.searchsorted(end)
+            index, open_, close, signal = index[:k], open_[:k], close[:k], signal[:k]
+        return fast_backtest_arrays(index, open_, close, signal, params=params)
+
+    def staged(self, signal_params, params=None, engine='auto'):
+        return StagedTrial(self, signal_params, params, engine)
+
+    @property
+    def nbytes(self):
+        # Постоянная память структуры (без общего кэша индикаторов и исходного DataFrame)
+        buffers = [self.open, self.close, self.base_valid, self._valid, self._nan, self._signal, self._entry]
+        return sum(b.nbytes for b in buffers) + sum(b.nbytes for b in self._gather.values())
+
+    def __repr__(self):
+        return f"<MarketArrays: {len(self.index)} bars, {self.nbytes / 2 ** 20:.1f} MB buffers>"
+
+
+class StagedTrial:
+    # Прогрессивная оценка одного набора параметров по растущим отрезкам истории. Сигналы (ядро с продолжением)
+    # и бэктест (extend_backtest) считаются только до конца текущего этапа и продолжаются со следующего бара
+    # на следующем этапе: каждый бар проходится один раз, сколько бы этапов ни было, а отсечённый на первом
+    # этапе триал не считает сигналы и бэктест по остальной истории.
+    # backtest(end) совпадает с MarketArrays.backtest(*signals(signal_params), params, end) бит в бит
+    def __init__(self, market, signal_params, params=None, engine='auto'):
+        self.market = market
+        self.signal_params = signal_params
+        self.params = params
+        self._kernel = (_exit_only_resume_kernel_nb if resolve_engine(engine) == 'numba'
+                        else _exit_only_resume_kernel)
+        self._arrays = None
+        self.done = 0                 # сколько строк (баров после dropna) уже прошли сигналы и бэктест
+
+    def _prepare(self):
+        # Строки после dropna и массивы по ним — один раз на триал; свои буферы сигналов, а не общие
+        market, signal_params = self.market, self.signal_params
+        rsi, upper, lower, atr = market.indicators(signal_params)
+        atr_enabled = atr is not None
+        rows = market._rows([rsi, upper, lower] + ([atr] if atr_enabled else []))
+        close = market.close[rows]
+        self.index = market.index[rows]
+        self.open = market.open[rows]
+        self._arrays = (close, rsi[rows], upper[rows], lower[rows], atr[rows] if atr_enabled else close)
+        self.signal = np.empty(len(close), dtype=np.int64)
+        self.entry = np.empty(len(close), dtype=np.int64)
+        self.atr_enabled = atr_enabled
+        self.atr_threshold = float(signal_params.get('atr_threshold') or 0.0)
+        self.rsi_exit = float(signal_params.get('rsi_exit'))
+        self.cooldown_bars = int(signal_params.get('cooldown_bars'))
+        self.short = False
+        self.last_entry = -self.cooldown_bars  # номер строки последнего входа
+        self.state = BacktestState()
+
+    def _signals(self, k):
+        # Сигналы на строках [done, k): бар 0 куска — последняя уже посчитанная строка (как в ChunkedDonchianRsi)
+        start = max(self.done - 1, 0)
+        if self.done == 0:
+            self.signal[0] = 1
+        chunk = [values[start:k] for values in self._arrays]
+        short, last_entry = self._kernel(*chunk, self.atr_enabled, self.atr_threshold, self.rsi_exit,
+                                         self.cooldown_bars, self.short, self.last_entry - start,
+                                         self.signal[start:k], self.entry[start:k])
+        self.short, self.last_entry = bool(short), int(last_entry) + start
+
+    def _advance(self, k):
+        self._signals(k)
+        extend_backtest(self.state, self.index, self.open[self.done:k], self._arrays[0][self.done:k],
+                        self.signal[self.done:k], self.params)
+        self.done = k
+
+    def rows(self, end=None):
+        # Сколько строк (баров после dropna) до end; 0 — этап кончается раньше первого бара после прогрева
+        if self._arrays is None:
+            self._prepare()
+        return len(self.index) if end is None else int(self.index.searchsorted(end))
+
+    def backtest(self, end=None):
+        # Статистика fast_backtest на строках до end (исключающая граница; None — вся история)
+        k = self.rows(end)
+        if k < self.done:
+            raise ValueError("StagedTrial: этапы должны идти по возрастанию end")
+        if self.done == 0 and end is None:
+            # Без промежуточных этапов состояние не нужно: один проход fast_backtest_arrays дешевле
+            self._signals(k)
+            return fast_backtest_arrays(self.index, self.open, self._arrays[0], self.signal, params=self.params)
+        if k > self.done:
+            self._advance(k)
+        return backtest_stats(self.state, self.index)
@@ -0,0 +1,205 @@
+import io
+import os
+import json
+import shutil
+import argparse
+import hashlib
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+
+STORE_VERSION = 1
+
+
+def read_source(file_path):
+    # CSV или zip-архив с CSV (служебные файлы __MACOSX пропускаются)
+    if file_path.endswith('.zip'):
+        with zipfile.ZipFile(file_path) as zf:
+            name = next(n for n in zf.namelist() if n.endswith('.csv') and not n.startswith('__MACOSX'))
+            with zf.open(name) as f:
+                return pd.read_csv(f)
+    return pd.read_csv(file_path)
+
+
+def iter_source(file_path, chunk_rows):
+    # CSV или zip кусками по chunk_rows строк: архив распаковывается потоком, целиком в памяти не бывает
+    if file_path.endswith('.zip'):
+        with zipfile.ZipFile(file_path) as zf:
+            name = next(n for n in zf.namelist() if n.endswith('.csv') and not n.startswith('__MACOSX'))
+            with zf.open(name) as f:
+                yield from pd.read_csv(f, chunksize=chunk_rows)
+        return
+    with pd.read_csv(file_path, chunksize=chunk_rows) as reader:
+        yield from reader
+
+
+def read_source_tail(file_path, offset=0):
+    # Строки CSV, дописанные после байта offset: (DataFrame, новый offset). Читаются только полные строки —
+    # незавершённая последняя строка (файл ещё дописывается) останется до следующего вызова.
+    # zip не позволяет читать с середины — для него возвращается весь файл и offset None
+    if file_path.endswith('.zip'):
+        return read_source(file_path), None
+    with open(file_path, 'rb') as f:
+        header = f.readline()
+        f.seek(max(offset, len(header)))
+        payload = f.read()
+    end = payload.rfind(b'\n') + 1
+    frame = pd.read_csv(io.BytesIO(header + payload[:end]))
+    return frame, max(offset, len(header)) + end
+
+
+def source_digest(file_path, offset, size=4096):
+    # Хэш последних size байт перед offset: проверка, что уже прочитанная часть файла не переписана
+    if offset is None:
+        return None
+    with open(file_path, 'rb') as f:
+        f.seek(max(0, offset - size))
+        return hashlib.blake2b(f.read(min(size, offset)), digest_size=16).hexdigest()
+
+
+def normalize_ohlc(df):
+    df['Open'] = df['Open'].astype(float)
+    df['High'] = df['High'].astype(float)
+    df['Low'] = df['Low'].astype(float)
+    df['Close'] = df['Close'].astype(float)
+    df['Datetime'] = pd.to_datetime(df['Datetime'])
+    df = df.sort_values(by=['Datetime'])
+    df.drop_duplicates(subset=['Datetime'], keep='first', inplace=True)
+    df.set_index('Datetime', inplace=True)
+    return df
+
+
+def store_dir_for(file_path, store_root):
+    name = os.path.basename(file_path)
+    for suffix in ('.zip', '.csv'):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return os.path.join(store_root, name)
+
+
+def _source_signature(file_path):
+    st = os.stat(file_path)
+    return {'source': os.path.abspath(file_path), 'size': st.st_size, 'mtime': st.st_mtime}
+
+
+def read_meta(store_dir):
+    path = os.path.join(store_dir, 'meta.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def is_fresh(store_dir, file_path):
+    meta = read_meta(store_dir)
+    if meta is None or meta.get('version') != STORE_VERSION:
+        return False
+    signature = _source_signature(file_path)
+    return meta['size'] == signature['size'] and meta['mtime'] == signature['mtime']
+
+
+def ingest(file_path, store_root):
+    # Однократная конвертация CSV/zip в поколоночное хранилище, разбитое по годам:
+    #   <store_root>/<имя>/<год>/index.npy, Open.npy, High.npy, ...
+    df = normalize_ohlc(read_source(file_path))
+    store_dir = store_dir_for(file_path, store_root)
+    tmp_dir = f"{store_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    columns = [column for column in df.columns if pd.api.types.is_numeric_dtype(df[column])]
+    index = df.index.to_numpy()
+    years = df.index.year.to_numpy()
+    bounds = np.flatnonzero(np.r_[True, years[1:] != years[:-1], True])
+    partitions = []
+    for left, right in zip(bounds[:-1], bounds[1:]):
+        year = int(years[left])
+        part_dir = os.path.join(tmp_dir, str(year))
+        os.makedirs(part_dir)
+        np.save(os.path.join(part_dir, 'index.npy'), index[left:right])
+        for column in columns:
+            np.save(os.path.join(part_dir, f'{column}.npy'), df[column].to_numpy()[left:right])
+        partitions.append({'year': year, 'start': str(index[left]), 'end': str(index[right - 1]),
+                           'rows': int(right - left)})
+
+    meta = {'version': STORE_VERSION, 'columns': columns, 'index_name': df.index.name,
+            'partitions': partitions, **_source_signature(file_path)}
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    shutil.rmtree(store_dir, ignore_errors=True)
+    os.replace(tmp_dir, store_dir)
+    return store_dir
+
+
+def load_range(store_dir, start_date, end_date, columns=None):
+    # Читает только годы, пересекающиеся с [start_date, end_date], и только нужные колонки
+    meta = read_meta(store_dir)
+    if meta is None:
+        raise FileNotFoundError(f"Хранилище не найдено: {store_dir}")
+    columns = list(columns or meta['columns'])
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+
+    index_parts, value_parts = [], {column: [] for column in columns}
+    for part in meta['partitions']:
+        if pd.Timestamp(part['end']) < start or pd.Timestamp(part['start']) > end:
+            continue
+        part_dir = os.path.join(store_dir, str(part['year']))
+        index = np.load(os.path.join(part_dir, 'index.npy'), mmap_mode='r')
+        left = np.searchsorted(index, start.to_datetime64(), side='left')
+        right = np.searchsorted(index, end.to_datetime64(), side='right')
+        if left >= right:
+            continue
+        index_parts.append(np.asarray(index[left:right]))
+        for column in columns:
+            values = np.load(os.path.join(part_dir, f'{column}.npy'), mmap_mode='r')
+            value_parts[column].append(np.asarray(values[left:right]))
+
+    if index_parts:
+        index = pd.DatetimeIndex(np.concatenate(index_parts), name=meta['index_name'])
+        data = {column: np.concatenate(parts) for column, parts in value_parts.items()}
+    else:
+        index = pd.DatetimeIndex([], name=meta['index_name'])
+        data = {column: np.array([], dtype=np.float64) for column in columns}
+    return pd.DataFrame(data, index=index)
+
+
+def iter_range(store_dir, start_date, end_date, chunk_rows, columns=None):
+    # Как load_range, но кусками по chunk_rows строк: с диска через mmap читается только текущий кусок
+    meta = read_meta(store_dir)
+    if meta is None:
+        raise FileNotFoundError(f"Хранилище не найдено: {store_dir}")
+    columns = list(columns or meta['columns'])
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+
+    for part in meta['partitions']:
+        if pd.Timestamp(part['end']) < start or pd.Timestamp(part['start']) > end:
+            continue
+        part_dir = os.path.join(store_dir, str(part['year']))
+        index = np.load(os.path.join(part_dir, 'index.npy'), mmap_mode='r')
+        values = {column: np.load(os.path.join(part_dir, f'{column}.npy'), mmap_mode='r') for column in columns}
+        left = np.searchsorted(index, start.to_datetime64(), side='left')
+        right = np.searchsorted(index, end.to_datetime64(), side='right')
+        for lo in range(left, right, chunk_rows):
+            hi = min(lo + chunk_rows, right)
+            yield pd.DataFrame({column: np.array(values[column][lo:hi]) for column in columns},
+                               index=pd.DatetimeIndex(np.array(index[lo:hi]), name=meta['index_name']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Конвертация CSV/zip с котировками в поколоночное хранилище")
+    parser.add_argument('sources', nargs='+', help="CSV/zip файлы или папки с ними")
+    parser.add_argument('--store', default='../marketdata/store', help="Корень хранилища")
+    args = parser.parse_args()
+
+    for source in args.sources:
+        paths = ([os.path.join(source, name) for name in sorted(os.listdir(source))]
+                 if os.path.isdir(source) else [source])
+        for path in paths:
+            if path.endswith(('.csv', '.zip')):
+                print(f"{path} → {ingest(path, args.store)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from intra_channel_trading.scripts.scoring import CASH, TRADE_PENALTY
+from intra_channel_trading.scripts.signal_engine import njit, NUMBA_AVAILABLE
+
+
+# bootstrap — сделки с возвращением (block > 1 — блоками подряд идущих сделок),
+# shuffle — перестановка порядка сделок (итог тот же, меняется путь и просадка),
+# perturb — шум в PnL каждой сделки, издержки и пропуск части сделок
+METHODS = ('bootstrap', 'shuffle', 'perturb')
+METRICS = ('Equity Final [$]', 'Max. Drawdown [$]', 'Max. Drawdown [%]', 'Criteria')
+# Сколько ячеек (пути × сделки) обрабатывается за раз: ~8 МБ на матрицу float64
+CHUNK_CELLS = 1 << 20
+
+
+@njit(cache=True, nogil=True)
+def _path_metrics_kernel(pnl, n_trades, cash, trade_penalty, final, max_dd, max_dd_pct, criteria):
+    # Все метрики строки за один проход, без промежуточных матриц эквити и пиков
+    for p in range(pnl.shape[0]):
+        equity = cash
+        peak = cash
+        dd = 0.0
+        dd_pct = 0.0
+        for i in range(pnl.shape[1]):
+            equity += pnl[p, i]
+            if equity > peak:
+                peak = equity
+            else:
+                drop = peak - equity
+                if drop > dd:
+                    dd = drop
+                if drop > dd_pct * peak:  # деление — только когда просадка в % обновляется
+                    dd_pct = drop / peak
+        final[p] = equity
+        max_dd[p] = dd
+        max_dd_pct[p] = dd_pct * 100
+        criteria[p] = equity - cash - n_trades[p] * trade_penalty
+
+
+@njit(cache=True, nogil=True)
+def _shuffle_kernel(pnl, n_paths, seed, cash, trade_penalty, final, max_dd, max_dd_pct, criteria):
+    # Перестановка сделок (Фишер — Йейтс) и метрики пути в одном проходе: элемент i окончателен сразу после обмена
+    np.random.seed(seed)
+    n = pnl.shape[0]
+    order = pnl.copy()
+    for p in range(n_paths):
+        equity = cash
+        peak = cash
+        dd = 0.0
+        dd_pct = 0.0
+        for i in range(n):
+            j = i + int(np.random.random() * (n - i))  # быстрее randint(i, n); смещение ~2^-53
+            value = order[j]
+            order[j] = order[i]
+            order[i] = value
+            equity += value
+            if equity > peak:
+                peak = equity
+            else:
+                drop = peak - equity
+                if drop > dd:
+                    dd = drop
+                if drop > dd_pct * peak:  # деление — только когда просадка в % обновляется
+                    dd_pct = drop / peak
+        final[p] = equity
+        max_dd[p] = dd
+        max_dd_pct[p] = dd_pct * 100
+        criteria[p] = equity - cash - n * trade_penalty
+
+
+def _path_metrics(pnl, n_trades, cash, trade_penalty):
+    # Метрики по строкам матрицы PnL (пути × сделки): Numba — один проход, NumPy — серия матричных операций
+    if NUMBA_AVAILABLE:
+        out = tuple(np.empty(pnl.shape[0]) for _ in METRICS)
+        _path_metrics_kernel(pnl, n_trades.astype(np.int64), float(cash), float(trade_penalty), *out)
+        return out
+    equity = np.cumsum(pnl, axis=1)
+    equity += cash
+    final = equity[:, -1].copy()
+    peak = np.maximum.accumulate(equity, axis=1)
+    np.maximum(peak, cash, out=peak)           # начальный капитал — тоже пик
+    drawdown = peak - equity
+    max_dd = drawdown.max(axis=1)
+    drawdown /= peak
+    max_dd_pct = drawdown.max(axis=1) * 100
+    return final, max_dd, max_dd_pct, final - cash - n_trades * trade_penalty
+
+
+def _resample(pnl, method, rng, n_paths, block=1, noise=0.1, cost=0.0, drop=0.0):
+    # Матрица PnL (n_paths × сделки) и число исполненных сделок на каждом пути
+    n = len(pnl)
+    n_trades = np.full(n_paths, n)
+    if method == 'bootstrap':
+        if block <= 1:
+            paths = pnl[rng.integers(0, n, size=(n_paths, n), dtype=np.int32)]
+        else:
+            # Блочный bootstrap: сохраняет серии выигрышей/проигрышей внутри блока
+            n_blocks = -(-n // block)
+            starts = rng.integers(0, n, size=(n_paths, n_blocks, 1))
+            paths = pnl[((starts + np.arange(block)) % n).reshape(n_paths, -1)[:, :n]]
+    elif method == 'shuffle':
+        paths = rng.permuted(np.broadcast_to(pnl, (n_paths, n)), axis=1)
+    elif method == 'perturb':
+        # Относительный шум PnL (проскальзывание/исполнение) и фиксированные издержки на сделку
+        scale = np.abs(pnl) * noise
+        paths = pnl + rng.standard_normal((n_paths, n)) * scale - cost
+        if drop > 0:
+            skipped = rng.random((n_paths, n)) < drop
+            paths[skipped] = 0.0
+            n_trades = n - skipped.sum(axis=1)
+    else:
+        raise ValueError(f"Неизвестный метод Monte Carlo: {method!r}, допустимые: {METHODS}")
+    return paths, n_trades
+
+
+def simulate(pnl, method='bootstrap', n_paths=10_000, seed=42, cash=CASH, trade_penalty=TRADE_PENALTY, **kwargs):
+    # Распределение метрик по n_paths путям; пути считаются блоками по CHUNK_CELLS ячеек
+    pnl = np.asarray(pnl, dtype=np.float64)
+    if len(pnl) == 0:
+        return pd.DataFrame(columns=list(METRICS))
+    rng = np.random.default_rng(seed)
+    if method == 'shuffle' and NUMBA_AVAILABLE:
+        out = tuple(np.empty(n_paths) for _ in METRICS)
+        _shuffle_kernel(pnl, n_paths, int(rng.integers(2 ** 31)), float(cash), float(trade_penalty), *out)
+        return pd.DataFrame(dict(zip(METRICS, out)))
+    chunk = max(1, CHUNK_CELLS // len(pnl))
+    parts = []
+    for start in range(0, n_paths, chunk):
+        paths, n_trades = _resample(pnl, method, rng, min(chunk, n_paths - start), **kwargs)
+        parts.append(_path_metrics(paths, n_trades, cash, trade_penalty))
+    return pd.DataFrame({name: np.concatenate([part[i] for part in parts]) for i, name in enumerate(METRICS)})
+
+
+def observed_metrics(pnl, cash=CASH, trade_penalty=TRADE_PENALTY):
+    # Те же метрики для фактической последовательности сделок
+    pnl = np.asarray(pnl, dtype=np.float64)
+    if len(pnl) == 0:
+        return dict(zip(METRICS, (cash, 0.0, 0.0, 0.0)))
+    values = _path_metrics(pnl[None, :], np.array([len(pnl)]), cash, trade_penalty)
+    return {name: float(value[0]) for name, value in zip(METRICS, values)}
+
+
+def confidence_bands(paths, observed=None, levels=(0.05, 0.25, 0.5, 0.75, 0.95)):
+    # Квантили каждой метрики; Observed — фактическое значение и его процентиль в распределении путей
+    bands = paths.quantile(list(levels)).T
+    bands.columns = [f"p{round(level * 100):g}" for level in levels]
+    bands.insert(0, 'Mean', paths.mean())
+    if observed is not None:
+        bands['Observed'] = pd.Series(observed)
+        bands['Observed Pct'] = [(paths[name] <= observed[name]).mean() * 100 for name in bands.index]
+    return bands
+
+
+def robustness(trades, methods=METHODS, n_paths=10_000, seed=42, cash=CASH, levels=(0.05, 0.25, 0.5, 0.75, 0.95),
+               **kwargs):
+    # Сводная таблица (метод, метрика) по таблице сделок stats._trades;
+    # kwargs — параметры методов (block, noise, cost, drop), каждый метод берёт свои
+    pnl = trades['PnL'].to_numpy(dtype=np.float64) if isinstance(trades, pd.DataFrame) else np.asarray(trades)
+    observed = observed_metrics(pnl, cash)
+    options = {
+        'bootstrap': {key: kwargs[key] for key in ('block',) if key in kwargs},
+        'shuffle': {},
+        'perturb': {key: kwargs[key] for key in ('noise', 'cost', 'drop') if key in kwargs},
+    }
+    tables = {}
+    for i, method in enumerate(methods):
+        paths = simulate(pnl, method, n_paths=n_paths, seed=seed + i, cash=cash, **options[method])
+        table = confidence_bands(paths, observed, levels)
+        table['P(Criteria > 0)'] = np.nan
+        table.loc['Criteria', 'P(Criteria > 0)'] = (paths['Criteria'] > 0).mean() * 100
+        tables[method] = table
+    result = pd.concat(tables, names=['Method', 'Metric'])
+    result.attrs['observed'] = observed
+    return result
+
+
+def summary(table):
+    # Строка для сравнения кандидатов: медиана и 5-й процентиль критерия, P(критерий > 0), 95-й процентиль просадки
+    row = {}
+    for method in table.index.get_level_values('Method').unique():
+        criteria, drawdown = table.loc[(method, 'Criteria')], table.loc[(method, 'Max. Drawdown [%]')]
+        row[f'{method} Criteria p5'] = criteria.get('p5')
+        row[f'{method} Criteria p50'] = criteria.get('p50')
+        row[f'{method} P(Criteria > 0)'] = criteria['P(Criteria > 0)']
+        row[f'{method} Max. Drawdown [%] p95'] = drawdown.get('p95')
+    return row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo устойчивости по таблице сделок (*_trades.csv/npz/parquet)")
+    parser.add_argument('trades', nargs='+')
+    parser.add_argument('--paths', type=int, default=10_000)
+    parser.add_argument('--methods', nargs='+', choices=METHODS, default=list(METHODS))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--block', type=int, default=1, help="Длина блока для bootstrap")
+    parser.add_argument('--noise', type=float, default=0.1, help="perturb: относительный шум PnL сделки")
+    parser.add_argument('--cost', type=float, default=0.0, help="perturb: издержки на сделку, $")
+    parser.add_argument('--drop', type=float, default=0.0, help="perturb: доля пропущенных сделок")
+    parser.add_argument('--output', help="CSV со сводной таблицей (по умолчанию рядом с trade-логом)")
+    args = parser.parse_args(argv)
+
+    from intra_channel_trading.analytical_laboratory.hourly_day_trading_analyzer import load_trades
+
+    for path in args.trades:
+        table = robustness(load_trades(path), methods=args.methods, n_paths=args.paths, seed=args.seed,
+                           block=args.block, noise=args.noise, cost=args.cost, drop=args.drop)
+        output = args.output or f"{os.path.splitext(path)[0]}_monte_carlo.csv"
+        table.to_csv(output)
+        print(f"{path}\n{table.to_string(float_format=lambda v: f'{v:.2f}')}\n→ {output}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,61 +4,302 @@ import shutil
 import yaml
 import random
 import datetime
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
+import pandas as pd
 
 import optuna
-import optuna.visualization as vis
-import plotly.io as pio
 
+from intra_channel_trading.auxiliary.fast_backtest import fast_backtest
 from intra_channel_trading.auxiliary.utils import calculate_profit
-from intra_channel_trading.scripts.config_loader import load_config
+from intra_channel_trading.scripts.artifacts import ArtifactWriter, stats_summary, write_equity_chart
+from intra_channel_trading.scripts.config_loader import load_config, build_params, parse_marketdata_name
 from intra_channel_trading.scripts.data_loader import load_data
+from intra_channel_trading.scripts.indicator_cache import IndicatorCache, cached_fingerprint
+from intra_channel_trading.scripts.market_arrays import MarketArrays
+from intra_channel_trading.scripts import grid_search
+from intra_channel_trading.scripts import monte_carlo
+from intra_channel_trading.scripts import sensitivity
+from intra_channel_trading.scripts.resample import ResampleCache
+from intra_channel_trading.scripts.result_cache import ResultCache, result_key
+from intra_channel_trading.scripts.scoring import composite_score, criteria
+from intra_channel_trading.scripts.shared_data import publish_market_data, attach_market_data
 from intra_channel_trading.scripts.strategy import donchian_rsi_exit_only
+from intra_channel_trading.scripts.telemetry import (enable_telemetry, disable_telemetry, active_telemetry,
+                                                      stage, write_report, TELEMETRY_FILE)
 
 
 random.seed(42)
 np.random.seed(42)
 
+# Пространство поиска Optuna: параметр -> (min, max)
+SEARCH_SPACE = {
+    'donchian_window': (10, 50),
+    'rsi_period': (5, 30),
+    'rsi_exit': (10, 50),
+    'cooldown_bars': (5, 50),
+    'atr_period': (5, 30),
+    'atr_threshold': (0.0001, 0.0015),
+}
+
 def evaluate_strategy(signals, params, destination_path, filename='result'):
-    stats = calculate_profit(signals, verbose=False, filename=f"{destination_path}/{filename}", params=params)
+    # Для скоринга триалов хватает векторного бэктеста; backtesting.py нужен только для итогового отчёта
+    stats = fast_backtest(signals, params=params)
     # print(f'\n{stats[:-3]}')
     return stats
 
-def optuna_optimize_strategy(data, params, destination_path, n_trials=5):
-    def objective(trial):
-        signal_params = {
-            'donchian_window': trial.suggest_int('donchian_window', 10, 50),
-            'rsi_period': trial.suggest_int('rsi_period', 5, 30),
-            'rsi_exit': trial.suggest_int('rsi_exit', 10, 50),
-            'cooldown_bars': trial.suggest_int('cooldown_bars', 5, 50),
-            'atr_enabled': True,
-            'atr_period': trial.suggest_int('atr_period', 5, 30),
-            'atr_threshold': trial.suggest_float('atr_threshold', 0.0001, 0.0015),
-        }
-
-        signals = donchian_rsi_exit_only(data.copy(), signal_params)
-        stats = evaluate_strategy(signals, params, destination_path, filename=f"trial_{trial.number}")
-
-        score = (
-            stats['Return [%]'] * 0.4 +
-            stats['Sharpe Ratio'] * 0.2 +
-            stats['Win Rate [%]'] * 0.2 +
-            stats['Profit Factor'] * 0.2 +
-            stats['Expectancy [%]'] * 0.1 -
-            stats['Max. Drawdown [%]'] * 0.5
-        )
+def suggest_signal_params(trial):
+    return {
+        'donchian_window': trial.suggest_int('donchian_window', *SEARCH_SPACE['donchian_window']),
+        'rsi_period': trial.suggest_int('rsi_period', *SEARCH_SPACE['rsi_period']),
+        'rsi_exit': trial.suggest_int('rsi_exit', *SEARCH_SPACE['rsi_exit']),
+        'cooldown_bars': trial.suggest_int('cooldown_bars', *SEARCH_SPACE['cooldown_bars']),
+        'atr_enabled': True,
+        'atr_period': trial.suggest_int('atr_period', *SEARCH_SPACE['atr_period']),
+        'atr_threshold': trial.suggest_float('atr_threshold', *SEARCH_SPACE['atr_threshold']),
+    }
+
+
+def score_signal_params(data, signal_params, params, cache=None, end=None, results=None, market=None):
+    # end — исключающая граница этапа прогрессивной оценки (None — вся история)
+    # results: ResultCache — уже посчитанные оценки берутся с диска без расчёта сигналов и бэктеста
+    # market: MarketArrays — путь без копий DataFrame (структура массивов + общие буферы)
+    indicators = market.cache if market is not None else cache
+    dtype = indicators.dtype if indicators is not None else None
+    key = results.key(data, signal_params, params, end, dtype) if results is not None else None
+    if key is not None:
+        score = results.get_score(key)
+        if score is not None:
+            return score
+    if market is not None:
+        stats = market.backtest(*market.signals(signal_params), params=params, end=end)
+    else:
+        signals = donchian_rsi_exit_only(data, signal_params, cache=cache)
+        if end is not None:
+            signals = signals[signals.index < end]
+        stats = fast_backtest(signals, params=params)
+    score = composite_score(stats)
+    if key is not None:
+        results.put_score(key, score, stats)
+    return score
+
+
+def _stage_score(staged, data, signal_params, params, end=None, results=None):
+    # Score этапа прогрессивной оценки: из кэша оценок или продолжением StagedTrial до end.
+    # Этап без баров (кончается раньше прогрева индикаторов) — NaN, _report_stage его пропускает
+    if not staged.rows(end):
+        return np.nan
+    key = results.key(data, signal_params, params, end, staged.market.cache.dtype) if results is not None else None
+    score = results.get_score(key) if key is not None else None
+    if score is None:
+        stats = staged.backtest(end)
+        score = composite_score(stats)
+        if key is not None:
+            results.put_score(key, score, stats)
+    return score
+
+
+def make_stage_ends(index, stages=None):
+    # Границы этапов прогрессивной оценки: доли истории ([0.25, 0.5]) или шаг ("90D" — поквартально).
+    # Последний этап — всегда вся история, его score и идёт в study
+    if not stages:
+        return [None]
+    if isinstance(stages, str):
+        step = pd.Timedelta(stages)
+        ends = list(pd.date_range(index[0] + step, index[-1], freq=step))
+    else:
+        ends = [index[0] + (index[-1] - index[0]) * fraction for fraction in sorted(stages) if 0 < fraction < 1]
+    return ends + [None]
+
+
+def make_pruner(kind, n_reports=1):
+    # n_reports — число промежуточных этапов, о которых триал отчитывается (шаги 1..n_reports);
+    # последний этап (вся история) не репортится, поэтому max_resource Hyperband — последний репортуемый шаг
+    if not kind or kind == 'none':
+        return optuna.pruners.NopPruner()
+    if kind == 'median':
+        return optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=0)
+    if kind == 'hyperband':
+        return optuna.pruners.HyperbandPruner(min_resource=1, max_resource=max(1, n_reports))
+    raise ValueError(f"Неизвестный pruner: {kind!r}, допустимые: 'none', 'median', 'hyperband'")
+
+
+def _report_stage(trial, score, step):
+    # Промежуточный score этапа step (с 0) репортится как шаг step + 1: ресурс первого этапа — 1,
+    # как min_resource Hyperband. True — триал нужно отсечь
+    if score == score:  # NaN (нет сделок на отрезке) не репортим
+        trial.report(score, step + 1)
+    return trial.should_prune()
+
+
+def make_storage(kind, destination_path):
+    # Локальное хранилище study: 'journal' (файл журнала) или 'sqlite'; None — в памяти.
+    # destination_path может быть постоянной папкой (storage_dir) — тогда study переживает перезапуски
+    if not kind:
+        return None
+    os.makedirs(destination_path, exist_ok=True)
+    if kind == 'sqlite':
+        return f"sqlite:///{os.path.abspath(os.path.join(destination_path, 'study.db'))}"
+    if kind == 'journal':
+        path = os.path.join(destination_path, 'study.journal')
+        try:
+            backend = optuna.storages.journal.JournalFileBackend(path)
+        except AttributeError:  # optuna < 4.0
+            backend = optuna.storages.JournalFileStorage(path)
+        return optuna.storages.JournalStorage(backend)
+    raise ValueError(f"Неизвестный тип хранилища study: {kind!r}, допустимые: 'journal', 'sqlite'")
+
+
+# Состояние процесса-воркера: данные из общей памяти, торговые параметры и свой кэш индикаторов
+_WORKER = {}
+
+
+def default_study_name(data, params, ticker, timeframe, dtype=None):
+    # Имя study однозначно задаётся данными, диапазоном, торговыми параметрами и точностью индикаторов:
+    # повторный запуск на тех же условиях продолжает тот же study, на других — начинает новый
+    digest = result_key(cached_fingerprint(data), data.index[0], data.index[-1], {}, params, dtype=dtype)[:10]
+    return f"donchian_rsi_{ticker}_{timeframe}_{digest}"
+
+
+def _finished_trials(study):
+    states = (optuna.trial.TrialState.COMPLETE, optuna.trial.TrialState.PRUNED)
+    return len(study.get_trials(deepcopy=False, states=states))
+
+
+def _init_worker(shared_dir, params, cache_kwargs, telemetry_path=None, results_dir=None):
+    _WORKER['data'] = attach_market_data(shared_dir)
+    _WORKER['params'] = params
+    _WORKER['cache'] = IndicatorCache(**cache_kwargs)
+    _WORKER['market'] = MarketArrays(_WORKER['data'], _WORKER['cache'])
+    _WORKER['results'] = ResultCache(results_dir) if results_dir else None
+    if telemetry_path:
+        # Воркеры дописывают свои этапы в общий JSONL основного процесса
+        enable_telemetry(telemetry_path)
+
+
+def _score_in_worker(signal_params, end=None, trial_number=None, step=None):
+    # Все этапы триала приходят в один и тот же воркер (см. _optimize_parallel): его StagedTrial живёт
+    # между задачами, и этап продолжает сигналы и бэктест с конца предыдущего
+    with stage('trial', trial=trial_number, step=step):
+        current = _WORKER.get('trial')
+        if current is None or trial_number is None or current[0] != trial_number:
+            current = _WORKER['trial'] = (trial_number, _WORKER['market'].staged(signal_params, _WORKER['params']))
+        score = _stage_score(current[1], _WORKER['data'], signal_params, _WORKER['params'], end,
+                             _WORKER['results'])
+        if end is None:
+            del _WORKER['trial']
         return score
 
-    study = optuna.create_study(direction='maximize', sampler=optuna.samplers.TPESampler(seed=42))
-    study.optimize(objective, n_trials=n_trials)
 
-    return study
+def _optimize_parallel(study, data, params, destination_path, n_trials, n_workers, cache_kwargs, stage_ends,
+                       results_dir=None):
+    # Параметры запрашиваются пачками по n_workers через ask/tell в фиксированном порядке,
+    # поэтому при одном и том же seed последовательность триалов не зависит от скорости воркеров.
+    # Этапы прогрессивной оценки идут раундами: на следующий этап попадают только неотсечённые триалы.
+    # У каждого слота пачки свой процесс: все этапы триала идут в один воркер и продолжают его StagedTrial
+    shared_dir = publish_market_data(data, os.path.join(destination_path, 'shared_data'))
+    telemetry = active_telemetry()
+    telemetry_path = telemetry.path if telemetry is not None else None
+    try:
+        with contextlib.ExitStack() as stack:
+            pools = [stack.enter_context(ProcessPoolExecutor(
+                max_workers=1, initializer=_init_worker,
+                initargs=(shared_dir, params, cache_kwargs, telemetry_path, results_dir))) for _ in range(n_workers)]
+            done = 0
+            while done < n_trials:
+                trials = [study.ask() for _ in range(min(n_workers, n_trials - done))]
+                active = [(pool, trial, suggest_signal_params(trial)) for pool, trial in zip(pools, trials)]
+                for step, end in enumerate(stage_ends):
+                    futures = [(pool, trial, signal_params,
+                                pool.submit(_score_in_worker, signal_params, end, trial.number, step))
+                               for pool, trial, signal_params in active]
+                    active = []
+                    for pool, trial, signal_params, future in futures:
+                        try:
+                            score = future.result()
+                        except Exception as e:
+                            print(f"Trial {trial.number} failed: {e!r}")
+                            study.tell(trial, state=optuna.trial.TrialState.FAIL)
+                            continue
+                        if end is None:
+                            study.tell(trial, score)
+                        elif _report_stage(trial, score, step):
+                            study.tell(trial, state=optuna.trial.TrialState.PRUNED)
+                        else:
+                            active.append((pool, trial, signal_params))
+                done += len(trials)
+    finally:
+        shutil.rmtree(shared_dir, ignore_errors=True)
+
+
+def optuna_optimize_strategy(data, params, destination_path, n_trials=5, cache=None,
+                             n_workers=1, storage=None, study_name=None, seed=42,
+                             pruner=None, stages=None, results=None, resume=False, enqueue=None):
+    # Один кэш индикаторов на весь study: повторяющиеся периоды не пересчитываются
+    # results: ResultCache — оценки, посчитанные в прошлых запусках, не пересчитываются
+    # resume: n_trials — целевое число завершённых триалов в study, прерванный запуск добирает только остаток
+    # enqueue: наборы параметров, которые считаются первыми триалами (например, лучшие точки сеточного поиска)
+    cache = cache if cache is not None else IndicatorCache()
+    market = MarketArrays(data, cache)
+    stage_ends = make_stage_ends(data.index, stages)
+
+    def objective(trial):
+        with stage('trial', trial=trial.number):
+            signal_params = suggest_signal_params(trial)
+            # Прогрессивная оценка: score на растущих отрезках истории, безнадёжные триалы отсекаются pruner'ом.
+            # Сигналы и бэктест считаются только до конца этапа и продолжаются на следующем
+            staged = market.staged(signal_params, params)
+            for step, end in enumerate(stage_ends):
+                score = _stage_score(staged, data, signal_params, params, end, results)
+                if end is None:
+                    return score
+                if _report_stage(trial, score, step):
+                    raise optuna.TrialPruned()
+
+    study = optuna.create_study(direction='maximize', sampler=optuna.samplers.TPESampler(seed=seed),
+                                pruner=make_pruner(pruner, len(stage_ends) - 1),
+                                storage=storage, study_name=study_name, load_if_exists=True)
+    if resume:
+        finished = _finished_trials(study)
+        if finished:
+            print(f"Study {study.study_name!r}: продолжение с {finished} завершённых триалов")
+        n_trials = max(0, n_trials - finished)
+    for signal_params in (enqueue or [])[:n_trials]:
+        study.enqueue_trial(signal_params, skip_if_exists=True)
+    if n_workers > 1:
+        cache_kwargs = {'max_bytes': cache.max_bytes, 'spill_dir': cache.spill_dir, 'dtype': cache.dtype}
+        _optimize_parallel(study, data, params, destination_path, n_trials, n_workers, cache_kwargs, stage_ends,
+                           results_dir=results.cache_dir if results is not None else None)
+    elif n_trials:
+        study.optimize(objective, n_trials=n_trials)
 
+    return study
 
 
-def main():
-    source_config_path = "../configs/config_donchian_rsi.yaml"
+def robust_top_k(study, data, params, k=5, cache=None, **mc_options):
+    # Monte Carlo по сделкам k лучших триалов: отличает устойчивые параметры от удачной последовательности сделок.
+    # mc_options — n_paths, methods, seed, block, noise, cost, drop (см. monte_carlo.robustness)
+    trials = sorted((t for t in study.trials if t.state == optuna.trial.TrialState.COMPLETE and t.value is not None),
+                    key=lambda t: t.value, reverse=True)[:k]
+    market = MarketArrays(data, cache or IndicatorCache())
+    rows, tables = [], {}
+    for trial in trials:
+        signal_params = suggest_signal_params(optuna.trial.FixedTrial(trial.params))
+        stats = market.backtest(*market.signals(signal_params), params=params)
+        table = monte_carlo.robustness(stats['_trades'], **mc_options)
+        tables[trial.number] = table
+        rows.append(dict({'trial': trial.number, 'score': trial.value, '# Trades': stats['# Trades'],
+                          'Criteria': table.attrs['observed']['Criteria']},
+                         **trial.params, **monte_carlo.summary(table)))
+    bands = pd.concat(tables, names=['trial']) if tables else pd.DataFrame()
+    return pd.DataFrame(rows), bands
+
+
+def main(source_config_path="../configs/config_donchian_rsi.yaml", root='..', headless=False):
+    # root — папка проекта, относительно которой заданы пути в конфиге (по умолчанию запуск из scripts/)
+    # headless — без окон и HTML-графиков (Optuna, bokeh): только CSV/YAML-артефакты
     config = load_config(source_config_path)
     # Извлечение конфигурации для данных, стратегии и других параметров
     out_cfg = config.get('output', {})
@@ -66,44 +307,93 @@ def main():
     dataset_path = data_cfg.get('dataset_path', '')  # Путь к папке с данными
     marketdata = data_cfg.get('marketdata', '')  # Имя файла данных
 
-    strategy_cfg = config.get('strategy', {})
-    params = {
-        # -- основные индикаторы
-        "donchian_window": strategy_cfg["donchian_window"],  # Donchian
-        "rsi_period": strategy_cfg["rsi_period"],
-        "rsi_exit": strategy_cfg["rsi_exit"],
-        "cooldown_bars": strategy_cfg["cooldown_bars"],
-
-        # -- управление торговой сессией
-        "eod_exit": strategy_cfg["eod_exit"],
-        "trading_hours": {
-            "allowed": strategy_cfg["trading_hours"]["allowed"],
-            "allowed_days": strategy_cfg["trading_hours"].get("allowed_days")
-        },
-
-        # -- ATR-фильтр волатильности
-        "atr_enabled": strategy_cfg["atr_enabled"],
-        "atr_period": strategy_cfg["atr_period"],
-        "atr_threshold": strategy_cfg["atr_threshold"],
-        "atr_pct_threshold": strategy_cfg.get("atr_pct_threshold"),
-    }
+    params = build_params(config)
 
-    ticker = marketdata.split('/')[-1].split('_')[0]
-    timeframe = marketdata.split('/')[-1].split('_')[1]
-    broker = marketdata.split('/')[-1].split('_')[4][:-4]
+    ticker, timeframe, broker = parse_marketdata_name(marketdata)
+    if data_cfg.get('resample_minutes'):
+        timeframe = f"{data_cfg['resample_minutes']}M"
     print(ticker, timeframe, broker)
 
     now = datetime.datetime.now()
     add_on_to_folder_name = now.strftime("%Y%m%d%H%M%S")
-    destination_path = f"../outputs/tune_outputs/tune_{ticker}_{timeframe}_{broker}_{add_on_to_folder_name}"
+    destination_path = os.path.join(root, "outputs", "tune_outputs",
+                                    f"tune_{ticker}_{timeframe}_{broker}_{add_on_to_folder_name}")
     os.makedirs(destination_path, exist_ok=True)
+    # Телеметрия этапов (время, CPU, пиковый RSS) в JSONL рядом с артефактами
+    telemetry_cfg = config.get('telemetry', {})
+    if telemetry_cfg.get('enabled', False):
+        enable_telemetry(os.path.join(destination_path, TELEMETRY_FILE))
 
     # Загрузка данных
-    data = load_data(f'../{dataset_path}/{marketdata}',
+    store_path = data_cfg.get('store_path')
+    data = load_data(os.path.join(root, dataset_path, marketdata),
                      start_date=data_cfg["start_date"],
-                     end_date=data_cfg["end_date"])
-
-    study = optuna_optimize_strategy(data, params, destination_path, n_trials=5)
+                     end_date=data_cfg["end_date"],
+                     store_root=os.path.join(root, store_path) if store_path else None)
+    # Нестандартный таймфрейм строится из базового ряда; кэш по отпечатку ряда переживает перезапуски
+    if data_cfg.get('resample_minutes'):
+        resample_cache_dir = data_cfg.get('resample_cache_dir')
+        resample_cache = ResampleCache(cache_dir=os.path.join(root, resample_cache_dir) if resample_cache_dir else None)
+        data = resample_cache.get(data, data_cfg['resample_minutes'])
+
+    opt_cfg = config.get('optimization', {})
+    cache = IndicatorCache(max_bytes=opt_cfg.get('indicator_cache_mb', 512) * 2 ** 20,
+                           spill_dir=opt_cfg.get('indicator_cache_dir'),
+                           dtype=np.float32 if opt_cfg.get('float32', False) else np.float64)
+    if opt_cfg.get('prefill_indicators', False):
+        # Все периоды пространства поиска сразу, пакетными функциями
+        for name, key in (('donchian', 'donchian_window'), ('rsi', 'rsi_period'), ('atr', 'atr_period')):
+            low, high = SEARCH_SPACE[key]
+            cache.prefill(data, name, range(low, high + 1))
+    n_workers = opt_cfg.get('n_workers', 1)
+    if n_workers in (0, -1, None):
+        n_workers = os.cpu_count()
+    # Сеточный поиск: поверхность score по всему пространству одним пакетным ядром;
+    # лучшие точки сетки становятся первыми триалами study (точная оценка) и стартом для TPE
+    grid_cfg = config.get('grid', {})
+    enqueue = []
+    if grid_cfg.get('enabled', False):
+        grid_workers = grid_cfg.get('n_workers', 1)
+        if grid_workers in (0, -1, None):
+            grid_workers = os.cpu_count()
+        fixed = grid_cfg.get('fixed') or {}
+        with stage('grid_search'):
+            surface = grid_search.search(data, params, SEARCH_SPACE, steps=grid_cfg.get('steps'),
+                                         rounds=grid_cfg.get('rounds', 3), top_n=grid_cfg.get('top_n', 5),
+                                         radius=grid_cfg.get('radius', 1), min_steps=grid_cfg.get('min_steps'),
+                                         fixed=fixed, cache=cache, n_workers=grid_workers,
+                                         max_combos=grid_cfg.get('max_combos', grid_search.MAX_COMBOS))
+            maps = grid_search.projections(surface, [key for key in grid_search.PARAM_KEYS if key not in fixed])
+        surface.to_csv(os.path.join(destination_path, "grid_surface.csv"), index=False)
+        maps.to_csv(os.path.join(destination_path, "grid_projections.csv"), index=False)
+        if not headless and not maps.empty:
+            sensitivity.write_heatmap_html(os.path.join(destination_path, "grid_projections.html"), maps,
+                                           value='Max', title="Поверхность score сеточного поиска")
+        print(f"Сетка: {len(surface)} наборов")
+        print(surface.head(10).to_string(index=False, float_format=lambda v: f"{v:.5g}"))
+        enqueue = grid_search.to_trial_params(surface, grid_cfg.get('enqueue_top', 5))
+
+    # Постоянное хранилище study (storage_dir) и кэш оценок (result_cache_dir) переживают перезапуски:
+    # study с тем же именем продолжается, уже посчитанные параметры не пересчитываются
+    storage_dir = opt_cfg.get('storage_dir')
+    study_name = opt_cfg.get('study_name') or default_study_name(data, params, ticker, timeframe, cache.dtype)
+    result_cache_dir = opt_cfg.get('result_cache_dir')
+    results = ResultCache(os.path.join(root, result_cache_dir)) if result_cache_dir else None
+    study = optuna_optimize_strategy(data, params, destination_path,
+                                     n_trials=opt_cfg.get('n_trials', 5), cache=cache,
+                                     n_workers=n_workers,
+                                     storage=make_storage(opt_cfg.get('storage'),
+                                                          os.path.join(root, storage_dir) if storage_dir else destination_path),
+                                     study_name=study_name,
+                                     seed=opt_cfg.get('seed', 42),
+                                     pruner=opt_cfg.get('pruner'),
+                                     stages=opt_cfg.get('stages'),
+                                     results=results,
+                                     resume=opt_cfg.get('resume', False),
+                                     enqueue=enqueue)
+    print(f"Study: {study.study_name} ({len(study.trials)} trials)")
+    if n_workers == 1:
+        print(cache)  # при n_workers > 1 триалы считаются кэшами воркеров
     # Сохраняем лучшие параметры как YAML
     # best_params_path = os.path.join(destination_path, "best_params.yaml")
     # with open(best_params_path, "w") as f:
@@ -120,23 +410,76 @@ def main():
 
     # Путь к новому конфигу
     optimized_config_path = os.path.join(destination_path, "optimized_config.yaml")
-    with open(optimized_config_path, "w") as f:
-        yaml.dump(optimized_config, f, allow_unicode=True, sort_keys=False)
-
-    # Визуализация истории оптимизации
-    opt_hist_fig = vis.plot_optimization_history(study)
-    opt_hist_fig.show()
-    pio.write_html(opt_hist_fig, file=os.path.join(destination_path, "opt_history.html"))
-
-    # Визуализация важности параметров
-    opt_param_fig = vis.plot_param_importances(study)
-    opt_param_fig.show()
-    pio.write_html(opt_param_fig, file=os.path.join(destination_path, "opt_param_importance.html"))
+    with stage('write_artifacts', artifact='optimized_config'):
+        with open(optimized_config_path, "w") as f:
+            yaml.dump(optimized_config, f, allow_unicode=True, sort_keys=False)
+
+    if not headless:
+        # plotly и optuna.visualization нужны только здесь — импортируются лениво
+        import optuna.visualization as vis
+        import plotly.io as pio
+
+        with stage('write_artifacts', artifact='optuna_plots'):
+            # Визуализация истории оптимизации
+            opt_hist_fig = vis.plot_optimization_history(study)
+            opt_hist_fig.show()
+            pio.write_html(opt_hist_fig, file=os.path.join(destination_path, "opt_history.html"))
+
+            # Визуализация важности параметров
+            opt_param_fig = vis.plot_param_importances(study)
+            opt_param_fig.show()
+            pio.write_html(opt_param_fig, file=os.path.join(destination_path, "opt_param_importance.html"))
 
     print("Best Parameters:")
     for key, value in study.best_params.items():
         print(f"{key}: {value}")
     print(f"Best Score: {study.best_value:.4f}")
+    if results is not None:
+        # Метрики лучшего триала — из кэша оценок, без повторного бэктеста
+        best_signal_params = suggest_signal_params(optuna.trial.FixedTrial(study.best_params))
+        best_stats = results.get_stats(results.key(data, best_signal_params, params, dtype=cache.dtype))
+        if best_stats is not None:
+            for key, value in best_stats.items():
+                print(f"{key}: {value:.4f}")
+        print(results)
+
+    # Устойчивость лучших кандидатов: bootstrap / перестановка / возмущение сделок
+    mc_cfg = config.get('robustness', {})
+    if mc_cfg.get('top_k', 0):
+        with stage('robustness'):
+            top_k, bands = robust_top_k(study, data, params, k=mc_cfg['top_k'], cache=cache,
+                                        n_paths=mc_cfg.get('n_paths', 10_000),
+                                        methods=mc_cfg.get('methods', monte_carlo.METHODS),
+                                        seed=opt_cfg.get('seed', 42),
+                                        block=mc_cfg.get('block', 1), noise=mc_cfg.get('noise', 0.1),
+                                        cost=mc_cfg.get('cost', 0.0), drop=mc_cfg.get('drop', 0.0))
+        top_k.to_csv(os.path.join(destination_path, "robustness_top_k.csv"), index=False)
+        bands.to_csv(os.path.join(destination_path, "robustness_bands.csv"))
+        print(top_k.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+
+    # Чувствительность: насколько острый оптимум — ±radius шагов вокруг лучшего триала одним пакетом
+    sens_cfg = config.get('sensitivity', {})
+    if sens_cfg.get('radius', 0):
+        sens_workers = sens_cfg.get('n_workers', 1)
+        if sens_workers in (0, -1, None):
+            sens_workers = os.cpu_count()
+        keys = sens_cfg.get('params') or sensitivity.PARAM_KEYS
+        best = suggest_signal_params(optuna.trial.FixedTrial(study.best_params))
+        with stage('sensitivity'):
+            neighbours = sensitivity.evaluate(data, params, best, radius=sens_cfg['radius'], keys=keys,
+                                              steps=sens_cfg.get('steps'), bounds=SEARCH_SPACE, cache=cache,
+                                              n_workers=sens_workers)
+            rings = sensitivity.plateau(neighbours)
+            maps = sensitivity.heatmaps(neighbours, keys)
+        neighbours.to_csv(os.path.join(destination_path, "sensitivity_neighbours.csv"), index=False)
+        rings.to_csv(os.path.join(destination_path, "sensitivity_plateau.csv"), index=False)
+        sensitivity.by_parameter(neighbours, keys).to_csv(
+            os.path.join(destination_path, "sensitivity_params.csv"), index=False)
+        maps.to_csv(os.path.join(destination_path, "sensitivity_heatmap.csv"), index=False)
+        if not headless and not maps.empty:
+            sensitivity.write_heatmap_html(os.path.join(destination_path, "sensitivity_heatmap.html"), maps)
+        print(rings.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+        print(f"Соседей: {len(neighbours)}, Plateau Score: {rings.attrs['plateau_score']:.3f}")
 
 
     # Генерация имени
@@ -147,24 +490,34 @@ def main():
         f"atr{params['atr_enabled']}_source={broker}"
     )
 
-    # Создание сигналов и расчет метрик
+    # Создание сигналов и расчет метрик; сигналы пишутся в фоне, пока идёт бэктест
     final_signals = donchian_rsi_exit_only(data.copy(), study.best_params)
-    final_stats = calculate_profit(
-        signals=final_signals,
-        verbose=True,
-        filename=f"{destination_path}/{filename}",
-        params=params  # здесь params — торговые настройки (fixed lot и т.д.)
-    )
+    writer = ArtifactWriter.from_config(destination_path, out_cfg)
+    writer.write(filename, final_signals)
+    chart = 'none' if headless else out_cfg.get('chart', 'bokeh')
+    with stage('calculate_profit'):
+        final_stats = calculate_profit(
+            signals=final_signals,
+            verbose=chart == 'bokeh',
+            filename=f"{destination_path}/{filename}",
+            params=params  # здесь params — торговые настройки (fixed lot и т.д.)
+        )
     # Сохранение результатов
-    final_signals.to_csv(f"{destination_path}/{filename}.csv")
-    final_stats[:-3].to_csv(f"{destination_path}/{filename}_stats.csv")
-    final_stats._trades.to_csv(f"{destination_path}/{filename}_trades.csv")
-    # Копирование конфигов
-    shutil.copy2(source_config_path, f"{destination_path}/{os.path.basename(source_config_path)}")
-    shutil.copy2(optimized_config_path, f"{destination_path}/{os.path.basename(optimized_config_path)}")
+    with stage('write_artifacts', artifact='results'):
+        stats_summary(final_stats).to_csv(f"{destination_path}/{filename}_stats.csv")
+        writer.write(f"{filename}_trades", final_stats._trades)
+        if chart == 'lttb':
+            write_equity_chart(f"{destination_path}/{filename}.html", final_signals, final_stats,
+                               out_cfg.get('chart_points', 5000))
+        # Копирование конфигов
+        shutil.copy2(source_config_path, f"{destination_path}/{os.path.basename(source_config_path)}")
+        writer.close()
     # Печать критерия
-    criteria = final_stats['Equity Final [$]'] - 100_000 - final_stats['# Trades'] * 7
-    print(f"\n📌 Итоговый критерий: {criteria:.2f}")
+    print(f"\n📌 Итоговый критерий: {criteria(final_stats):.2f}")
+
+    telemetry = disable_telemetry()
+    if telemetry is not None:
+        write_report(telemetry, destination_path)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,85 @@
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .indicator_cache import cached_fingerprint
+
+
+NS_PER_MINUTE = 60 * 10 ** 9
+NS_PER_DAY = 24 * 60 * NS_PER_MINUTE
+
+
+def base_minutes(data):
+    # Таймфрейм исходного ряда в минутах (по медиане шага между барами)
+    step = pd.Series(data.index[:1000]).diff().median()
+    return int(step / pd.Timedelta(minutes=1))
+
+
+def resample_ohlc(data, minutes):
+    # Нестандартный N-минутный таймфрейм из более мелкого ряда. Бакеты отсчитываются от полуночи каждого дня
+    # (как у терминала), метка бара — начало бакета. Агрегация векторная: reduceat по границам бакетов
+    base = base_minutes(data)
+    if minutes % base:
+        raise ValueError(f"Таймфрейм {minutes}M не кратен исходному {base}M")
+
+    ts = data.index.as_unit('ns').asi8
+    day = ts - ts % NS_PER_DAY
+    bucket = day + (ts - day) // (minutes * NS_PER_MINUTE) * (minutes * NS_PER_MINUTE)
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(ts)] - 1
+
+    columns = {
+        'Open': data['Open'].to_numpy()[starts],
+        'High': np.maximum.reduceat(data['High'].to_numpy(), starts),
+        'Low': np.minimum.reduceat(data['Low'].to_numpy(), starts),
+        'Close': data['Close'].to_numpy()[ends],
+    }
+    if 'Volume' in data.columns:
+        columns['Volume'] = np.add.reduceat(data['Volume'].to_numpy(), starts)
+    index = pd.DatetimeIndex(bucket[starts], name=data.index.name).as_unit(data.index.unit)
+    return pd.DataFrame(columns, index=index)
+
+
+class ResampleCache:
+    # Кэш производных таймфреймов по (отпечаток исходного ряда, размер бакета): в памяти (LRU) и, опционально, на диске
+    def __init__(self, max_entries=64, cache_dir=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        fingerprint, minutes = key
+        return os.path.join(self.cache_dir, f"{fingerprint}_{minutes}M.pkl")
+
+    def get(self, data, minutes):
+        key = (cached_fingerprint(data), int(minutes))
+        frame = self._entries.get(key)
+        if frame is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return frame
+
+        if self.cache_dir and os.path.exists(self._path(key)):
+            frame = pd.read_pickle(self._path(key))
+            self.hits += 1
+        else:
+            frame = resample_ohlc(data, minutes)
+            self.misses += 1
+            if self.cache_dir:
+                tmp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+                frame.to_pickle(tmp_path)
+                os.replace(tmp_path, self._path(key))
+
+        self._entries[key] = frame
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return frame
+
+    def __repr__(self):
+        return f"<ResampleCache: {len(self._entries)} entries, hits={self.hits} misses={self.misses}>"
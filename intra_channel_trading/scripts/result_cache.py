@@ -0,0 +1,109 @@
+import os
+import json
+import hashlib
+
+import numpy as np
+
+from intra_channel_trading.auxiliary.fast_backtest import STATS_KEYS, TRADING_KEYS
+from intra_channel_trading.scripts.indicator_cache import cached_fingerprint
+
+
+# Версия движка оценки: увеличивается при любом изменении семантики ядра сигналов,
+# fast_backtest или composite_score — старые записи кэша после этого просто не находятся
+ENGINE_VERSION = 1
+# Метрики бэктеста, которые хранятся рядом со score: сводка триала без повторного прогона
+RECORD_KEYS = STATS_KEYS + ('# Trades', 'Equity Final [$]')
+
+
+def _normalize(value):
+    # Ключ не должен зависеть от типа числа (np.int64 vs int) и порядка ключей словаря
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return repr(float(value))
+    return value if value is None or isinstance(value, str) else str(value)
+
+
+def result_key(fingerprint, start, end, signal_params, params, stage_end=None, engine_version=ENGINE_VERSION,
+               dtype=None):
+    # Адрес результата: (отпечаток данных, диапазон дат, параметры сигнала, торговые параметры, версия движка,
+    # точность кэша индикаторов). float32 меняет score в 3-4 знаке, поэтому входит в ключ;
+    # для float64 поле не пишется — ключи прежних записей и имена study не меняются
+    payload = {
+        'dataset': fingerprint,
+        'range': [str(start), str(end)],
+        'stage_end': None if stage_end is None else str(stage_end),
+        'signal_params': _normalize(signal_params),
+        'params': _normalize({k: (params or {}).get(k) for k in TRADING_KEYS}),
+        'engine': engine_version,
+    }
+    if dtype is not None and np.dtype(dtype) != np.float64:
+        payload['dtype'] = np.dtype(dtype).name
+    payload = json.dumps(payload, sort_keys=True)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=20).hexdigest()
+
+
+class ResultCache:
+    # Content-addressed кэш результатов оценки на диске: один JSON на ключ, раскладка <ab>/<key>.json.
+    # Записи неизменяемы, запись атомарная — каталог можно делить между воркерами и запусками
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def fingerprint(self, data):
+        return cached_fingerprint(data)
+
+    def key(self, data, signal_params, params, end=None, dtype=None):
+        # end — исключающая граница отрезка (этап прогрессивной оценки), None — весь набор;
+        # dtype — точность кэша индикаторов, которым считается оценка
+        first, last = (data.index[0], data.index[-1]) if len(data) else (None, None)
+        return result_key(self.fingerprint(data), first, last, signal_params, params, stage_end=end, dtype=dtype)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return record
+
+    def put(self, key, record):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f)
+        os.replace(tmp_path, path)
+
+    def get_score(self, key):
+        record = self.get(key)
+        return None if record is None else float(record['score'])
+
+    def get_stats(self, key):
+        # Сохранённые метрики RECORD_KEYS (None — записи нет или она без метрик)
+        record = self.get(key)
+        if record is None or 'stats' not in record:
+            return None
+        return {name: float(record['stats'][name]) for name in RECORD_KEYS}
+
+    def put_score(self, key, score, stats=None, **extra):
+        # stats — результат бэктеста (Series/dict): вместе со score сохраняются метрики RECORD_KEYS
+        if stats is not None:
+            extra['stats'] = {name: float(stats[name]) for name in RECORD_KEYS}
+        self.put(key, dict(extra, score=float(score), engine=ENGINE_VERSION))
+
+    def __repr__(self):
+        return f"<ResultCache: {self.cache_dir}, hits={self.hits} misses={self.misses}>"
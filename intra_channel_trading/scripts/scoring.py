@@ -0,0 +1,22 @@
+# Целевые функции проекта в одном месте. Модуль без тяжёлых зависимостей: его импортируют и оптимизатор,
+# и лёгкие точки входа (main.py, cli backtest), которым optuna не нужна
+CASH = 100_000
+TRADE_PENALTY = 7          # штраф критерия за сделку полным лотом, $
+
+
+def composite_score(stats):
+    return (
+        stats['Return [%]'] * 0.4 +
+        stats['Sharpe Ratio'] * 0.2 +
+        stats['Win Rate [%]'] * 0.2 +
+        stats['Profit Factor'] * 0.2 +
+        stats['Expectancy [%]'] * 0.1 -
+        stats['Max. Drawdown [%]'] * 0.5
+    )
+
+
+def criteria(stats, n_trades=None):
+    # Итоговый критерий: Equity Final - 100 000 - # Trades * 7. n_trades — число сделок в полных лотах,
+    # если оно не совпадает с # Trades (портфель, где участник торгует долей лота)
+    n_trades = stats['# Trades'] if n_trades is None else n_trades
+    return stats['Equity Final [$]'] - CASH - n_trades * TRADE_PENALTY
@@ -0,0 +1,123 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from intra_channel_trading.scripts.batch_scorer import BatchScorer, PARAM_KEYS, INT_KEYS, COMBO_KEYS
+
+
+# Шаг сетки окрестности по каждому параметру; целые параметры — по 1
+DEFAULT_STEPS = {'donchian_window': 1, 'rsi_period': 1, 'rsi_exit': 1, 'cooldown_bars': 1, 'atr_period': 1,
+                 'atr_threshold': 0.0001}
+# Доля лучшего score, которую сосед должен сохранить, чтобы считаться частью плато
+PLATEAU_LEVEL = 0.9
+
+
+def neighbourhood(best, radius=1, keys=PARAM_KEYS, steps=None, bounds=None):
+    # Все сочетания смещений -radius..radius шагов по keys вокруг best (остальные параметры — как в best).
+    # Значения за границами bounds (пространство поиска) отбрасываются, а не прижимаются — без дублей.
+    # Колонки: COMBO_KEYS, d_<параметр> (смещение в шагах) и Distance (максимум |смещения|).
+    # atr_enabled — как у best (по умолчанию True, как в suggest_signal_params), а не из торговых params
+    steps = dict(DEFAULT_STEPS, **(steps or {}))
+    offsets = np.array(list(itertools.product(range(-radius, radius + 1), repeat=len(keys))), dtype=np.int64)
+    table = pd.DataFrame({key: best.get(key) for key in PARAM_KEYS}, index=range(len(offsets)))
+    table['atr_enabled'] = bool(best.get('atr_enabled', True))
+    keep = np.ones(len(offsets), dtype=bool)
+    for j, key in enumerate(keys):
+        values = best[key] + offsets[:, j] * steps[key]
+        values = values.astype(np.int64) if key in INT_KEYS else np.round(values, 10)
+        if bounds and key in bounds:
+            low, high = bounds[key]
+            keep &= (values >= low) & (values <= high)
+        table[key] = values
+        table[f'd_{key}'] = offsets[:, j]
+    table['Distance'] = np.abs(offsets).max(axis=1)
+    return table[keep].reset_index(drop=True)
+
+
+def evaluate(data, params, best, radius=1, keys=PARAM_KEYS, steps=None, bounds=None, cache=None, n_workers=1,
+             scorer=None):
+    # Окрестность лучшего триала одним пакетом: общие матрицы индикаторов и ядро BatchScorer в n_workers потоках
+    table = neighbourhood(best, radius, keys, steps, bounds)
+    scorer = scorer or BatchScorer(data, params, cache=cache, n_workers=n_workers)
+    return table.join(scorer.score(table[list(COMBO_KEYS)]))
+
+
+def _retention(scores, best):
+    # Какая доля лучшего score сохраняется (для отрицательного best — NaN: доля не имеет смысла)
+    return scores / best if best > 0 else np.nan
+
+
+def plateau(table, level=PLATEAU_LEVEL):
+    # Плато по кольцам Distance: распределение score соседей на расстоянии d шагов от лучшего и доля соседей,
+    # сохраняющих не меньше level от лучшего score. Plateau Score — медиана по первому кольцу / лучший score
+    best = table.loc[table['Distance'] == 0, 'Score'].iloc[0]
+    rows = []
+    for distance, ring in table.groupby('Distance'):
+        scores = ring['Score']
+        rows.append({
+            'Distance': distance,
+            'Neighbours': len(ring),
+            'Mean': scores.mean(),
+            'Median': scores.median(),
+            'P10': scores.quantile(0.1),
+            'Min': scores.min(),
+            'Std': scores.std(),
+            'Retention': _retention(scores.median(), best),
+            f'Share >= {level:.0%}': (scores >= best * level).mean() * 100 if best > 0 else np.nan,
+            'NaN': scores.isna().sum(),
+        })
+    result = pd.DataFrame(rows)
+    first_ring = result.loc[result['Distance'] == 1, 'Retention']
+    result.attrs['best'] = best
+    result.attrs['plateau_score'] = float(first_ring.iloc[0]) if len(first_ring) else np.nan
+    return result
+
+
+def by_parameter(table, keys=PARAM_KEYS):
+    # Срез по каждому параметру: Line — score при смещении только этого параметра (остальные — лучшие),
+    # Mean/Min/Max — по всей окрестности с таким смещением параметра
+    rows = []
+    for key in keys:
+        others = [f'd_{other}' for other in keys if other != key]
+        line = table[(table[others] == 0).all(axis=1)].set_index(f'd_{key}')['Score']
+        for offset, group in table.groupby(f'd_{key}'):
+            rows.append({'Parameter': key, 'Offset': offset, 'Value': group[key].iloc[0],
+                         'Line': line.get(offset, np.nan), 'Mean': group['Score'].mean(),
+                         'Min': group['Score'].min(), 'Max': group['Score'].max()})
+    return pd.DataFrame(rows)
+
+
+def heatmaps(table, keys=PARAM_KEYS):
+    # Тепловые карты по парам параметров в длинном формате: для каждой клетки (x, y) — score при лучших
+    # остальных параметрах (Slice) и средний/минимальный score по всем остальным смещениям
+    frames = []
+    for x, y in itertools.combinations(keys, 2):
+        others = [f'd_{other}' for other in keys if other not in (x, y)]
+        at_best = (table[others] == 0).all(axis=1) if others else pd.Series(True, index=table.index)
+        grid = table.groupby([x, y])['Score'].agg(Mean='mean', Min='min')
+        grid['Slice'] = table[at_best].set_index([x, y])['Score']
+        grid = grid.reset_index().rename(columns={x: 'X', y: 'Y'})
+        grid.insert(0, 'Param Y', y)
+        grid.insert(0, 'Param X', x)
+        frames.append(grid)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def write_heatmap_html(path, maps, value='Slice', title="Score в окрестности лучшего триала"):
+    # Сетка тепловых карт (по паре параметров на панель); plotly.js — с CDN, как у LTTB-графика
+    from plotly.subplots import make_subplots
+
+    pairs = list(maps.groupby(['Param X', 'Param Y'], sort=False))
+    n_cols = min(5, len(pairs))
+    n_rows = -(-len(pairs) // n_cols)
+    fig = make_subplots(rows=n_rows, cols=n_cols, subplot_titles=[f"{x} × {y}" for (x, y), _ in pairs])
+    low, high = maps[value].min(), maps[value].max()
+    for k, (_, grid) in enumerate(pairs):
+        pivot = grid.pivot(index='Y', columns='X', values=value)
+        fig.add_heatmap(x=pivot.columns, y=pivot.index, z=pivot.to_numpy(), zmin=low, zmax=high,
+                        coloraxis='coloraxis', row=k // n_cols + 1, col=k % n_cols + 1)
+    fig.update_layout(title=f"{title} ({value})", coloraxis={'colorscale': 'Viridis'},
+                      height=300 * n_rows)
+    fig.write_html(path, include_plotlyjs='cdn')
+    return path
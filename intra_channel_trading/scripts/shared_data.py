@@ -0,0 +1,25 @@
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+
+def publish_market_data(data, directory):
+    # Публикует OHLC один раз в memory-mapped файлы, чтобы процессы-воркеры не перечитывали CSV
+    os.makedirs(directory, exist_ok=True)
+    columns = [column for column in data.columns if pd.api.types.is_numeric_dtype(data[column])]
+    np.save(os.path.join(directory, 'index.npy'), data.index.to_numpy())
+    np.save(os.path.join(directory, 'values.npy'), data[columns].to_numpy(dtype=np.float64))
+    with open(os.path.join(directory, 'meta.json'), 'w') as f:
+        json.dump({'columns': columns, 'index_name': data.index.name}, f)
+    return directory
+
+
+def attach_market_data(directory):
+    # Открывает опубликованные данные без копирования: значения читаются прямо из page cache
+    with open(os.path.join(directory, 'meta.json')) as f:
+        meta = json.load(f)
+    index = pd.DatetimeIndex(np.load(os.path.join(directory, 'index.npy'), mmap_mode='r'), name=meta['index_name'])
+    values = np.load(os.path.join(directory, 'values.npy'), mmap_mode='r')
+    return pd.DataFrame(values, index=index, columns=meta['columns'], copy=False)
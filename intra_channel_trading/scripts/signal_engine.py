@@ -0,0 +1,118 @@
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:  # numba — опциональная зависимость, без неё работает чистый NumPy-вариант
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+
+ENGINES = ('auto', 'numba', 'numpy', 'pandas')
+
+
+def _exit_only_kernel(close, rsi, upper, lower, atr,
+                      atr_enabled, atr_threshold, rsi_exit, cooldown_bars, signal, entry):
+    # Та же машина состояний, что и в donchian_rsi_exit_only, но на голых массивах.
+    # signal/entry — выходные буферы длины n (могут переиспользоваться между вызовами)
+    n = close.shape[0]
+    if n == 0:
+        return signal, entry
+    signal[0] = 1
+    entry[:] = 0
+    short = False
+    last_entry = -cooldown_bars
+    for i in range(1, n):
+        if atr_enabled and atr[i] < atr_threshold:
+            signal[i] = 0
+            continue
+
+        if (not short) and (i - last_entry >= cooldown_bars) and close[i] > upper[i - 1]:
+            signal[i] = -1
+            entry[i] = -1
+            short = True
+            last_entry = i
+        elif short and (close[i] < lower[i - 1] or rsi[i] < rsi_exit):
+            short = False
+            signal[i] = 1
+        else:
+            signal[i] = signal[i - 1]
+    return signal, entry
+
+
+_exit_only_kernel_nb = njit(cache=True, nogil=True)(_exit_only_kernel)
+
+
+def _exit_only_resume_kernel(close, rsi, upper, lower, atr,
+                             atr_enabled, atr_threshold, rsi_exit, cooldown_bars, short, last_entry, signal, entry):
+    # Продолжение машины состояний на следующем куске баров. Бар 0 — последний бар предыдущего куска
+    # (signal[0] уже заполнен вызывающим), short/last_entry — состояние на нём, last_entry — относительно бара 0.
+    # Для первого куска: signal[0] = 1, short = False, last_entry = -cooldown_bars — ровно _exit_only_kernel
+    n = close.shape[0]
+    entry[:] = 0
+    for i in range(1, n):
+        if atr_enabled and atr[i] < atr_threshold:
+            signal[i] = 0
+            continue
+
+        if (not short) and (i - last_entry >= cooldown_bars) and close[i] > upper[i - 1]:
+            signal[i] = -1
+            entry[i] = -1
+            short = True
+            last_entry = i
+        elif short and (close[i] < lower[i - 1] or rsi[i] < rsi_exit):
+            short = False
+            signal[i] = 1
+        else:
+            signal[i] = signal[i - 1]
+    return short, last_entry
+
+
+_exit_only_resume_kernel_nb = njit(cache=True, nogil=True)(_exit_only_resume_kernel)
+
+
+def resolve_engine(engine='auto'):
+    if engine not in ENGINES:
+        raise ValueError(f"Неизвестный движок сигналов: {engine!r}, допустимые: {ENGINES}")
+    if engine == 'auto':
+        return 'numba' if NUMBA_AVAILABLE else 'numpy'
+    if engine == 'numba' and not NUMBA_AVAILABLE:
+        raise ImportError("Для engine='numba' требуется установленный пакет numba")
+    return engine
+
+
+def _as_float_array(values):
+    # float64 и float32 передаются в ядро как есть (без копии), остальное приводится к float64
+    values = np.asarray(values)
+    if values.dtype not in (np.float64, np.float32):
+        values = values.astype(np.float64)
+    return np.ascontiguousarray(values)
+
+
+def exit_only_signals(close, rsi, upper, lower, atr=None, atr_enabled=False, atr_threshold=0.0,
+                      rsi_exit=0.0, cooldown_bars=0, engine='auto', out=None):
+    # out — пара предвыделенных int64-буферов (signal, entry) длиной не меньше len(close);
+    # возвращаются их срезы, так что цикл оптимизатора не аллоцирует выходы на каждом триале
+    engine = resolve_engine(engine)
+    if engine == 'pandas':
+        raise ValueError("exit_only_signals работает только с движками 'numba' и 'numpy'")
+
+    close = _as_float_array(close)
+    rsi = _as_float_array(rsi)
+    upper = _as_float_array(upper)
+    lower = _as_float_array(lower)
+    atr = close if atr is None else _as_float_array(atr)  # при atr_enabled=False ядро ATR не читает
+
+    n = close.shape[0]
+    if out is None:
+        signal, entry = np.empty(n, dtype=np.int64), np.empty(n, dtype=np.int64)
+    else:
+        signal, entry = out[0][:n], out[1][:n]
+
+    kernel = _exit_only_kernel_nb if engine == 'numba' else _exit_only_kernel
+    return kernel(close, rsi, upper, lower, atr,
+                  bool(atr_enabled), float(atr_threshold), float(rsi_exit), int(cooldown_bars), signal, entry)
@@ -1,8 +1,60 @@
 from tqdm import trange
 from .indicators import calculate_donchian, calculate_rsi, calculate_atr
+from .signal_engine import exit_only_signals, resolve_engine
+from .telemetry import profiled
 
 
-def donchian_rsi_exit_only(data, params):
+def _with_indicators(data, params, cache=None):
+    atr_enabled = bool(params.get('atr_enabled'))
+    if cache is None:
+        dataset = data.copy()
+        # Применение RSI
+        dataset = calculate_rsi(dataset, params.get('rsi_period'))
+        # Применение Дончиан-каналов
+        dataset = calculate_donchian(dataset, params.get('donchian_window'))
+        if atr_enabled:
+            dataset = calculate_atr(dataset, params.get('atr_period'))
+        return dataset
+
+    # Индикаторы берутся из кэша, рассчитанного один раз на набор данных
+    fingerprint = cache.fingerprint(data)
+    columns = cache.columns(data, 'rsi', params.get('rsi_period'), fingerprint)
+    columns.update(cache.columns(data, 'donchian', params.get('donchian_window'), fingerprint))
+    if atr_enabled:
+        columns.update(cache.columns(data, 'atr', params.get('atr_period'), fingerprint))
+    return data.assign(**columns)
+
+
+@profiled()
+def donchian_rsi_exit_only(data, params, engine='auto', cache=None):
+    # engine: 'auto' | 'numba' | 'numpy' — ядро на массивах, 'pandas' — исходный поштучный цикл (для сверки)
+    # cache: IndicatorCache — общий для триалов оптимизатора кэш индикаторов
+    if resolve_engine(engine) == 'pandas':
+        return donchian_rsi_exit_only_pandas(data, params)
+
+    atr_enabled = bool(params.get('atr_enabled'))
+    dataset = _with_indicators(data, params, cache)
+    dataset.dropna(inplace=True)
+
+    signal, entry = exit_only_signals(
+        dataset['Close'].to_numpy(),
+        dataset['RSI'].to_numpy(),
+        dataset['Upper'].to_numpy(),
+        dataset['Lower'].to_numpy(),
+        dataset['ATR'].to_numpy() if atr_enabled else None,
+        atr_enabled=atr_enabled,
+        atr_threshold=params.get('atr_threshold') or 0.0,
+        rsi_exit=params.get('rsi_exit'),
+        cooldown_bars=params.get('cooldown_bars'),
+        engine=engine,
+    )
+    dataset['Signal'] = signal
+    if atr_enabled:
+        dataset['Entry'] = entry
+    return dataset
+
+
+def donchian_rsi_exit_only_pandas(data, params):
     dataset = data.copy()
 
     # Применение RSI
@@ -54,4 +106,3 @@ def donchian_rsi_exit_only(data, params):
                 dataset.iat[i, dataset.columns.get_loc('Signal')] = dataset['Signal'].iat[i - 1]
 
     return dataset
-
@@ -0,0 +1,185 @@
+import math
+from collections import deque
+
+import pandas as pd
+
+
+class _RollingMean:
+    # Скользящее среднее с тем же алгоритмом, что и pandas rolling().mean()
+    # (сумма Кэхэна с добавлением/удалением), поэтому значения совпадают бит в бит
+    def __init__(self, period):
+        self.period = period
+        self.window = deque()
+        self.nobs = 0
+        self.neg_ct = 0
+        self.n_same = 0
+        self.sum_x = 0.0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.prev = None
+
+    def update(self, val):
+        if self.prev is None:
+            self.prev = val
+        self.window.append(val)
+        if len(self.window) > self.period:
+            old = self.window.popleft()
+            if old == old:
+                self.nobs -= 1
+                y = -old - self.comp_remove
+                t = self.sum_x + y
+                self.comp_remove = t - self.sum_x - y
+                self.sum_x = t
+                if math.copysign(1.0, old) < 0:
+                    self.neg_ct -= 1
+        if val == val:
+            self.nobs += 1
+            y = val - self.comp_add
+            t = self.sum_x + y
+            self.comp_add = t - self.sum_x - y
+            self.sum_x = t
+            if math.copysign(1.0, val) < 0:
+                self.neg_ct += 1
+            if val == self.prev:
+                self.n_same += 1
+            else:
+                self.n_same = 1
+            self.prev = val
+
+        if self.nobs >= self.period and self.nobs > 0:
+            result = self.sum_x / self.nobs
+            if self.n_same >= self.nobs:
+                result = self.prev
+            elif self.neg_ct == 0 and result < 0:
+                result = 0.0
+            elif self.neg_ct == self.nobs and result > 0:
+                result = 0.0
+            return result
+        return math.nan
+
+
+class _RollingExtreme:
+    # Скользящий max (или min) на монотонной очереди: амортизированно O(1) на бар
+    def __init__(self, period, is_max=True):
+        self.period = period
+        self.is_max = is_max
+        self.queue = deque()
+        self.nan_bars = deque()
+        self.count = 0
+
+    def update(self, val):
+        i = self.count
+        self.count += 1
+        while self.nan_bars and self.nan_bars[0] <= i - self.period:
+            self.nan_bars.popleft()
+        if val != val:
+            self.nan_bars.append(i)
+        else:
+            while self.queue and (self.queue[-1][1] <= val if self.is_max else self.queue[-1][1] >= val):
+                self.queue.pop()
+            self.queue.append((i, val))
+        while self.queue and self.queue[0][0] <= i - self.period:
+            self.queue.popleft()
+        if self.count < self.period or self.nan_bars:
+            return math.nan
+        return self.queue[0][1]
+
+
+def _divide(a, b):
+    # Деление с семантикой NumPy/pandas: x/0 -> ±inf, 0/0 -> nan
+    if b == 0:
+        if a == 0 or a != a:
+            return math.nan
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+class DonchianRsiStream:
+    # Инкрементальная версия donchian_rsi_exit_only: O(1) на новый бар.
+    # update() возвращает Signal для бара или None, если бар отброшен (прогрев индикаторов / NaN),
+    # как это делает dropna() в пакетной версии
+    def __init__(self, params):
+        self.params = params
+        self.atr_enabled = bool(params.get('atr_enabled'))
+        self.atr_threshold = params.get('atr_threshold') or 0.0
+        self.rsi_exit = params.get('rsi_exit')
+        self.cooldown_bars = params.get('cooldown_bars')
+
+        self._gain = _RollingMean(params.get('rsi_period'))
+        self._loss = _RollingMean(params.get('rsi_period'))
+        self._upper = _RollingExtreme(params.get('donchian_window'), is_max=True)
+        self._lower = _RollingExtreme(params.get('donchian_window'), is_max=False)
+        self._atr = _RollingMean(params.get('atr_period')) if self.atr_enabled else None
+        self._prev_close = math.nan
+
+        # Значения индикаторов, рассчитанные по предыдущий бар включительно (аналог .shift(1))
+        self.rsi = math.nan
+        self.upper = math.nan
+        self.lower = math.nan
+        self.atr = math.nan
+        self._next_rsi = self._next_upper = self._next_lower = self._next_atr = math.nan
+
+        # Состояние машины сигналов
+        self.bars = 0
+        self.kept = 0
+        self.short = False
+        self.last_entry = -self.cooldown_bars
+        self.signal = None
+        self.entry = 0
+        self._prev_upper = math.nan
+        self._prev_lower = math.nan
+
+    def _update_indicators(self, high, low, close):
+        delta = close - self._prev_close
+        gain = delta if delta > 0 else 0.0
+        loss = -(delta if delta < 0 else 0.0)
+        self._next_rsi = 100 - _divide(100, 1 + _divide(self._gain.update(gain), self._loss.update(loss)))
+        self._next_upper = self._upper.update(high)
+        self._next_lower = self._lower.update(low)
+        if self._atr is not None:
+            candidates = [v for v in (high - low, abs(high - self._prev_close), abs(low - self._prev_close))
+                          if v == v]
+            self._next_atr = self._atr.update(max(candidates) if candidates else math.nan)
+        self._prev_close = close
+
+    def update(self, high, low, close, open_=None):
+        self.bars += 1
+        self.rsi, self.upper, self.lower, self.atr = (self._next_rsi, self._next_upper,
+                                                      self._next_lower, self._next_atr)
+        self._update_indicators(high, low, close)
+
+        values = (self.rsi, self.upper, self.lower, close, high, low) + ((self.atr,) if self.atr_enabled else ())
+        if open_ is not None:
+            values += (open_,)
+        if any(v != v for v in values):
+            return None
+
+        i = self.kept
+        self.kept += 1
+        self.entry = 0
+        if i == 0:
+            self.signal = 1
+        elif self.atr_enabled and self.atr < self.atr_threshold:
+            self.signal = 0
+        elif (not self.short) and (i - self.last_entry >= self.cooldown_bars) and close > self._prev_upper:
+            self.signal = -1
+            self.entry = -1
+            self.short = True
+            self.last_entry = i
+        elif self.short and (close < self._prev_lower or self.rsi < self.rsi_exit):
+            self.short = False
+            self.signal = 1
+        self._prev_upper, self._prev_lower = self.upper, self.lower
+        return self.signal
+
+    def replay(self, data):
+        # Прогон исторических баров; возвращает Signal с индексом оставшихся (не отброшенных) баров
+        index, signals = [], []
+        rows = zip(data.index, data['Open'].to_numpy(), data['High'].to_numpy(),
+                   data['Low'].to_numpy(), data['Close'].to_numpy())
+        for ts, open_, high, low, close in rows:
+            signal = self.update(float(high), float(low), float(close), float(open_))
+            if signal is not None:
+                index.append(ts)
+                signals.append(signal)
+        return pd.Series(signals, index=pd.DatetimeIndex(index, name=data.index.name), name='Signal', dtype='int64')
@@ -0,0 +1,182 @@
+import os
+import sys
+import json
+import time
+import functools
+import contextlib
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+TELEMETRY_FILE = 'telemetry.jsonl'
+SUMMARY_FILE = 'telemetry_summary.csv'
+
+# Активный сборщик; None — профилирование выключено, хуки сводятся к одной проверке
+_active = None
+_NULL_STAGE = contextlib.nullcontext()
+
+
+def _current_rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _reset_peak_rss():
+    # Linux: запись "5" в clear_refs сбрасывает VmHWM, после чего пик считается от начала этапа
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 2 ** 10
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    # ru_maxrss — пик за всё время процесса: КБ на Linux, байты на macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+class Telemetry:
+    # Время (wall/CPU) и память (RSS, пиковый RSS) по этапам конвейера.
+    # Записи копятся в памяти и, если задан path, сразу дописываются в JSONL (воркеры пишут в тот же файл)
+    def __init__(self, path=None):
+        self.path = path
+        self.records = []
+        self._stack = []
+        self._file = open(path, 'a', encoding='utf-8', buffering=1) if path else None
+
+    @contextlib.contextmanager
+    def stage(self, name, **tags):
+        parent = self._stack[-1]['stage'] if self._stack else None
+        frame = {'stage': name, 'child_peak': 0.0}
+        self._stack.append(frame)
+        resettable = _reset_peak_rss()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            self._stack.pop()
+            # Вложенный этап сбрасывает VmHWM, поэтому пик родителя — максимум из своего и пиков детей
+            peak = max(_peak_rss_mb() or 0.0, frame['child_peak']) or None
+            if self._stack and peak:
+                self._stack[-1]['child_peak'] = max(self._stack[-1]['child_peak'], peak)
+            record = {
+                'ts': time.time(),
+                'pid': os.getpid(),
+                'stage': name,
+                'parent': parent,
+                'depth': len(self._stack),
+                'wall_s': wall,
+                'cpu_s': cpu,
+                'rss_mb': _current_rss_mb(),
+                'peak_rss_mb': peak,
+                'peak_is_stage_local': resettable,
+            }
+            record.update(tags)
+            self.records.append(record)
+            if self._file is not None:
+                self._file.write(json.dumps(record, default=str) + '\n')
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for record in self.records:
+                f.write(json.dumps(record, default=str) + '\n')
+        return path
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def enable_telemetry(path=None):
+    global _active
+    disable_telemetry()
+    _active = Telemetry(path)
+    return _active
+
+
+def disable_telemetry():
+    global _active
+    telemetry, _active = _active, None
+    if telemetry is not None:
+        telemetry.close()
+    return telemetry
+
+
+def active_telemetry():
+    return _active
+
+
+def stage(name, **tags):
+    # with stage('write_artifacts'): ... — при выключенной телеметрии возвращает пустой контекст
+    if _active is None:
+        return _NULL_STAGE
+    return _active.stage(name, **tags)
+
+
+def profiled(name=None):
+    # Декоратор этапа: @profiled() или @profiled('load_data')
+    def decorator(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _active is None:
+                return func(*args, **kwargs)
+            with _active.stage(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def read_records(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(records):
+    # Сводка по этапам: число вызовов, суммарное/среднее/максимальное время, CPU и пиковый RSS
+    if not records:
+        return pd.DataFrame()
+    frame = pd.DataFrame(records)
+    summary = frame.groupby('stage').agg(
+        calls=('wall_s', 'size'),
+        wall_total_s=('wall_s', 'sum'),
+        wall_mean_s=('wall_s', 'mean'),
+        wall_max_s=('wall_s', 'max'),
+        cpu_total_s=('cpu_s', 'sum'),
+        peak_rss_mb=('peak_rss_mb', 'max'),
+    )
+    return summary.sort_values('wall_total_s', ascending=False)
+
+
+def write_report(telemetry, destination, verbose=True):
+    # JSONL рядом с артефактами прогона + сводная таблица (CSV и печать)
+    path = telemetry.path or telemetry.save(os.path.join(destination, TELEMETRY_FILE))
+    telemetry.close()
+    summary = summarize(read_records(path))
+    summary.to_csv(os.path.join(destination, SUMMARY_FILE))
+    if verbose:
+        print(f"\nTelemetry ({path}):")
+        print(summary.to_string(float_format=lambda v: f"{v:.4f}"))
+    return summary
@@ -0,0 +1,136 @@
+import os
+import shutil
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from intra_channel_trading.auxiliary.fast_backtest import fast_backtest
+from intra_channel_trading.scripts.config_loader import load_config, build_params, parse_marketdata_name
+from intra_channel_trading.scripts.data_loader import load_data
+from intra_channel_trading.scripts.optimizer import optuna_optimize_strategy
+from intra_channel_trading.scripts.scoring import composite_score, criteria
+from intra_channel_trading.scripts.shared_data import publish_market_data, attach_market_data
+from intra_channel_trading.scripts.strategy import donchian_rsi_exit_only
+
+
+def make_folds(index, train_period, test_period, anchored=False):
+    # Скользящие (anchored=False) или расширяющиеся (anchored=True) окна train/test, полуинтервалы [start, end).
+    # Шаг между фолдами равен test_period, так что тестовые окна стыкуются без пропусков и наложений.
+    # Окна без баров (выходные при test_period='1D', пропуски в данных) пропускаются
+    train_period, test_period = pd.Timedelta(train_period), pd.Timedelta(test_period)
+    first, last = index[0], index[-1] + pd.Timedelta(microseconds=1)
+    folds = []
+    test_start = first + train_period
+    while test_start < last:
+        test_end = min(test_start + test_period, last)
+        train_start = first if anchored else test_start - train_period
+        if index.searchsorted(test_start) < index.searchsorted(test_end):
+            folds.append({'fold': len(folds), 'train_start': train_start, 'train_end': test_start,
+                          'test_start': test_start, 'test_end': test_end})
+        test_start = test_start + test_period
+    return folds
+
+
+def _run_fold(fold, shared_dir, params, n_trials, seed, destination_path):
+    data = attach_market_data(shared_dir)
+    train = data[(data.index >= fold['train_start']) & (data.index < fold['train_end'])]
+
+    study = optuna_optimize_strategy(train, params, destination_path, n_trials=n_trials, seed=seed)
+    best = dict(study.best_params, atr_enabled=True)
+
+    # Сигналы считаются с начала train, чтобы индикаторы и состояние шорта прогрелись к началу test
+    history = data[(data.index >= fold['train_start']) & (data.index < fold['test_end'])]
+    signals = donchian_rsi_exit_only(history, best)
+    signals = signals[signals.index >= fold['test_start']]
+    stats = fast_backtest(signals, params=params)
+
+    row = dict(fold)
+    row.update(best)
+    row.update({
+        'is_score': study.best_value,
+        'oos_score': composite_score(stats),
+        'oos_return_pct': stats['Return [%]'],
+        'oos_max_drawdown_pct': stats['Max. Drawdown [%]'],
+        'oos_trades': stats['# Trades'],
+        'oos_criteria': criteria(stats),
+    })
+    return row, stats['_equity_curve']['Equity']
+
+
+def stitch_equity(curves, cash=100_000):
+    # Склейка OOS-кривых: PnL каждого фолда добавляется к итогу предыдущих
+    stitched, offset = [], 0.0
+    for curve in curves:
+        if curve.empty:
+            continue
+        stitched.append(curve + offset)
+        offset += curve.iloc[-1] - cash
+    return pd.concat(stitched).rename('Equity') if stitched else pd.Series(dtype=float, name='Equity')
+
+
+def walk_forward(data, params, destination_path, train_period='365D', test_period='90D', anchored=False,
+                 n_trials=20, n_workers=1, seed=42):
+    folds = make_folds(data.index, train_period, test_period, anchored=anchored)
+    shared_dir = publish_market_data(data, os.path.join(destination_path, 'shared_data'))
+    try:
+        with ProcessPoolExecutor(max_workers=max(1, n_workers)) as pool:
+            futures = [pool.submit(_run_fold, fold, shared_dir, params, n_trials, seed, destination_path)
+                       for fold in folds]
+            results = []
+            # Ошибка одного фолда (нет завершённых триалов, пустой train) не отменяет уже посчитанные:
+            # фолд попадает в таблицу со строкой ошибки в колонке error и без OOS-кривой
+            for fold, future in zip(folds, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    print(f"Fold {fold['fold']} failed: {e!r}")
+                    results.append((dict(fold, error=repr(e)), pd.Series(dtype=float, name='Equity')))
+    finally:
+        shutil.rmtree(shared_dir, ignore_errors=True)
+
+    fold_table = pd.DataFrame([row for row, _ in results])
+    equity = stitch_equity([curve for _, curve in results])
+    return fold_table, equity
+
+
+def main():
+    source_config_path = "../configs/config_donchian_rsi.yaml"
+    config = load_config(source_config_path)
+    data_cfg = config.get('data', {})
+    wf_cfg = config.get('walk_forward', {})
+    params = build_params(config)
+
+    ticker, timeframe, broker = parse_marketdata_name(data_cfg['marketdata'])
+    now = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+    destination_path = f"../outputs/walk_forward/wf_{ticker}_{timeframe}_{broker}_{now}"
+    os.makedirs(destination_path, exist_ok=True)
+
+    store_path = data_cfg.get('store_path')
+    data = load_data(f"../{data_cfg['dataset_path']}/{data_cfg['marketdata']}",
+                     start_date=data_cfg["start_date"],
+                     end_date=data_cfg["end_date"],
+                     store_root=f'../{store_path}' if store_path else None)
+
+    n_workers = wf_cfg.get('n_workers', 1)
+    if n_workers in (0, -1, None):
+        n_workers = os.cpu_count()
+    fold_table, equity = walk_forward(
+        data, params, destination_path,
+        train_period=wf_cfg.get('train_period', '365D'),
+        test_period=wf_cfg.get('test_period', '90D'),
+        anchored=wf_cfg.get('anchored', False),
+        n_trials=wf_cfg.get('n_trials', 20),
+        n_workers=n_workers,
+        seed=config.get('optimization', {}).get('seed', 42),
+    )
+
+    fold_table.to_csv(f"{destination_path}/walk_forward_folds.csv", index=False)
+    equity.to_csv(f"{destination_path}/walk_forward_oos_equity.csv")
+    shutil.copy2(source_config_path, f"{destination_path}/{os.path.basename(source_config_path)}")
+    print(fold_table.to_string(index=False))
+    print(f"\nOOS PnL: {equity.iloc[-1] - 100_000:.2f}" if len(equity) else "\nНет OOS-фолдов")
+
+
+if __name__ == "__main__":
+    main()
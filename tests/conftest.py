@@ -0,0 +1,15 @@
+import os
+
+import pytest
+
+from intra_channel_trading.scripts.data_loader import load_data
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Поставляемый архив EURUSD 20M; для сверок хватает среза 2024-01-01 — 2025-05-01 (~24 тыс. баров)
+ZIP_PATH = os.path.join(ROOT, 'marketdata', 'ziparchive', 'EURUSD_20M_2010-01-04_2025-05-01_MetaQuotes-Demo.csv.zip')
+
+
+@pytest.fixture(scope='session')
+def eurusd():
+    return load_data(ZIP_PATH, '2024-01-01', '2025-05-01')
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from intra_channel_trading.auxiliary.fast_backtest import fast_backtest
+from intra_channel_trading.scripts.batch_scorer import BatchScorer, INT_KEYS, METRIC_KEYS, PARAM_KEYS
+from intra_channel_trading.scripts.optimizer import SEARCH_SPACE, score_signal_params
+from intra_channel_trading.scripts.strategy import donchian_rsi_exit_only
+
+
+TRADING_HOURS = {'allowed': [[0, 11], [16, 24]], 'allowed_days': [0, 1, 4]}
+N_SETS = 12
+# Суммы по сделкам и дням в ядре последовательные, а не попарные, как в NumPy: Sharpe Ratio расходится до ~1e-11
+METRIC_RTOL = 1e-10
+SCORE_RTOL = 1e-12
+
+
+def random_sets(seed, atr_enabled):
+    rng = np.random.default_rng(seed)
+    sets = {key: (rng.integers(low, high + 1, N_SETS) if key in INT_KEYS else rng.uniform(low, high, N_SETS))
+            for key, (low, high) in ((key, SEARCH_SPACE[key]) for key in PARAM_KEYS)}
+    return pd.DataFrame(sets).assign(atr_enabled=atr_enabled)
+
+
+@pytest.mark.parametrize('eod_exit', [False, True])
+@pytest.mark.parametrize('atr_enabled', [True, False])
+def test_batch_scorer_matches_score_signal_params(eurusd, atr_enabled, eod_exit):
+    # Ядро BatchScorer повторяет машину сигналов, позицию, PnL, сделки и _compute_stats —
+    # этот тест ловит расхождение при следующей правке точного пути
+    params = {'eod_exit': eod_exit, 'trading_hours': TRADING_HOURS}
+    combos = random_sets(2 * atr_enabled + eod_exit, atr_enabled)
+    table = BatchScorer(eurusd, params).score(combos)
+
+    for row, signal_params in zip(table.to_dict('records'), combos.to_dict('records')):
+        signal_params = {key: (int(value) if key in INT_KEYS else float(value)) if key in PARAM_KEYS else value
+                         for key, value in signal_params.items()}
+        stats = fast_backtest(donchian_rsi_exit_only(eurusd, signal_params), params=params)
+        for key in METRIC_KEYS:
+            assert row[key] == pytest.approx(stats[key], rel=METRIC_RTOL, abs=1e-12, nan_ok=True), (key, signal_params)
+        expected = score_signal_params(eurusd, signal_params, params)
+        assert row['Score'] == pytest.approx(expected, rel=SCORE_RTOL, abs=1e-12, nan_ok=True), signal_params
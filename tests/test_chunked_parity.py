@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+from intra_channel_trading.auxiliary.fast_backtest import fast_backtest
+from intra_channel_trading.scripts.chunked import run_chunked
+from intra_channel_trading.scripts.data_loader import load_data
+from intra_channel_trading.scripts.strategy import donchian_rsi_exit_only
+
+
+START, END = '2024-01-01', '2024-01-20'
+SIGNAL_PARAMS = {'donchian_window': 40, 'rsi_period': 18, 'rsi_exit': 42, 'cooldown_bars': 8, 'atr_period': 20,
+                 'atr_threshold': 0.0001}
+TRADING_HOURS = {'allowed': [[0, 11], [16, 24]], 'allowed_days': [0, 1, 4]}
+STATS = ('Equity Final [$]', 'Return [%]', 'Sharpe Ratio', 'Win Rate [%]', 'Profit Factor', 'Expectancy [%]',
+         'Max. Drawdown [%]', '# Trades')
+
+
+@pytest.fixture(scope='module')
+def source(eurusd, tmp_path_factory):
+    # ~1 000 баров CSV в формате выгрузки MetaQuotes: прогон с chunk_bars=1 проходит их за секунды
+    path = tmp_path_factory.mktemp('chunked') / 'EURUSD_20M_2024-01-01_2024-01-20_MetaQuotes-Demo.csv'
+    eurusd.loc[START:END].to_csv(path, index_label='Datetime')
+    return str(path)
+
+
+# 1 и 7 — перекрытие окон длиннее куска, 30 — короче Donchian(40), 5000 — весь срез одним куском
+@pytest.mark.parametrize('chunk_bars', [1, 7, 30, 5000])
+@pytest.mark.parametrize('atr_enabled, eod_exit', [(True, False), (False, True)])
+def test_run_chunked_matches_batch(source, chunk_bars, atr_enabled, eod_exit):
+    params = dict(SIGNAL_PARAMS, atr_enabled=atr_enabled, eod_exit=eod_exit, trading_hours=TRADING_HOURS)
+    expected_signals = donchian_rsi_exit_only(load_data(source, START, END), params)
+    expected = fast_backtest(expected_signals, params=params)
+    assert expected['# Trades'] > 0
+
+    signals, stats = run_chunked(source, params, START, END, chunk_bars=chunk_bars)
+
+    pd.testing.assert_frame_equal(signals[expected_signals.columns], expected_signals, check_exact=True)
+    for key in STATS:
+        assert stats[key] == expected[key] or (pd.isna(stats[key]) and pd.isna(expected[key])), key
+    pd.testing.assert_frame_equal(stats['_trades'], expected['_trades'], check_exact=True)
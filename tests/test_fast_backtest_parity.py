@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from intra_channel_trading.auxiliary.fast_backtest import STATS_KEYS, compare_with_backtesting, fast_backtest
+from intra_channel_trading.scripts.strategy import donchian_rsi_exit_only
+
+
+KEYS = STATS_KEYS + ('Equity Final [$]', '# Trades')
+TRADING_HOURS = {'allowed': [[0, 11], [16, 24]], 'allowed_days': [0, 1, 4]}
+
+
+@pytest.mark.parametrize('eod_exit', [False, True])
+@pytest.mark.parametrize('atr_enabled', [True, False])
+def test_fast_backtest_matches_backtesting(eurusd, atr_enabled, eod_exit):
+    signal_params = {'donchian_window': 11, 'rsi_period': 18, 'rsi_exit': 42, 'cooldown_bars': 8,
+                     'atr_enabled': atr_enabled, 'atr_period': 20, 'atr_threshold': 0.0001}
+    params = {'eod_exit': eod_exit, 'trading_hours': TRADING_HOURS}
+    table = compare_with_backtesting(donchian_rsi_exit_only(eurusd, signal_params), params, keys=KEYS)
+
+    assert table.loc['# Trades', 'fast'] > 0
+    for key in KEYS:
+        reference, fast = float(table.loc[key, 'backtesting']), float(table.loc[key, 'fast'])
+        assert np.isclose(fast, reference, rtol=1e-6, equal_nan=True), f"{key}: fast={fast}, backtesting={reference}"
+
+
+@pytest.mark.parametrize('eod_exit', [False, True])
+def test_fast_backtest_empty_input(eod_exit):
+    # Пустой срез (все бары ушли на прогрев) даёт NaN-метрики и ноль сделок, а не исключение
+    signals = pd.DataFrame({'Open': [], 'Close': [], 'Signal': []}, index=pd.DatetimeIndex([]))
+    stats = fast_backtest(signals, {'eod_exit': eod_exit, 'trading_hours': TRADING_HOURS})
+
+    assert stats['# Trades'] == 0
+    assert all(np.isnan(stats[key]) for key in STATS_KEYS + ('Equity Final [$]',))
+    assert stats['_trades'].empty and stats['_equity_curve'].empty
@@ -0,0 +1,72 @@
+import pandas as pd
+import pytest
+
+from intra_channel_trading.auxiliary.fast_backtest import fast_backtest
+from intra_channel_trading.scripts.data_loader import load_data
+from intra_channel_trading.scripts.incremental import run_incremental
+from intra_channel_trading.scripts.strategy import donchian_rsi_exit_only
+
+
+START, END = '2024-01-01', '2024-12-31'
+PARAMS = {'donchian_window': 40, 'rsi_period': 18, 'rsi_exit': 42, 'cooldown_bars': 8, 'atr_enabled': True,
+          'atr_period': 20, 'atr_threshold': 0.0001, 'eod_exit': True,
+          'trading_hours': {'allowed': [[0, 11], [16, 24]], 'allowed_days': [0, 1, 4]}}
+STATS = ('Equity Final [$]', 'Return [%]', 'Sharpe Ratio', 'Win Rate [%]', 'Profit Factor', 'Expectancy [%]',
+         'Max. Drawdown [%]', '# Trades')
+
+
+@pytest.fixture(scope='module')
+def bars(eurusd):
+    return eurusd.loc[START:'2024-02-29']
+
+
+def write(path, frame, append=False):
+    frame.to_csv(path, mode='a' if append else 'w', header=not append, index_label='Datetime')
+
+
+def assert_matches_full_run(path, signals, stats):
+    expected_signals = donchian_rsi_exit_only(load_data(str(path), START, END), PARAMS)
+    expected = fast_backtest(expected_signals, params=PARAMS)
+    pd.testing.assert_frame_equal(signals[expected_signals.columns], expected_signals, check_exact=True,
+                                  check_freq=False)
+    for key in STATS:
+        assert stats[key] == expected[key] or (pd.isna(stats[key]) and pd.isna(expected[key])), key
+    pd.testing.assert_frame_equal(stats['_trades'], expected['_trades'], check_exact=True)
+
+
+def test_appended_bars_match_full_run(bars, tmp_path):
+    path = tmp_path / 'EURUSD_20M_2024-01-01_2024-02-29_MetaQuotes-Demo.csv'
+    checkpoints = tmp_path / 'checkpoints'
+    write(path, bars.iloc[:600])
+    signals, stats, info = run_incremental(str(path), PARAMS, START, END, str(checkpoints))
+    assert not info['resumed']
+    assert_matches_full_run(path, signals, stats)
+
+    # Дописанные хвосты, в том числе из одной строки
+    done = 600
+    for size in (50, 1, 1, 300):
+        write(path, bars.iloc[done:done + size], append=True)
+        done += size
+        signals, stats, info = run_incremental(str(path), PARAMS, START, END, str(checkpoints))
+        assert info['resumed'] and info['new_bars'] == size
+        assert_matches_full_run(path, signals, stats)
+
+
+@pytest.mark.parametrize('rewrite', ['revised_last_bar', 'different_start', 'truncated'])
+def test_rewritten_source_invalidates_checkpoint(bars, tmp_path, rewrite):
+    path = tmp_path / 'EURUSD_20M_2024-01-01_2024-02-29_MetaQuotes-Demo.csv'
+    checkpoints = tmp_path / 'checkpoints'
+    write(path, bars.iloc[:800])
+    run_incremental(str(path), PARAMS, START, END, str(checkpoints))
+
+    if rewrite == 'revised_last_bar':
+        revised = bars.iloc[:900].copy()
+        revised.iloc[799, revised.columns.get_loc('Close')] += 0.001
+        write(path, revised)
+    elif rewrite == 'different_start':
+        write(path, bars.iloc[100:900])
+    else:
+        write(path, bars.iloc[:500])
+    signals, stats, info = run_incremental(str(path), PARAMS, START, END, str(checkpoints))
+    assert not info['resumed']
+    assert_matches_full_run(path, signals, stats)
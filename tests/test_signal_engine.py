@@ -0,0 +1,31 @@
+import pandas as pd
+import pytest
+
+from intra_channel_trading.scripts.signal_engine import NUMBA_AVAILABLE
+from intra_channel_trading.scripts.strategy import donchian_rsi_exit_only
+
+
+SIGNAL_PARAMS = {'donchian_window': 11, 'rsi_period': 18, 'rsi_exit': 42, 'cooldown_bars': 8, 'atr_period': 20,
+                 'atr_threshold': 0.0001}
+
+
+@pytest.fixture(scope='module')
+def bars(eurusd):
+    return eurusd.loc['2024-01-01':'2024-03-31']
+
+
+@pytest.mark.parametrize('engine', [
+    'auto',
+    'numpy',
+    pytest.param('numba', marks=pytest.mark.skipif(not NUMBA_AVAILABLE, reason="numba не установлена")),
+])
+@pytest.mark.parametrize('atr_enabled', [True, False])
+def test_engines_match_pandas_loop(bars, engine, atr_enabled):
+    # Эталон — исходный поштучный цикл на pandas; ядра на массивах должны давать те же Signal/Entry
+    params = dict(SIGNAL_PARAMS, atr_enabled=atr_enabled)
+    expected = donchian_rsi_exit_only(bars, params, engine='pandas')
+
+    signals = donchian_rsi_exit_only(bars, params, engine=engine)
+
+    pd.testing.assert_frame_equal(signals, expected, check_exact=True)
+    assert (expected['Signal'] == -1).any()
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from intra_channel_trading.scripts.indicator_cache import IndicatorCache
+from intra_channel_trading.scripts.market_arrays import MarketArrays
+from intra_channel_trading.scripts.optimizer import (composite_score, make_stage_ends, optuna_optimize_strategy,
+                                                     _stage_score)
+
+
+SIGNAL_PARAMS = {'donchian_window': 40, 'rsi_period': 14, 'rsi_exit': 50, 'cooldown_bars': 10, 'atr_enabled': True,
+                 'atr_period': 14, 'atr_threshold': 0.0001}
+PARAMS = {'eod_exit': False}
+
+
+@pytest.fixture(scope='module')
+def january(eurusd):
+    return eurusd.loc[:'2024-01-31']
+
+
+def test_stage_before_first_valid_row_scores_nan(january):
+    # Шаг '6h' — 18 баров 20M, меньше прогрева Donchian(40): первый этап кончается раньше первой строки после dropna
+    market = MarketArrays(january, IndicatorCache())
+    ends = make_stage_ends(january.index, '6h')
+    staged = market.staged(SIGNAL_PARAMS, PARAMS)
+    assert staged.rows(ends[0]) == 0
+
+    scores = [_stage_score(staged, january, SIGNAL_PARAMS, PARAMS, end) for end in ends]
+    assert np.isnan(scores[0])
+    for end, score in zip(ends, scores):
+        expected = composite_score(market.backtest(*market.signals(SIGNAL_PARAMS), PARAMS, end))
+        assert score == expected or (np.isnan(score) and np.isnan(expected))
+
+
+def test_staged_study_survives_empty_first_stage(january, tmp_path):
+    trial_params = {key: value for key, value in SIGNAL_PARAMS.items() if key != 'atr_enabled'}
+    study = optuna_optimize_strategy(january, PARAMS, str(tmp_path), n_trials=3, pruner='median', stages='6h',
+                                     enqueue=[trial_params])
+    assert len(study.trials) == 3
+    assert study.trials[0].params['donchian_window'] == 40
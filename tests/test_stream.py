@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from intra_channel_trading.scripts.stream import DonchianRsiStream
+from intra_channel_trading.scripts.strategy import donchian_rsi_exit_only
+
+
+SIGNAL_PARAMS = {'donchian_window': 11, 'rsi_period': 18, 'rsi_exit': 42, 'cooldown_bars': 8, 'atr_period': 20,
+                 'atr_threshold': 0.0001}
+
+
+@pytest.fixture(scope='module')
+def bars(eurusd):
+    return eurusd.loc['2024-01-01':'2024-03-31']
+
+
+@pytest.mark.parametrize('atr_enabled', [True, False])
+def test_replay_matches_batch(bars, atr_enabled):
+    params = dict(SIGNAL_PARAMS, atr_enabled=atr_enabled)
+    expected = donchian_rsi_exit_only(bars, params)
+
+    signal = DonchianRsiStream(params).replay(bars)
+
+    pd.testing.assert_series_equal(signal, expected['Signal'].astype('int64'), check_freq=False)
+    assert (signal != 0).any() and (signal == -1).any()
+
+
+@pytest.mark.parametrize('atr_enabled', [True, False])
+def test_bar_by_bar_indicators_match_batch(bars, atr_enabled):
+    # Индикаторы, по которым стрим принимает решение на баре, — те же значения, что и колонки пакетной версии
+    params = dict(SIGNAL_PARAMS, atr_enabled=atr_enabled)
+    expected = donchian_rsi_exit_only(bars, params)
+    columns = ['RSI', 'Upper', 'Lower'] + (['ATR'] if atr_enabled else [])
+
+    stream, rows = DonchianRsiStream(params), []
+    for open_, high, low, close in bars[['Open', 'High', 'Low', 'Close']].to_numpy():
+        if stream.update(high, low, close, open_) is not None:
+            rows.append([stream.rsi, stream.upper, stream.lower] + ([stream.atr] if atr_enabled else []))
+
+    np.testing.assert_array_equal(np.array(rows), expected[columns].to_numpy())
@@ -0,0 +1,23 @@
+from intra_channel_trading.scripts.walk_forward import make_folds, walk_forward
+
+
+PARAMS = {'eod_exit': False}
+
+
+def test_make_folds_skips_windows_without_bars(eurusd):
+    week = eurusd.loc['2024-01-08':'2024-01-21'].index
+    folds = make_folds(week, '3D', '1D')
+    assert folds
+    assert [fold['fold'] for fold in folds] == list(range(len(folds)))
+    for fold in folds:
+        assert ((week >= fold['test_start']) & (week < fold['test_end'])).any()
+        assert fold['test_start'].dayofweek < 5
+
+
+def test_failed_fold_is_reported_not_raised(eurusd, tmp_path):
+    # n_trials=0: в фолде нет завершённых триалов, study.best_params падает — фолд становится строкой с error
+    data = eurusd.loc['2024-01-01':'2024-02-29']
+    fold_table, equity = walk_forward(data, PARAMS, str(tmp_path), train_period='30D', test_period='15D', n_trials=0)
+    assert len(fold_table) == len(make_folds(data.index, '30D', '15D'))
+    assert fold_table['error'].notna().all()
+    assert equity.empty